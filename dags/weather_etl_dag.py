@@ -1,14 +1,36 @@
 # weather_etl_dag.py
+import os
+import sys
 from airflow import DAG
 from airflow.operators.python import PythonOperator
 from datetime import datetime, timedelta
 from airflow.models import Variable
 
-# Import des fonctions de vos scripts
-from scripts.extract import extract_current_weather
-from scripts.extract_historic import main as extract_historical_weather
-from scripts.merge import main as merge_data
-from scripts.transform import main as transform_data
+# Les scripts forment le paquet `script` à la racine du projet : seule la racine est ajoutée au chemin
+# d'import (en dernier, sans masquer de paquet installé). Les données sont désignées par un chemin
+# absolu (WEATHER_DATA_DIR, lu par script/paths.py) : le répertoire courant du worker n'est pas modifié.
+PROJECT_DIR = os.getenv("WEATHER_PROJECT_DIR", os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if PROJECT_DIR not in sys.path:
+    sys.path.append(PROJECT_DIR)
+os.environ.setdefault("WEATHER_DATA_DIR", os.path.join(PROJECT_DIR, "data"))
+
+# Référentiel unique des villes, partagé avec les scripts et le pipeline
+from script.cities import CITIES
+
+# Pool Airflow des requêtes API (à créer dans l'interface, sinon le pool par défaut est utilisé)
+# et nombre maximal d'extractions simultanées par tâche mappée
+EXTRACT_POOL = os.getenv("WEATHER_EXTRACT_POOL", "default_pool")
+EXTRACT_CONCURRENCY = int(os.getenv("WEATHER_EXTRACT_CONCURRENCY", "4"))
+
+# Quotas d'API : chaque instance de tâche est un processus avec ses propres limiteurs. C'est
+# EXTRACT_CONCURRENCY (max_active_tis_per_dag) qui borne le nombre d'instances d'une même API
+# en parallèle, pas le pool (partagé, il ne fait que réserver des emplacements de workers) :
+# chaque instance reçoit donc 1/EXTRACT_CONCURRENCY de OPENWEATHER_RATE et OPEN_METEO_RATE
+# (rafales comprises), lus par les scripts à leur import dans la tâche.
+os.environ["HTTP_RATE_SHARES"] = str(EXTRACT_CONCURRENCY)
+
+# Villes regroupées par requête d'archive Open-Meteo (même taille de lot que extract_historic.py)
+HISTORICAL_BATCH_SIZE = int(os.getenv("OPEN_METEO_BATCH_SIZE", "10"))
 
 # Configuration par défaut du DAG
 default_args = {
@@ -21,8 +43,102 @@ default_args = {
     'retry_delay': timedelta(minutes=5),
 }
 
-# Liste des villes à traiter
-CITIES = ["Paris", "New York", "Tokyo", "Sydney", "Moscow", "Antananarivo"]
+def force_requested(context) -> bool:
+    """Option {"force": true} de l'exécution déclenchée : recalcule les étapes malgré le manifeste"""
+    dag_run = context.get('dag_run')
+    return bool(dag_run and dag_run.conf and dag_run.conf.get('force'))
+
+def publish_metrics(context):
+    """Publie en XCom les mesures des étapes exécutées par la tâche (script/metrics.py)"""
+    from script.metrics import push_metrics
+    push_metrics(context['ti'])
+
+# ========== Fonctions des tâches ==========
+def extract_city_current(city: str, **context):
+    """Extrait les données actuelles d'une seule ville (une instance de tâche mappée par ville)"""
+    from script.extract import extract_current_weather
+
+    api_key = Variable.get("OPENWEATHER_API_KEY", default_var=os.getenv("API_KEY"))
+    success = extract_current_weather([city], api_key, max_workers=1)
+    publish_metrics(context)
+    if not success:
+        # L'échec ne concerne que cette ville : seule son instance est relancée
+        raise ValueError(f"Échec de l'extraction des données actuelles pour {city}")
+
+def extract_historical_batch(cities: list, **context):
+    """
+    Extrait l'historique (incrémental) d'un lot de villes en une requête Open-Meteo
+    (une instance de tâche mappée par lot)
+    """
+    from script import extract_historic
+
+    successes = extract_historic.main(cities=cities, max_workers=1)
+    publish_metrics(context)
+    if successes < len(cities):
+        # Seul ce lot est relancé ; ses villes déjà à jour ne sont pas redemandées
+        raise ValueError(f"Échec de l'extraction des données historiques pour "
+                         f"{len(cities) - successes} ville(s) sur {len(cities)} : {', '.join(cities)}")
+
+def merge_current(**context):
+    """Compacte les journées terminées puis fusionne les données actuelles"""
+    from script.merge import compact_current_partitions, merge_current_data
+
+    compact_current_partitions()
+    path = merge_current_data()
+    publish_metrics(context)
+    return path
+
+def merge_city_historical(city: str, **context):
+    """Fusionne l'historique d'une seule ville dans sa partition (une instance de tâche mappée par ville)"""
+    from script.merge import merge_city_historical as merge_city
+
+    n_changed = merge_city(city, force=force_requested(context))
+    publish_metrics(context)
+    return n_changed
+
+def reduce_historical(**context):
+    """Reporte les fusions par ville sur l'index, les statistiques, les esquisses et les agrégats"""
+    from script.merge import reduce_historical_changes
+
+    path = reduce_historical_changes()
+    publish_metrics(context)
+    return path
+
+def create_analysis(**context):
+    from script.merge import create_analysis_file
+
+    path = create_analysis_file(force=force_requested(context))
+    publish_metrics(context)
+    return path
+
+def transform_data(**context):
+    from script.transform import create_unified_star_schema
+
+    outputs = create_unified_star_schema(force=force_requested(context))
+    publish_metrics(context)
+    return outputs
+
+def validate_output():
+    """
+    Vérifie les tables du schéma en étoile (quel que soit STORAGE_FORMAT) et la présence
+    de chaque ville du référentiel dans dim_ville
+    """
+    from script.paths import STAR_SCHEMA_DIR
+    from script.storage import read_table, table_path
+    from script.transform import STAR_SCHEMA_TABLES
+
+    for name in STAR_SCHEMA_TABLES:
+        file = table_path(f"{STAR_SCHEMA_DIR}/{name}")
+        if not os.path.exists(file):
+            raise ValueError(f"Fichier {file} manquant après transformation")
+        if os.path.getsize(file) == 0:
+            raise ValueError(f"Fichier {file} est vide")
+
+    # Les autres villes sont publiées même si une ville a échoué : l'exécution est alors signalée en échec
+    villes = set(read_table(f"{STAR_SCHEMA_DIR}/dim_ville", columns=['ville'])['ville'])
+    missing = [city for city in CITIES if city not in villes]
+    if missing:
+        raise ValueError(f"Villes absentes du schéma en étoile : {', '.join(missing)}")
 
 with DAG(
     'climate_comparison_pipeline',
@@ -34,22 +150,52 @@ with DAG(
     tags=['weather', 'climate'],
 ) as dag:
 
-    # ========== Tâches d'Extraction ==========
-    extract_current_task = PythonOperator(
+    # ========== Tâches d'Extraction (une instance par ville ou par lot de villes) ==========
+    city_kwargs = [{'city': city} for city in CITIES]
+    # L'archive Open-Meteo accepte plusieurs coordonnées par requête : une instance par lot
+    batch_kwargs = [{'cities': CITIES[i:i + HISTORICAL_BATCH_SIZE]}
+                    for i in range(0, len(CITIES), HISTORICAL_BATCH_SIZE)]
+
+    extract_current_task = PythonOperator.partial(
         task_id='extract_current_weather',
-        python_callable=extract_current_weather,
-        op_args=[CITIES, Variable.get("OPENWEATHER_API_KEY")],
-    )
+        python_callable=extract_city_current,
+        pool=EXTRACT_POOL,
+        max_active_tis_per_dag=EXTRACT_CONCURRENCY,
+    ).expand(op_kwargs=city_kwargs)
 
-    extract_historical_task = PythonOperator(
+    extract_historical_task = PythonOperator.partial(
         task_id='extract_historical_weather',
-        python_callable=extract_historical_weather,
+        python_callable=extract_historical_batch,
+        pool=EXTRACT_POOL,
+        max_active_tis_per_dag=EXTRACT_CONCURRENCY,
+    ).expand(op_kwargs=batch_kwargs)
+
+    # ========== Tâches de Fusion ==========
+    # L'historique est fusionné ville par ville sur le même référentiel (map), chaque instance
+    # n'écrivant que la partition de sa ville ; l'index des partitions, les statistiques, les
+    # esquisses et les clés des agrégats, partagés, sont mis à jour par une seule tâche (reduce).
+    # Les fusions s'exécutent même si certaines villes ont échoué, avec les fichiers bruts disponibles.
+    merge_current_task = PythonOperator(
+        task_id='merge_current_data',
+        python_callable=merge_current,
+        trigger_rule='all_done',
     )
 
-    # ========== Tâche de Fusion ==========
-    merge_task = PythonOperator(
-        task_id='merge_data',
-        python_callable=merge_data,
+    merge_city_task = PythonOperator.partial(
+        task_id='merge_city_historical',
+        python_callable=merge_city_historical,
+        trigger_rule='all_done',
+    ).expand(op_kwargs=city_kwargs)
+
+    merge_historical_task = PythonOperator(
+        task_id='merge_historical_data',
+        python_callable=reduce_historical,
+        trigger_rule='all_done',
+    )
+
+    analysis_task = PythonOperator(
+        task_id='create_analysis_file',
+        python_callable=create_analysis,
     )
 
     # ========== Tâche de Transformation ==========
@@ -59,25 +205,14 @@ with DAG(
     )
 
     # ========== Tâche de Validation ==========
-    def validate_output():
-        import os
-        required_files = [
-            'data/star_schema/dim_ville.csv',
-            'data/star_schema/dim_temps.csv',
-            'data/star_schema/dim_climat.csv',
-            'data/star_schema/fact_current.csv',
-            'data/star_schema/fact_historical.csv'
-        ]
-        for file in required_files:
-            if not os.path.exists(file):
-                raise ValueError(f"Fichier {file} manquant après transformation")
-            if os.path.getsize(file) == 0:
-                raise ValueError(f"Fichier {file} est vide")
-
     validate_task = PythonOperator(
         task_id='validate_output',
         python_callable=validate_output,
     )
 
     # ========== Orchestration ==========
-    [extract_current_task, extract_historical_task] >> merge_task >> transform_task >> validate_task
\ No newline at end of file
+    # Map/reduce par ville, puis fan-in : les étapes s'enchaînent comme dans merge.main puis transform.py
+    extract_current_task >> merge_current_task
+    extract_historical_task >> merge_city_task
+    [merge_city_task, merge_current_task] >> merge_historical_task
+    merge_historical_task >> analysis_task >> transform_task >> validate_task
@@ -0,0 +1,2 @@
+# Scripts du pipeline météo, importés en tant que paquet (from script.merge import ...) par le
+# DAG Airflow et exécutés depuis la racine du projet : python -m script.merge
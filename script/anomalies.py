@@ -0,0 +1,237 @@
+import os
+import logging
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from script.paths import ANALYSIS_DIR, STAR_SCHEMA_DIR
+from script.schema import FACT_WEATHER_SCHEMA, apply_schema
+from script.storage import iter_table, write_table
+
+# Table des anomalies : une ligne par fait (ville_id, date_id)
+ANOMALY_TABLE = f"{ANALYSIS_DIR}/fact_anomalies"
+ANOMALIES_ENABLED = os.getenv("ANOMALIES_ENABLED", "0") == "1"
+
+# Fenêtre de la climatologie (± jours autour du jour de l'année) et fenêtres glissantes
+CLIMATOLOGY_HALF_WINDOW = int(os.getenv("ANOMALY_CLIMATOLOGY_HALF_WINDOW", "15"))
+ROLLING_WINDOWS = [7, 30]
+
+# Seuils des jours extrêmes (centiles de la climatologie) et durée minimale d'une vague
+HOT_PERCENTILE = float(os.getenv("ANOMALY_HOT_PERCENTILE", "90"))
+COLD_PERCENTILE = float(os.getenv("ANOMALY_COLD_PERCENTILE", "10"))
+MIN_EVENT_DAYS = int(os.getenv("ANOMALY_MIN_EVENT_DAYS", "3"))
+
+# Taille maximale (en valeurs) des échantillons fenêtrés traités à la fois
+BLOCK_VALUES = 16_000_000
+
+ANOMALY_SCHEMA = {
+    'ville_id': 'int32',
+    'date_id': 'int32',
+    'temperature': 'float32',
+    'temperature_climatologie': 'float32',
+    'anomalie_temperature': 'float32',
+    'anomalie_7j': 'float32',
+    'anomalie_30j': 'float32',
+    'seuil_chaud': 'float32',
+    'seuil_froid': 'float32',
+    'jour_chaud': 'bool',
+    'jour_froid': 'bool',
+    'vague_chaleur': 'bool',
+    'vague_froid': 'bool',
+}
+
+def day_of_year(dates: pd.DatetimeIndex) -> np.ndarray:
+    """Jour de l'année 0-364 d'un calendrier sans année bissextile (le 29 février prend la place du 28)"""
+    doy = dates.dayofyear.to_numpy() - 1
+    return doy - (dates.is_leap_year & (doy >= 59)).astype(int)
+
+def window_samples(baseline: np.ndarray, half_window: int) -> np.ndarray:
+    """
+    Échantillons de la fenêtre ± half_window jours autour de chaque jour de l'année
+
+    Args:
+        baseline (np.ndarray): Valeurs [ville, année, jour de l'année (365)]
+
+    Returns:
+        np.ndarray: [ville, jour de l'année, année x (2 * half_window + 1)]
+    """
+    padded = np.concatenate([baseline[..., -half_window:], baseline, baseline[..., :half_window]], axis=-1)
+    windows = sliding_window_view(padded, 2 * half_window + 1, axis=-1)  # vue [ville, année, 365, fenêtre]
+    n_cities, n_years = baseline.shape[:2]
+    return windows.transpose(0, 2, 1, 3).reshape(n_cities, 365, n_years * (2 * half_window + 1))
+
+def sorted_percentile(sorted_values: np.ndarray, counts: np.ndarray, q: float) -> np.ndarray:
+    """Centile (interpolation linéaire) de lignes triées dont les NaN ont été placés en fin"""
+    rank = q / 100 * np.maximum(counts - 1, 0)
+    low = np.floor(rank).astype(np.int64)
+    high = np.minimum(low + 1, np.maximum(counts - 1, 0))
+    low_values = np.take_along_axis(sorted_values, low[..., None], axis=-1)[..., 0]
+    high_values = np.take_along_axis(sorted_values, high[..., None], axis=-1)[..., 0]
+    result = low_values + (high_values - low_values) * (rank - low)
+    return np.where(counts > 0, result, np.nan)
+
+def climatology(baseline: np.ndarray, percentile: float = None, half_window: int = None) -> np.ndarray:
+    """
+    Climatologie par ville et par jour de l'année sur une fenêtre glissante
+
+    Args:
+        baseline (np.ndarray): Valeurs [ville, année, 365]
+        percentile (float): Centile à calculer (moyenne si None)
+        half_window (int): Demi-largeur de la fenêtre en jours (CLIMATOLOGY_HALF_WINDOW par défaut)
+
+    Returns:
+        np.ndarray: [ville, 365]
+    """
+    half_window = CLIMATOLOGY_HALF_WINDOW if half_window is None else half_window
+    n_cities, n_years = baseline.shape[:2]
+    sample_size = n_years * (2 * half_window + 1)
+    block = max(1, BLOCK_VALUES // (365 * sample_size))
+
+    result = np.full((n_cities, 365), np.nan, dtype=np.float64)
+    for start in range(0, n_cities, block):
+        samples = window_samples(baseline[start:start + block], half_window)
+        valid = ~np.isnan(samples)
+        counts = valid.sum(axis=-1)
+        if percentile is None:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                result[start:start + block] = np.where(valid, samples, 0).sum(axis=-1, dtype=np.float64) / counts
+        else:
+            # Tri avec les NaN en fin de ligne, puis lecture du rang voulu
+            ordered = np.sort(np.where(valid, samples, np.inf), axis=-1)
+            result[start:start + block] = sorted_percentile(ordered, counts, percentile)
+    return result
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    Moyenne glissante (fenêtre se terminant au jour courant) sur l'axe des jours de [ville, jour],
+    NaN ignorés ; NaN si moins de la moitié de la fenêtre est renseignée
+    """
+    valid = ~np.isnan(values)
+    sums = np.concatenate([np.zeros((values.shape[0], 1)), np.cumsum(np.where(valid, values, 0), axis=1)], axis=1)
+    counts = np.concatenate([np.zeros((values.shape[0], 1)), np.cumsum(valid, axis=1)], axis=1)
+    window_sums = sums[:, window:] - sums[:, :-window]
+    window_counts = counts[:, window:] - counts[:, :-window]
+    # Début de série : fenêtre tronquée
+    head_sums, head_counts = sums[:, 1:window], counts[:, 1:window]
+    window_sums = np.concatenate([head_sums, window_sums], axis=1)
+    window_counts = np.concatenate([head_counts, window_counts], axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = window_sums / window_counts
+    return np.where(window_counts >= (window + 1) // 2, means, np.nan)
+
+def run_lengths(flags: np.ndarray) -> np.ndarray:
+    """Longueur de la série de jours consécutifs à True contenant chaque jour de [ville, jour] (0 si False)"""
+    positions = np.arange(1, flags.shape[1] + 1)
+    forward = positions - np.maximum.accumulate(np.where(flags, 0, positions), axis=1)
+    reversed_flags = flags[:, ::-1]
+    backward = (positions - np.maximum.accumulate(np.where(reversed_flags, 0, positions), axis=1))[:, ::-1]
+    return np.where(flags, forward + backward - 1, 0)
+
+def detect_anomalies(fact: pd.DataFrame) -> pd.DataFrame:
+    """
+    Calcule pour chaque fait la climatologie, les anomalies et les indicateurs d'extrêmes.
+
+    - temperature_climatologie : moyenne de la température sur ± CLIMATOLOGY_HALF_WINDOW jours
+      autour du même jour de l'année, toutes années confondues
+    - anomalie_temperature, anomalie_7j, anomalie_30j : écart à la climatologie, brut puis
+      en moyenne glissante sur 7 et 30 jours
+    - seuil_chaud / seuil_froid : centiles HOT_PERCENTILE de temp_max et COLD_PERCENTILE de
+      temp_min sur la même fenêtre
+    - jour_chaud / jour_froid : dépassement du seuil ; vague_chaleur / vague_froid : au moins
+      MIN_EVENT_DAYS jours consécutifs au-delà du seuil
+
+    Tous les calculs sont vectorisés sur des tableaux denses [ville, jour].
+
+    Args:
+        fact (pd.DataFrame): Faits (ville_id, date_id YYYYMMDD, temperature, temp_max, temp_min)
+
+    Returns:
+        pd.DataFrame: Une ligne par fait, triée par ville_id puis date_id
+    """
+    fact = fact.drop_duplicates(['ville_id', 'date_id']).sort_values(['ville_id', 'date_id'])
+    if fact.empty:
+        return apply_schema(pd.DataFrame(columns=list(ANOMALY_SCHEMA)), ANOMALY_SCHEMA)
+
+    # Conversion des dates sur les seules valeurs distinctes de date_id
+    date_codes, date_ids = pd.factorize(fact['date_id'], sort=True)
+    dates = pd.DatetimeIndex(pd.to_datetime(np.asarray(date_ids, dtype=np.int64).astype(str), format='%Y%m%d'))
+    city_idx, villes = pd.factorize(fact['ville_id'], sort=True)
+    first_day = dates[0]
+    day_idx = (dates - first_day).days.to_numpy()[date_codes]
+    year_idx = (dates.year.to_numpy() - first_day.year)[date_codes]
+    doy = day_of_year(dates)[date_codes]
+    is_feb29 = ((dates.month == 2) & (dates.day == 29))[date_codes]
+    n_cities, n_days, n_years = len(villes), day_idx.max() + 1, year_idx.max() + 1
+
+    def dense(column: str) -> np.ndarray:
+        values = np.full((n_cities, n_days), np.nan, dtype=np.float32)
+        values[city_idx, day_idx] = pd.to_numeric(fact[column], errors='coerce').to_numpy(dtype=np.float32, na_value=np.nan)
+        return values
+
+    def baseline(column: str) -> np.ndarray:
+        # Référence [ville, année, jour de l'année] ; les 29 février n'entrent pas dans la référence
+        values = np.full((n_cities, n_years, 365), np.nan, dtype=np.float32)
+        keep = ~is_feb29
+        values[city_idx[keep], year_idx[keep], doy[keep]] = pd.to_numeric(
+            fact[column], errors='coerce').to_numpy(dtype=np.float32, na_value=np.nan)[keep]
+        return values
+
+    # Climatologies par jour de l'année, ramenées sur l'axe continu des jours
+    all_days = first_day + pd.to_timedelta(np.arange(n_days), unit='D')
+    all_doy = day_of_year(pd.DatetimeIndex(all_days))
+    mean_clim = climatology(baseline('temperature'))[:, all_doy]
+    hot_threshold = climatology(baseline('temp_max'), HOT_PERCENTILE)[:, all_doy]
+    cold_threshold = climatology(baseline('temp_min'), COLD_PERCENTILE)[:, all_doy]
+
+    temperature, temp_max, temp_min = dense('temperature'), dense('temp_max'), dense('temp_min')
+    anomaly = temperature - mean_clim
+    hot_days = temp_max > hot_threshold
+    cold_days = temp_min < cold_threshold
+
+    result = pd.DataFrame({
+        'ville_id': fact['ville_id'].to_numpy(),
+        'date_id': fact['date_id'].to_numpy(),
+        'temperature': temperature[city_idx, day_idx],
+        'temperature_climatologie': mean_clim[city_idx, day_idx],
+        'anomalie_temperature': anomaly[city_idx, day_idx],
+    })
+    for window in ROLLING_WINDOWS:
+        result[f"anomalie_{window}j"] = rolling_mean(anomaly, window)[city_idx, day_idx]
+    result['seuil_chaud'] = hot_threshold[city_idx, day_idx]
+    result['seuil_froid'] = cold_threshold[city_idx, day_idx]
+    result['jour_chaud'] = hot_days[city_idx, day_idx]
+    result['jour_froid'] = cold_days[city_idx, day_idx]
+    result['vague_chaleur'] = (run_lengths(hot_days) >= MIN_EVENT_DAYS)[city_idx, day_idx]
+    result['vague_froid'] = (run_lengths(cold_days) >= MIN_EVENT_DAYS)[city_idx, day_idx]
+    return apply_schema(result, ANOMALY_SCHEMA)
+
+def create_anomaly_table() -> str:
+    """
+    Construit la table des anomalies à partir de fact_weather (seules les colonnes utiles sont lues)
+
+    Returns:
+        str: Chemin de la table créée
+    """
+    try:
+        columns = ['ville_id', 'date_id', 'temperature', 'temp_max', 'temp_min']
+        fact = pd.concat(iter_table(f"{STAR_SCHEMA_DIR}/fact_weather", columns=columns, schema=FACT_WEATHER_SCHEMA),
+                         ignore_index=True)
+        anomalies = detect_anomalies(fact)
+        output_file = write_table(anomalies, ANOMALY_TABLE)
+        logging.info(f"Table des anomalies créée : {len(anomalies)} faits, "
+                     f"{int(anomalies['vague_chaleur'].sum())} jours de vague de chaleur, "
+                     f"{int(anomalies['vague_froid'].sum())} jours de vague de froid")
+        return output_file
+
+    except Exception as e:
+        logging.error(f"Erreur lors de la détection des anomalies : {str(e)}")
+        raise
+
+if __name__ == "__main__":
+    # Configuration du logging
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    create_anomaly_table()
@@ -0,0 +1,176 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import logging
+import platform
+import subprocess
+import tempfile
+from datetime import datetime
+
+from script.paths import ANALYSIS_DIR, CURRENT_GLOBAL, DATA_DIR, HISTORICAL_PARTITIONS, STAR_SCHEMA_DIR
+
+# Racine du projet (parent du paquet script), ajoutée au chemin d'import des étapes mesurées
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Résultats (une ligne JSON par étape et par taille), ajoutés d'une exécution à l'autre
+BENCHMARK_RESULTS = os.getenv("BENCHMARK_RESULTS", f"{DATA_DIR}/benchmark/results.jsonl")
+
+# Étapes mesurées, dans l'ordre d'exécution, et sorties dont la taille est relevée
+STAGES = {
+    'merge_current': [f"{CURRENT_GLOBAL}.{ext}" for ext in ('csv', 'parquet', 'feather')],
+    'merge_historical': [HISTORICAL_PARTITIONS],
+    'analysis': [ANALYSIS_DIR],
+    'star_schema': [STAR_SCHEMA_DIR],
+    'star_schema_streaming': [STAR_SCHEMA_DIR],
+}
+DEFAULT_STAGES = ['merge_current', 'merge_historical', 'analysis', 'star_schema']
+
+DEFAULT_SIZES = [10, 100, 1000]
+
+def run_stage(stage: str):
+    """
+    Exécute une étape dans le processus courant (lancé par run_benchmark, répertoire de
+    travail = jeu de données) et affiche sur la dernière ligne de stdout le temps écoulé
+    et le pic de mémoire résidente du processus
+    """
+    import resource
+
+    if stage == 'merge_current':
+        from script.merge import compact_current_partitions, merge_current_data
+        action = lambda: (compact_current_partitions(), merge_current_data())
+    elif stage == 'merge_historical':
+        from script.merge import merge_historical_data
+        action = lambda: merge_historical_data(force=True)
+    elif stage == 'analysis':
+        from script.merge import create_analysis_file
+        action = lambda: create_analysis_file(force=True)
+    elif stage == 'star_schema':
+        from script.transform import create_unified_star_schema
+        action = lambda: create_unified_star_schema(streaming=False, force=True)
+    elif stage == 'star_schema_streaming':
+        from script.transform import create_unified_star_schema
+        action = lambda: create_unified_star_schema(streaming=True, force=True)
+    else:
+        raise ValueError(f"Étape inconnue : {stage} (attendu : {', '.join(STAGES)})")
+
+    start = time.perf_counter()
+    action()
+    wall = time.perf_counter() - start
+    # ru_maxrss est en Ko sous Linux, en octets sous macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_mb = peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    print(json.dumps({'wall_s': round(wall, 3), 'peak_rss_mb': round(peak_mb, 1)}))
+
+def output_bytes(paths: list) -> int:
+    """Taille totale des fichiers et répertoires de sortie d'une étape"""
+    total = 0
+    for path in paths:
+        if os.path.isfile(path):
+            total += os.path.getsize(path)
+        elif os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
+
+def git_commit() -> str:
+    """Commit courant du dépôt (None hors d'un dépôt git)"""
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+        return result.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmark(sizes: list = None, days: int = 1096, stages: list = None, results_file: str = None,
+                  work_dir: str = None, seed: int = 0, keep: bool = False) -> list:
+    """
+    Mesure chaque étape sur des jeux de données synthétiques de tailles croissantes.
+
+    Pour chaque taille, un jeu de données déterministe est généré (synthetic.py) dans un
+    répertoire temporaire, puis chaque étape est exécutée dans un processus séparé : le pic
+    de mémoire résidente mesuré est celui de l'étape seule. Aucun accès réseau n'est fait.
+
+    Args:
+        sizes (list): Nombres de villes (DEFAULT_SIZES par défaut)
+        days (int): Nombre de jours d'historique par ville
+        stages (list): Étapes mesurées (DEFAULT_STAGES par défaut)
+        results_file (str): Fichier JSONL de résultats (BENCHMARK_RESULTS par défaut)
+        work_dir (str): Répertoire des jeux de données (répertoire temporaire par défaut)
+        seed (int): Graine du générateur
+        keep (bool): Conserve les jeux de données générés
+
+    Returns:
+        list: Résultats (un dict par étape et par taille)
+    """
+    from script.synthetic import generate_dataset
+
+    sizes = sizes or DEFAULT_SIZES
+    stages = stages or DEFAULT_STAGES
+    results_file = os.path.abspath(results_file or BENCHMARK_RESULTS)
+    os.makedirs(os.path.dirname(results_file), exist_ok=True)
+    run_info = {
+        'run_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'storage_format': os.getenv("STORAGE_FORMAT", "csv"),
+    }
+
+    results = []
+    for n_cities in sizes:
+        dataset_dir = tempfile.mkdtemp(prefix=f"bench_{n_cities}_", dir=work_dir)
+        try:
+            start = time.perf_counter()
+            generate_dataset(dataset_dir, n_cities, days, seed=seed)
+            logging.info(f"{n_cities} villes générées en {time.perf_counter() - start:.1f} s")
+
+            # Chaque étape travaille sur le jeu de données généré, quelle que soit la racine configurée
+            data_dir = os.path.join(dataset_dir, "data")
+            env = {**os.environ, 'WEATHER_DATA_DIR': data_dir,
+                   'PYTHONPATH': os.pathsep.join(filter(None, [PROJECT_DIR, os.getenv("PYTHONPATH")]))}
+            for stage in stages:
+                process = subprocess.run([sys.executable, "-m", "script.benchmark", "--run-stage", stage],
+                                         cwd=dataset_dir, env=env, capture_output=True, text=True)
+                if process.returncode != 0:
+                    logging.error(f"Échec de l'étape {stage} ({n_cities} villes) :\n{process.stderr[-2000:]}")
+                    raise RuntimeError(f"Échec de l'étape {stage} pour {n_cities} villes")
+                measures = json.loads(process.stdout.strip().splitlines()[-1])
+                result = {**run_info, 'stage': stage, 'cities': n_cities, 'days': days, **measures,
+                          'output_bytes': output_bytes([os.path.join(data_dir, os.path.relpath(p, DATA_DIR))
+                                                        for p in STAGES[stage]])}
+                results.append(result)
+                with open(results_file, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(result, ensure_ascii=False) + "\n")
+                logging.info(f"{stage:<22} {n_cities:>6} villes : {result['wall_s']:>8.2f} s, "
+                             f"pic {result['peak_rss_mb']:>8.1f} Mo, sortie {result['output_bytes'] / 1e6:.1f} Mo")
+        finally:
+            if keep:
+                logging.info(f"Jeu de données conservé : {dataset_dir}")
+            else:
+                shutil.rmtree(dataset_dir, ignore_errors=True)
+
+    logging.info(f"{len(results)} mesures ajoutées à {results_file}")
+    return results
+
+if __name__ == "__main__":
+    # Configuration du logging
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(description="Benchmark des étapes de fusion et de transformation")
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES, help="Nombres de villes")
+    parser.add_argument("--days", type=int, default=1096, help="Jours d'historique par ville")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=DEFAULT_STAGES)
+    parser.add_argument("--results", default=None, help="Fichier JSONL de résultats (BENCHMARK_RESULTS par défaut)")
+    parser.add_argument("--work-dir", default=None, help="Répertoire des jeux de données générés")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", action="store_true", help="Conserve les jeux de données générés")
+    parser.add_argument("--run-stage", choices=list(STAGES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.run_stage:
+        run_stage(args.run_stage)
+    else:
+        run_benchmark(args.sizes, args.days, args.stages, args.results, args.work_dir, args.seed, args.keep)
@@ -0,0 +1,24 @@
+# Référentiel unique des villes traitées par les extracteurs, le pipeline et le DAG Airflow.
+# Ajouter une ville ici suffit : elle est extraite (actuel et historique), fusionnée et
+# décrite dans dim_ville (pays, latitude, longitude).
+CITY_REGISTRY = {
+    'Paris': ('France', 48.8566, 2.3522),
+    'New York': ('USA', 40.7128, -74.0060),
+    'Tokyo': ('Japan', 35.6762, 139.6503),
+    'Sydney': ('Australia', -33.8688, 151.2093),
+    'São Paulo': ('Brazil', -23.5505, -46.6333),
+    'Moscow': ('Russia', 55.7558, 37.6173),
+    'Antananarivo': ('Madagascar', -18.8792, 47.5079),
+}
+
+# Villes traitées par défaut, dans l'ordre du référentiel
+CITIES = list(CITY_REGISTRY)
+
+def get_city_coordinates(city: str) -> tuple:
+    """Retourne les coordonnées (latitude, longitude) d'une ville, (None, None) si elle est inconnue"""
+    _, latitude, longitude = CITY_REGISTRY.get(city, (None, None, None))
+    return latitude, longitude
+
+def get_city_country(city: str) -> str:
+    """Retourne le pays d'une ville, 'Inconnu' si elle est absente du référentiel"""
+    return CITY_REGISTRY.get(city, ('Inconnu',))[0]
@@ -0,0 +1,256 @@
+import os
+import json
+import argparse
+import logging
+import warnings
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from script.paths import CUBE_DIR, HISTORICAL_PARTITIONS, STAR_SCHEMA_DIR
+from script.schema import HISTORICAL_GLOBAL_SCHEMA
+from script.storage import list_partitions, partition_signature, read_table, table_exists
+
+# Cube dense [ville, jour, variable] stocké en np.memmap (float32, NaN = valeur absente) dans CUBE_DIR
+CUBE_VALUES = "values.f32"
+CUBE_META = "meta.json"
+CUBE_VARIABLES = ['temp_max', 'temp_min', 'precipitation', 'pluie', 'neige']
+CUBE_ENABLED = os.getenv("CUBE_ENABLED", "0") == "1"
+
+# L'axe des jours est alloué par blocs pour ne pas recopier le cube à chaque nouvelle journée
+DAY_BLOCK = 366
+
+class WeatherCube:
+    """
+    Représentation dense des données historiques : values[ville, jour, variable].
+
+    - Axe ville : ordre de dim_ville (ville_id croissant), nouvelles villes ajoutées à la suite
+    - Axe jour : calendrier continu à partir de start_date (première date de dim_temps)
+    - Axe variable : CUBE_VARIABLES
+
+    Les accès par ville (cube.city("Paris")) ou par variable (cube.variable("temp_max"))
+    sont des vues sans copie sur le fichier mappé en mémoire.
+    """
+
+    def __init__(self, cube_dir: str, meta: dict, mode: str = 'r'):
+        self.cube_dir = cube_dir
+        self.meta = meta
+        self.villes = meta['villes']
+        self.variables = meta['variables']
+        self.start_date = datetime.strptime(meta['start_date'], "%Y-%m-%d")
+        self.n_days = meta['n_days']
+        self._city_index = {ville: i for i, ville in enumerate(self.villes)}
+        self._variable_index = {name: i for i, name in enumerate(self.variables)}
+        self.values = np.memmap(os.path.join(cube_dir, CUBE_VALUES), dtype=np.float32, mode=mode,
+                                shape=(len(self.villes), meta['capacity'], len(self.variables)))
+
+    @property
+    def dates(self) -> pd.DatetimeIndex:
+        """Dates de l'axe des jours (jours utilisés uniquement)"""
+        return pd.date_range(self.start_date, periods=self.n_days, freq='D')
+
+    def city_index(self, ville: str) -> int:
+        return self._city_index[ville]
+
+    def day_index(self, date) -> int:
+        return (pd.Timestamp(date) - pd.Timestamp(self.start_date)).days
+
+    def city(self, ville: str) -> np.ndarray:
+        """Vue [jour, variable] d'une ville"""
+        return self.values[self.city_index(ville), :self.n_days]
+
+    def variable(self, name: str) -> np.ndarray:
+        """Vue [ville, jour] d'une variable"""
+        return self.values[:, :self.n_days, self._variable_index[name]]
+
+    def period(self, start, end) -> np.ndarray:
+        """Vue [ville, jour, variable] entre deux dates incluses"""
+        return self.values[:, max(0, self.day_index(start)):min(self.n_days, self.day_index(end) + 1)]
+
+    def city_stats(self) -> pd.DataFrame:
+        """
+        Statistiques historiques par ville calculées sur l'axe des jours
+        (mêmes colonnes que l'agrégation groupby de merge.build_analysis)
+        """
+        data = self.values[:, :self.n_days]
+        stats = {'ville': self.villes}
+        with warnings.catch_warnings():
+            # Ville sans aucune mesure : moyenne et écart-type valent NaN
+            warnings.simplefilter('ignore', RuntimeWarning)
+            for name in self.variables:
+                values = data[:, :, self._variable_index[name]]
+                stats[f"{name}_mean"] = np.nanmean(values, axis=1, dtype=np.float64)
+                stats[f"{name}_std"] = np.nanstd(values, axis=1, dtype=np.float64, ddof=1)
+                stats[f"{name}_sum"] = np.nansum(values, axis=1, dtype=np.float64)
+        return pd.DataFrame(stats)
+
+    def monthly_climatology(self, name: str) -> pd.DataFrame:
+        """Moyenne d'une variable par ville et par mois calendaire (villes en lignes, mois 1-12 en colonnes)"""
+        values = self.variable(name)
+        months = self.dates.month.to_numpy() - 1
+        valid = ~np.isnan(values)
+        sums = np.zeros((len(self.villes), 12))
+        counts = np.zeros((len(self.villes), 12))
+        np.add.at(sums.T, months, np.where(valid, values, 0).T)
+        np.add.at(counts.T, months, valid.T)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            climatology = sums / counts
+        return pd.DataFrame(climatology, index=pd.Index(self.villes, name='ville'), columns=range(1, 13))
+
+    def flush(self):
+        self.values.flush()
+
+def load_cube(cube_dir: str = CUBE_DIR, mode: str = 'r'):
+    """
+    Ouvre le cube existant
+
+    Returns:
+        WeatherCube | None: Cube mappé en mémoire, None s'il n'a pas encore été construit
+    """
+    meta_path = os.path.join(cube_dir, CUBE_META)
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, encoding='utf-8') as f:
+        meta = json.load(f)
+    return WeatherCube(cube_dir, meta, mode)
+
+def save_meta(cube_dir: str, meta: dict):
+    with open(os.path.join(cube_dir, CUBE_META), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2, ensure_ascii=False)
+
+def initial_axes(partition_keys: dict) -> tuple:
+    """
+    Axes initiaux du cube : villes dans l'ordre de dim_ville et première date de dim_temps,
+    complétés par les villes et dates des partitions absentes des dimensions
+    """
+    villes, start_date = [], None
+    dim_ville = f"{STAR_SCHEMA_DIR}/dim_ville"
+    dim_temps = f"{STAR_SCHEMA_DIR}/dim_temps"
+    if table_exists(dim_ville):
+        villes = read_table(dim_ville, columns=['ville_id', 'ville']).sort_values('ville_id')['ville'].tolist()
+    if table_exists(dim_temps):
+        start_date = pd.to_datetime(read_table(dim_temps, columns=['date'])['date']).min()
+
+    partition_start = min(keys['min_date'] for keys in partition_keys.values())
+    if start_date is None or pd.isna(start_date) or partition_start < start_date:
+        start_date = partition_start
+    villes += sorted(ville for ville in partition_keys if ville not in villes)
+    return villes, start_date
+
+def resize_cube(cube_dir: str, meta: dict, villes: list, n_days: int) -> dict:
+    """
+    Agrandit le cube (nouvelles villes ou dates au-delà de la capacité) en recopiant
+    les valeurs existantes dans un nouveau fichier
+    """
+    capacity = max(meta.get('capacity', 0), -(-n_days // DAY_BLOCK) * DAY_BLOCK)
+    new_meta = dict(meta, villes=villes, n_days=max(n_days, meta.get('n_days', 0)), capacity=capacity)
+    if villes == meta.get('villes') and capacity == meta.get('capacity'):
+        return new_meta
+
+    path = os.path.join(cube_dir, CUBE_VALUES)
+    tmp_path = f"{path}.tmp"
+    resized = np.memmap(tmp_path, dtype=np.float32, mode='w+',
+                        shape=(len(villes), capacity, len(CUBE_VARIABLES)))
+    resized[:] = np.nan
+    if meta.get('villes'):
+        old = np.memmap(path, dtype=np.float32, mode='r',
+                        shape=(len(meta['villes']), meta['capacity'], len(CUBE_VARIABLES)))
+        resized[:len(meta['villes']), :meta['capacity']] = old
+        del old
+    resized.flush()
+    del resized
+    os.replace(tmp_path, path)
+    logging.info(f"Cube redimensionné : {len(villes)} villes x {capacity} jours x {len(CUBE_VARIABLES)} variables")
+    return new_meta
+
+def sync_cube(cube_dir: str = CUBE_DIR, full_rebuild: bool = False):
+    """
+    Met à jour le cube à partir des partitions historiques par ville (sortie de merge.py).
+
+    Seules les partitions modifiées depuis la synchronisation précédente (taille ou date
+    de modification) sont relues et réécrites dans la ligne de leur ville.
+
+    Args:
+        cube_dir (str): Répertoire du cube (data/cube)
+        full_rebuild (bool): Reconstruit le cube à partir de toutes les partitions
+
+    Returns:
+        WeatherCube | None: Cube à jour (lecture seule), None s'il n'y a aucune partition
+    """
+    try:
+        partitions = list_partitions(HISTORICAL_PARTITIONS)
+        if not partitions:
+            logging.warning("Aucune partition historique : le cube n'est pas construit.")
+            return None
+
+        os.makedirs(cube_dir, exist_ok=True)
+        cube = None if full_rebuild else load_cube(cube_dir)
+        meta = cube.meta if cube is not None else {'variables': CUBE_VARIABLES, 'partitions': {}}
+        del cube
+
+        # Partitions modifiées depuis la dernière synchronisation
+        changed = {}
+        for base in partitions:
+            signature = partition_signature(base)
+            if meta['partitions'].get(base) != signature:
+                changed[base] = signature
+        if not changed:
+            logging.info("Cube à jour : aucune partition historique modifiée.")
+            return load_cube(cube_dir)
+
+        frames = {}
+        for base in changed:
+            df = read_table(base, columns=['ville', 'date'] + CUBE_VARIABLES, schema=HISTORICAL_GLOBAL_SCHEMA)
+            if not df.empty:
+                df['date'] = pd.to_datetime(df['date'])
+                frames[str(df['ville'].iloc[0])] = df
+        if not frames:
+            meta['partitions'].update(changed)
+            save_meta(cube_dir, meta)
+            return load_cube(cube_dir)
+
+        # Axes : initialisés depuis les dimensions, étendus aux nouvelles villes et dates
+        keys = {ville: {'min_date': df['date'].min(), 'max_date': df['date'].max()} for ville, df in frames.items()}
+        if 'start_date' not in meta:
+            villes, start_date = initial_axes(keys)
+            meta['start_date'] = start_date.strftime("%Y-%m-%d")
+        else:
+            start_date = pd.Timestamp(meta['start_date'])
+            if min(k['min_date'] for k in keys.values()) < start_date:
+                logging.warning("Dates antérieures au début du cube : reconstruction complète.")
+                return sync_cube(cube_dir, full_rebuild=True)
+            villes = meta['villes'] + sorted(v for v in frames if v not in meta['villes'])
+        n_days = max((k['max_date'] - start_date).days + 1 for k in keys.values())
+        meta = resize_cube(cube_dir, meta, villes, n_days)
+
+        # Réécriture complète de la ligne de chaque ville modifiée
+        cube = WeatherCube(cube_dir, meta, mode='r+')
+        for ville, df in frames.items():
+            row = cube.values[cube.city_index(ville)]
+            row[:] = np.nan
+            days = (df['date'] - start_date).dt.days.to_numpy()
+            row[days] = df[CUBE_VARIABLES].to_numpy(dtype=np.float32, na_value=np.nan)
+        cube.flush()
+        del cube
+
+        meta['partitions'].update(changed)
+        save_meta(cube_dir, meta)
+        logging.info(f"Cube synchronisé : {len(frames)} villes mises à jour, {len(meta['villes'])} villes, "
+                     f"{meta['n_days']} jours depuis le {meta['start_date']}")
+        return load_cube(cube_dir)
+
+    except Exception as e:
+        logging.error(f"Erreur lors de la synchronisation du cube : {str(e)}")
+        raise
+
+if __name__ == "__main__":
+    # Configuration du logging
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(description="Construit ou met à jour le cube ville x jour x variable")
+    parser.add_argument("--full-rebuild", action="store_true", help="Reconstruit le cube entièrement")
+    args = parser.parse_args()
+    sync_cube(full_rebuild=args.full_rebuild)
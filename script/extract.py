@@ -3,97 +3,158 @@ import requests
 import pandas as pd
 from datetime import datetime
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
+from script.cities import CITIES
+from script.http_cache import get_default_cache
+from script.http_client import create_session, get_with_retry, shared_limiter
+from script.metrics import add_log_file, instrument, record
+from script.paths import CURRENT_INPUT_DIR
 
 load_dotenv()
 
-# Configuration du logging (déplacée ici pour être utilisée par la fonction extract_current_weather)
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("data/weather_extraction.log"),
-        logging.StreamHandler()
-    ]
+# Nombre maximal de requêtes simultanées vers l'API OpenWeather
+MAX_WORKERS = int(os.getenv("EXTRACT_MAX_WORKERS", "8"))
+
+# Limiteur de débit partagé par tous les threads (quota gratuit : 60 appels/minute),
+# divisé entre les processus d'extraction simultanés (HTTP_RATE_SHARES)
+OPENWEATHER_LIMITER = shared_limiter(
+    rate=float(os.getenv("OPENWEATHER_RATE", "1")),
+    burst=int(os.getenv("OPENWEATHER_BURST", "10"))
 )
 
-def extract_current_weather(cities: list, api_key: str) -> bool:
+# URL de base de l'API (remplaçable par le serveur simulé script/mock_server.py)
+OPENWEATHER_BASE_URL = os.getenv("OPENWEATHER_BASE_URL", "https://api.openweathermap.org").rstrip('/')
+
+# Cache disque des réponses HTTP (None si HTTP_CACHE_ENABLED=0)
+HTTP_CACHE = get_default_cache()
+
+def fetch_city_weather(session: requests.Session, city: str, api_key: str, date_str: str) -> bool:
+    """
+    Extrait et sauvegarde les données météo actuelles d'une seule ville
+
+    Args:
+        session (requests.Session): Session HTTP partagée
+        city (str): Nom de la ville à interroger
+        api_key (str): Clé d'API OpenWeather
+        date_str (str): Date d'extraction (YYYY-MM-DD) utilisée pour la partition
+
+    Returns:
+        bool: True si l'extraction réussit pour cette ville
+    """
+    try:
+        # Configuration de la requête API
+        url = f"{OPENWEATHER_BASE_URL}/data/2.5/weather"
+        params = {
+            'q': city,
+            'appid': api_key,
+            'units': 'metric',
+            'lang': 'fr'
+        }
+        
+        # Envoi de la requête
+        response = get_with_retry(session, url, params, timeout=10, limiter=OPENWEATHER_LIMITER,
+                                  cache=HTTP_CACHE)
+        response.raise_for_status()
+        
+        # Extraction des données
+        data = response.json()
+        weather_data = {
+            'ville': city,
+            'pays': data.get('sys', {}).get('country', 'Inconnu'),
+            'date_extraction': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'timestamp_donnees': data['dt'],
+            'temperature': data['main']['temp'],
+            'temp_min': data['main']['temp_min'],
+            'temp_max': data['main']['temp_max'],
+            'humidite': data['main']['humidity'],
+            'pression': data['main']['pressure'],
+            'vent_vitesse': data['wind']['speed'],
+            'vent_direction': data['wind'].get('deg', None),
+            'precipitation': data.get('rain', {}).get('1h', 0),
+            'couverture_nuageuse': data['clouds']['all'],
+            'conditions': data['weather'][0]['description'],
+            'timezone': data.get('timezone', None)
+        }
+        
+        # Sauvegarde en CSV
+        df = pd.DataFrame([weather_data])
+        # Le nom du fichier est systématiquement basé sur la ville extraite, dans la
+        # partition du jour (compactée ensuite par merge.compact_current_partitions)
+        file_path = f"{CURRENT_INPUT_DIR}/date={date_str}/{city}.csv"
+        df.to_csv(file_path, index=False)
+        
+        logging.info(f"Données actuelles extraites avec succès pour {city}")
+        return True
+        
+    except requests.exceptions.RequestException as e:
+        logging.error(f"Erreur réseau/API pour {city}: {str(e)}")
+    except KeyError as e:
+        logging.error(f"Champ manquant dans la réponse pour {city}: {str(e)}")
+    except Exception as e:
+        logging.error(f"Erreur inattendue pour {city}: {str(e)}")
+    
+    return False
+
+@instrument
+def extract_current_weather(cities: list, api_key: str, max_workers: int = None) -> bool:
     """
     Extrait les données météo actuelles pour plusieurs villes via l'API OpenWeather
     
+    Les villes sont interrogées en parallèle par un pool de threads borné qui
+    partage une seule session HTTP (connexions keep-alive).
+    
     Args:
         cities (list): Liste des noms de villes à interroger
         api_key (str): Clé d'API OpenWeather
+        max_workers (int): Nombre maximal de requêtes simultanées
+            (par défaut EXTRACT_MAX_WORKERS, 1 pour une extraction séquentielle)
         
     Returns:
         bool: True si l'extraction réussit pour au moins une ville
         
     Exemple:
-        >>> extract_current_weather(["Paris", "Antananarivo"], "abc123")
+        >>> extract_current_weather(["Paris", "Antananarivo"], "abc123", max_workers=4)
     """
-    successful_extractions = 0
+    if not cities:
+        return False
+
+    add_log_file("weather_extraction.log")
     date_str = datetime.now().strftime("%Y-%m-%d")
-    os.makedirs("data/current", exist_ok=True)
+    os.makedirs(f"{CURRENT_INPUT_DIR}/date={date_str}", exist_ok=True)
+    workers = max(1, min(max_workers or MAX_WORKERS, len(cities)))
     
-    for city in cities:
-        try:
-            # Configuration de la requête API
-            url = "https://api.openweathermap.org/data/2.5/weather"
-            params = {
-                'q': city,
-                'appid': api_key,
-                'units': 'metric',
-                'lang': 'fr'
-            }
-            
-            # Envoi de la requête
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            
-            # Extraction des données
-            data = response.json()
-            weather_data = {
-                'ville': city,
-                'pays': data.get('sys', {}).get('country', 'Inconnu'),
-                'date_extraction': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                'timestamp_donnees': data['dt'],
-                'temperature': data['main']['temp'],
-                'temp_min': data['main']['temp_min'],
-                'temp_max': data['main']['temp_max'],
-                'humidite': data['main']['humidity'],
-                'pression': data['main']['pressure'],
-                'vent_vitesse': data['wind']['speed'],
-                'vent_direction': data['wind'].get('deg', None),
-                'precipitation': data.get('rain', {}).get('1h', 0),
-                'couverture_nuageuse': data['clouds']['all'],
-                'conditions': data['weather'][0]['description'],
-                'timezone': data.get('timezone', None)
+    # Résultat de l'extraction pour chaque ville
+    results = {}
+    with create_session(workers) as session:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(fetch_city_weather, session, city, api_key, date_str): city
+                for city in cities
             }
-            
-            # Sauvegarde en CSV
-            df = pd.DataFrame([weather_data])
-            # CORRECTION : Nom du fichier pour correspondre à la ville.
-            # L'exemple donné pour Sydney/São Paulo indiquait une confusion.
-            # Le nom du fichier sera maintenant systématiquement basé sur la ville extraite.
-            file_path = f"data/current/{date_str}_{city}.csv" 
-            df.to_csv(file_path, index=False)
-            
-            successful_extractions += 1
-            logging.info(f"Données actuelles extraites avec succès pour {city}")
-            
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Erreur réseau/API pour {city}: {str(e)}")
-        except KeyError as e:
-            logging.error(f"Champ manquant dans la réponse pour {city}: {str(e)}")
-        except Exception as e:
-            logging.error(f"Erreur inattendue pour {city}: {str(e)}")
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+    
+    successful_extractions = sum(results.values())
+    record(rows_in=len(cities), rows_out=successful_extractions)
+    failed = [city for city in cities if not results.get(city)]
+    logging.info(f"Extraction actuelle terminée : {successful_extractions}/{len(cities)} villes réussies")
+    if failed:
+        logging.warning(f"Villes en échec : {', '.join(failed)}")
+    if HTTP_CACHE is not None:
+        HTTP_CACHE.log_stats()
     
     return successful_extractions > 0
 
 if __name__ == "__main__":
+    # Configuration du logging
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
     # Configuration
     API_KEY = os.getenv("API_KEY") 
-    VILLES = ["Paris", "New York", "Tokyo", "Sydney", "São Paulo", "Moscow", "Antananarivo"]
     
-    # Extraction des données
-    extract_current_weather(VILLES, API_KEY)
\ No newline at end of file
+    # Extraction des données (villes du référentiel script/cities.py)
+    extract_current_weather(CITIES, API_KEY)
\ No newline at end of file
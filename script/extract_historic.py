@@ -1,111 +1,361 @@
+import argparse
 import os
 import requests
 import pandas as pd
 from datetime import datetime, timedelta
 import logging
-import time # Ajout pour la pause
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from script.cities import CITIES, get_city_coordinates
+from script.http_cache import get_default_cache
+from script.http_client import create_session, get_with_retry, shared_limiter
+from script.hourly import HOURLY_ENABLED, HOURLY_VARIABLES, build_hourly_frame, hourly_start_date, save_hourly_frame
+from script.metrics import add_log_file, instrument, record
+from script.paths import HISTORICAL_INPUT_DIR, historical_file_path
 
-# Configuration du logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
-                    handlers=[
-                        logging.FileHandler("data/historical_extraction.log"), # Assurez-vous que ce fichier est dans data
-                        logging.StreamHandler()
-                    ])
+# Nombre maximal de requêtes d'archive simultanées
+MAX_WORKERS = int(os.getenv("HISTORICAL_MAX_WORKERS", "4"))
 
-def extract_historical_weather(latitude: float, longitude: float, city: str) -> bool:
+# Nombre de villes regroupées dans une même requête d'archive
+BATCH_SIZE = int(os.getenv("OPEN_METEO_BATCH_SIZE", "10"))
+
+# Limiteur de débit partagé remplaçant l'ancienne pause fixe de 2 secondes,
+# divisé entre les processus d'extraction simultanés (HTTP_RATE_SHARES)
+OPEN_METEO_LIMITER = shared_limiter(
+    rate=float(os.getenv("OPEN_METEO_RATE", "2")),
+    burst=int(os.getenv("OPEN_METEO_BURST", "4"))
+)
+
+# URL de base de l'API d'archive (remplaçable par le serveur simulé script/mock_server.py)
+OPEN_METEO_BASE_URL = os.getenv("OPEN_METEO_BASE_URL", "https://archive-api.open-meteo.com").rstrip('/')
+
+# Cache disque des réponses HTTP (None si HTTP_CACHE_ENABLED=0)
+HTTP_CACHE = get_default_cache()
+
+# Profondeur de l'historique pour une ville jamais extraite (backfill complet)
+HISTORY_DAYS = 3*365 # 3 ans pour avoir des données suffisantes
+
+# Colonnes de mesures : une ligne est complète si aucune n'est vide
+MEASURE_COLUMNS = ['temp_max', 'temp_min', 'precipitation', 'pluie', 'neige']
+
+def load_stored_history(city: str) -> pd.DataFrame:
     """
-    Extrait les données météo historiques via l'API Open-Meteo
+    Charge l'historique déjà stocké pour une ville
+
+    Returns:
+        pd.DataFrame: Historique existant (vide si le fichier n'existe pas ou est illisible)
+    """
+    file_path = historical_file_path(city)
+    if not os.path.exists(file_path) or os.path.getsize(file_path) == 0:
+        return pd.DataFrame()
+    try:
+        return pd.read_csv(file_path)
+    except Exception as e:
+        logging.warning(f"Historique existant illisible pour {city}, backfill complet : {e}")
+        return pd.DataFrame()
+
+def get_high_water_mark(stored: pd.DataFrame):
+    """
+    Retourne la dernière date complète (toutes les mesures renseignées) d'un historique
+
+    Les derniers jours renvoyés par l'API d'archive sont souvent incomplets : ils ne
+    comptent pas dans la marque haute et seront donc redemandés au prochain run.
+
+    Returns:
+        datetime | None: Dernière date complète, None si aucun historique exploitable
+    """
+    if stored.empty or 'date' not in stored.columns:
+        return None
+    complete = stored.dropna(subset=[c for c in MEASURE_COLUMNS if c in stored.columns])
+    if complete.empty:
+        return None
+    return pd.to_datetime(complete['date']).max().to_pydatetime()
+
+def save_historical_frame(city: str, df: pd.DataFrame, stored: pd.DataFrame, start_date: datetime):
+    """
+    Ajoute les nouvelles lignes au fichier historique de la ville
+
+    Les lignes existantes à partir de `start_date` (jours incomplets déjà stockés) sont
+    remplacées ; sinon les nouvelles lignes sont simplement ajoutées en fin de fichier.
+    """
+    os.makedirs(HISTORICAL_INPUT_DIR, exist_ok=True)
+    file_path = historical_file_path(city)
+
+    if stored.empty:
+        df.to_csv(file_path, index=False)
+        return
+
+    kept = stored[pd.to_datetime(stored['date']) < pd.Timestamp(start_date.date())]
+    if len(kept) == len(stored):
+        df.to_csv(file_path, mode='a', header=False, index=False)
+    else:
+        pd.concat([kept, df], ignore_index=True)[stored.columns].to_csv(file_path, index=False)
+
+def plan_extraction(city: str, end_date: datetime, full_backfill: bool = False):
+    """
+    Détermine la période à extraire pour une ville à partir de sa marque haute
+
+    Returns:
+        tuple: (historique stocké, date de début) ou (historique stocké, None) si la ville est à jour
+    """
+    stored = pd.DataFrame() if full_backfill else load_stored_history(city)
+    last_date = get_high_water_mark(stored)
+
+    if last_date is None:
+        # Backfill complet (nouvelle ville ou mode forcé)
+        return pd.DataFrame(), end_date - timedelta(days=HISTORY_DAYS)
+
+    start_date = last_date + timedelta(days=1)
+    if start_date.date() > end_date.date():
+        logging.info(f"Historique déjà à jour pour {city} (dernière date : {last_date:%Y-%m-%d})")
+        return stored, None
+    return stored, start_date
+
+def build_daily_frame(city: str, daily_data: dict) -> pd.DataFrame:
+    """Convertit le bloc 'daily' d'une réponse Open-Meteo au format ville,date,temp_max,..."""
+    return pd.DataFrame({
+        'ville': city,
+        'date': daily_data['time'],
+        'temp_max': daily_data['temperature_2m_max'],
+        'temp_min': daily_data['temperature_2m_min'],
+        'precipitation': daily_data['precipitation_sum'],
+        'pluie': daily_data['rain_sum'],
+        'neige': daily_data['snowfall_sum']
+    })
+
+def plan_hourly_extraction(city: str, end_date: datetime, full_backfill: bool = False):
+    """
+    Détermine la période horaire à extraire pour une ville (table data/historical_hourly)
+
+    Returns:
+        datetime | None: Date de début, None si la table horaire est à jour
+    """
+    start_date = None if full_backfill else hourly_start_date(city)
+    if start_date is None:
+        return end_date - timedelta(days=HISTORY_DAYS)
+    if start_date.date() >= end_date.date():
+        return None
+    return start_date
+
+def extract_historical_weather_batch(locations: list, session=None, full_backfill: bool = False,
+                                     hourly: bool = None) -> dict:
+    """
+    Extrait les données historiques de plusieurs villes en une seule requête Open-Meteo
+    
+    L'API accepte des listes de latitudes/longitudes séparées par des virgules et renvoie
+    une liste de réponses dans le même ordre. Les villes du lot sont regroupées par plan
+    d'extraction (dates de début journalière et horaire) : une requête par groupe, chaque
+    ville n'étant demandée qu'à partir de ses propres jours manquants.
     
     Args:
-        latitude (float): Latitude de la ville
-        longitude (float): Longitude de la ville
-        city (str): Nom de la ville pour le nommage
+        locations (list): Liste de tuples (ville, latitude, longitude)
+        session (requests.Session): Session HTTP partagée (optionnelle)
+        full_backfill (bool): Ignore l'historique existant et réextrait toute la période
+        hourly (bool): Extrait aussi les mesures horaires (HISTORICAL_HOURLY par défaut)
         
     Returns:
-        bool: True si l'extraction réussit, False sinon
+        dict: {ville: True si l'extraction réussit, False sinon}
+        
+    Exemple:
+        >>> extract_historical_weather_batch([("Paris", 48.8566, 2.3522), ("Tokyo", 35.6762, 139.6503)])
     """
+    results = {}
+    pending = []
+    end_date = datetime.now()
+    hourly = HOURLY_ENABLED if hourly is None else hourly
+    
+    for city, latitude, longitude in locations:
+        try:
+            stored, start_date = plan_extraction(city, end_date, full_backfill)
+            hourly_start = plan_hourly_extraction(city, end_date, full_backfill) if hourly else None
+        except Exception as e:
+            logging.error(f"Erreur inattendue pour {city}: {str(e)}")
+            results[city] = False
+            continue
+        if start_date is None and hourly_start is None:
+            results[city] = True
+        else:
+            pending.append((city, latitude, longitude, stored, start_date, hourly_start))
+    
+    # Une requête par groupe de villes ayant le même plan : une ville à jour n'est jamais
+    # redemandée depuis la date de début d'une ville nouvelle du même lot
+    groups = {}
+    for entry in pending:
+        *_, start_date, hourly_start = entry
+        key = tuple(start.date() if start is not None else None for start in (start_date, hourly_start))
+        groups.setdefault(key, []).append(entry)
+    for group in groups.values():
+        results.update(extract_archive_group(group, end_date, session))
+    return results
+
+def extract_archive_group(group: list, end_date: datetime, session=None) -> dict:
+    """
+    Extrait en une seule requête Open-Meteo un groupe de villes de même plan
+    (mêmes dates de début journalière et horaire), puis découpe la réponse par ville
+
+    Args:
+        group (list): Tuples (ville, latitude, longitude, historique stocké, début journalier, début horaire)
+        end_date (datetime): Dernier jour demandé
+        session (requests.Session): Session HTTP partagée (optionnelle)
+
+    Returns:
+        dict: {ville: True si l'extraction réussit, False sinon}
+    """
+    results = {}
+    cities_label = ", ".join(city for city, *_ in group)
+    *_, start_date, hourly_start = group[0]
+    hourly = hourly_start is not None
     try:
-        # Calcul des dates (3 dernières années)
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=3*365) # 3 ans pour avoir des données suffisantes
+        group_start = min(start for start in (start_date, hourly_start) if start is not None)
         
         # Configuration de la requête API
-        url = "https://archive-api.open-meteo.com/v1/archive"
+        url = f"{OPEN_METEO_BASE_URL}/v1/archive"
         params = {
-            'latitude': latitude,
-            'longitude': longitude,
-            'start_date': start_date.strftime("%Y-%m-%d"),
+            'latitude': ",".join(str(latitude) for _, latitude, *_ in group),
+            'longitude': ",".join(str(longitude) for _, _, longitude, *_ in group),
+            'start_date': group_start.strftime("%Y-%m-%d"),
             'end_date': end_date.strftime("%Y-%m-%d"),
             'daily': ['temperature_2m_max', 'temperature_2m_min', 
                       'precipitation_sum', 'rain_sum', 'snowfall_sum'],
             'timezone': 'auto'
         }
+        if hourly:
+            # Même requête : heures locales, pression au niveau de la mer, vent en m/s
+            params['hourly'] = list(HOURLY_VARIABLES)
+            params['wind_speed_unit'] = 'ms'
         
         # Envoi de la requête
-        response = requests.get(url, params=params, timeout=30)
+        response = get_with_retry(session or requests, url, params, timeout=30,
+                                  limiter=OPEN_METEO_LIMITER, cache=HTTP_CACHE)
         response.raise_for_status()
         
-        # Traitement des données
+        # Une seule coordonnée : l'API renvoie un objet au lieu d'une liste
         data = response.json()
-        daily_data = data['daily']
-        
-        df = pd.DataFrame({
-            'ville': city,
-            'date': daily_data['time'],
-            'temp_max': daily_data['temperature_2m_max'],
-            'temp_min': daily_data['temperature_2m_min'],
-            'precipitation': daily_data['precipitation_sum'],
-            'pluie': daily_data['rain_sum'],
-            'neige': daily_data['snowfall_sum']
-        })
-        
-        # Sauvegarde en CSV
-        os.makedirs("data/historical", exist_ok=True)
-        file_path = f"data/historical/{city.lower().replace(' ', '_')}_historical.csv"
-        df.to_csv(file_path, index=False)
-        
-        return True
-        
+        payloads = data if isinstance(data, list) else [data]
+        if len(payloads) != len(group):
+            raise ValueError(f"{len(payloads)} réponses reçues pour {len(group)} villes")
+    
     except requests.exceptions.RequestException as e:
-        logging.error(f"Erreur réseau/API pour {city}: {str(e)}")
-    except KeyError as e:
-        logging.error(f"Champ manquant dans la réponse pour {city}: {str(e)}")
+        logging.error(f"Erreur réseau/API pour {cities_label}: {str(e)}")
+        return {city: False for city, *_ in group}
     except Exception as e:
-        logging.error(f"Erreur inattendue pour {city}: {str(e)}")
-        
-    return False
-
-def get_city_coordinates(city: str) -> tuple:
-    """Retourne les coordonnées (latitude, longitude) pour une ville donnée"""
-    CITY_COORDINATES = {
-        "Paris": (48.8566, 2.3522),
-        "New York": (40.7128, -74.0060),
-        "Tokyo": (35.6762, 139.6503),
-        "Sydney": (-33.8688, 151.2093),
-        "Moscow": (55.7558, 37.6173),
-        "Antananarivo": (-18.8792, 47.5079),
-        "São Paulo": (-23.5505, -46.6333) # Ajout de São Paulo
-    }
-    return CITY_COORDINATES.get(city, (None, None))
-
-def main():
-    """Fonction principale pour l'extraction des données historiques"""
-    CITIES = ["Paris", "New York", "Tokyo", "Sydney", "São Paulo", "Moscow", "Antananarivo"] # Assurez-vous que toutes les villes sont ici
+        logging.error(f"Erreur inattendue pour {cities_label}: {str(e)}")
+        return {city: False for city, *_ in group}
+    
+    # Découpage de la réponse en fichiers par ville
+    for (city, _, _, stored, start_date, hourly_start), payload in zip(group, payloads):
+        try:
+            if start_date is not None:
+                df = build_daily_frame(city, payload['daily'])
+                df = df[pd.to_datetime(df['date']) >= pd.Timestamp(start_date.date())]
+                
+                # Sauvegarde en CSV (ajout des jours manquants)
+                save_historical_frame(city, df, stored, start_date)
+                logging.info(f"{len(df)} jours extraits pour {city} depuis le {start_date:%Y-%m-%d}")
+            if hourly_start is not None:
+                hourly_df = build_hourly_frame(city, payload['hourly'], payload.get('utc_offset_seconds', 0))
+                path = save_hourly_frame(city, hourly_df, hourly_start)
+                logging.info(f"Mesures horaires de {city} enregistrées depuis le {hourly_start:%Y-%m-%d} : {path}")
+            results[city] = True
+        except KeyError as e:
+            logging.error(f"Champ manquant dans la réponse pour {city}: {str(e)}")
+            results[city] = False
+        except Exception as e:
+            logging.error(f"Erreur inattendue pour {city}: {str(e)}")
+            results[city] = False
+    
+    return results
+
+@instrument
+def extract_historical_weather(latitude: float, longitude: float, city: str, session=None,
+                               full_backfill: bool = False, hourly: bool = None) -> bool:
+    """
+    Extrait les données météo historiques via l'API Open-Meteo
+    
+    Par défaut l'extraction est incrémentale : seuls les jours postérieurs à la dernière
+    date complète déjà stockée dans data/historical/ sont demandés puis ajoutés au fichier.
+    Une ville sans historique est extraite sur HISTORY_DAYS jours (backfill complet).
     
-    for city in CITIES:
+    Args:
+        latitude (float): Latitude de la ville
+        longitude (float): Longitude de la ville
+        city (str): Nom de la ville pour le nommage
+        session (requests.Session): Session HTTP partagée (optionnelle)
+        full_backfill (bool): Ignore l'historique existant et réextrait toute la période
+        hourly (bool): Extrait aussi les mesures horaires (HISTORICAL_HOURLY par défaut)
+        
+    Returns:
+        bool: True si l'extraction réussit, False sinon
+    """
+    results = extract_historical_weather_batch([(city, latitude, longitude)], session, full_backfill, hourly)
+    record(rows_in=1, rows_out=int(results.get(city, False)))
+    return results.get(city, False)
+
+def extract_batch(session, cities: list, full_backfill: bool = False, hourly: bool = None) -> int:
+    """Extrait un lot de villes à partir de leurs coordonnées et retourne le nombre de succès"""
+    locations = []
+    for city in cities:
         lat, lon = get_city_coordinates(city)
-        if lat is not None and lon is not None:
-            success = extract_historical_weather(lat, lon, city)
-            if success:
-                logging.info(f"Données historiques pour {city} extraites avec succès")
-            else:
-                logging.error(f"Échec de l'extraction des données historiques pour {city}")
-        else:
+        if lat is None or lon is None:
             logging.error(f"Coordonnées non trouvées pour {city}")
-        
-        # NOUVEAU : Ajouter un délai pour éviter les erreurs "Too Many Requests"
-        time.sleep(2) # Attendre 2 secondes entre chaque requête API
-        logging.info(f"Pause de 2 secondes avant d'extraire les données de la prochaine ville.")
+        else:
+            locations.append((city, lat, lon))
+
+    if not locations:
+        return 0
+
+    results = extract_historical_weather_batch(locations, session=session, full_backfill=full_backfill,
+                                               hourly=hourly)
+    for city, success in results.items():
+        if success:
+            logging.info(f"Données historiques pour {city} extraites avec succès")
+        else:
+            logging.error(f"Échec de l'extraction des données historiques pour {city}")
+    return sum(results.values())
+
+@instrument(name='extract_historical')
+def main(max_workers: int = None, full_backfill: bool = False, batch_size: int = None, cities: list = None,
+         hourly: bool = None):
+    """
+    Fonction principale pour l'extraction des données historiques
+
+    Les villes sont regroupées par lots de `batch_size` (une requête Open-Meteo par lot).
+    Les requêtes sont cadencées par le limiteur OPEN_METEO_LIMITER (débit et rafale
+    configurables) et plusieurs lots sont extraits en parallèle si le quota le permet.
+    Avec full_backfill=True, tout l'historique est réextrait au lieu des seuls jours manquants.
+    La liste `cities` remplace les villes du référentiel (script/cities.py).
+    Avec hourly=True (ou HISTORICAL_HOURLY=1), les mesures horaires sont aussi extraites
+    dans data/historical_hourly/.
+
+    Returns:
+        int: Nombre de villes extraites avec succès
+    """
+    add_log_file("historical_extraction.log")
+    villes = cities or CITIES
+    size = max(1, batch_size or BATCH_SIZE)
+    batches = [villes[i:i + size] for i in range(0, len(villes), size)]
+    workers = max(1, min(max_workers or MAX_WORKERS, len(batches)))
+
+    with create_session(workers) as session:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(extract_batch, session, batch, full_backfill, hourly) for batch in batches]
+            successes = sum(future.result() for future in as_completed(futures))
+    record(rows_in=len(villes), rows_out=successes)
+
+    logging.info(f"Extraction historique terminée : {successes}/{len(villes)} villes réussies "
+                 f"({len(batches)} requêtes)")
+    if HTTP_CACHE is not None:
+        HTTP_CACHE.log_stats()
+    return successes
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # Configuration du logging
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Extraction des données historiques Open-Meteo")
+    parser.add_argument("--full-backfill", action="store_true",
+                        help="Réextrait tout l'historique au lieu des seuls jours manquants")
+    parser.add_argument("--batch-size", type=int, default=None,
+                        help="Nombre de villes par requête Open-Meteo")
+    parser.add_argument("--hourly", action="store_true", default=None,
+                        help="Extrait aussi les mesures horaires (table data/historical_hourly)")
+    args = parser.parse_args()
+    main(full_backfill=args.full_backfill, batch_size=args.batch_size, hourly=args.hourly)
\ No newline at end of file
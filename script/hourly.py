@@ -0,0 +1,149 @@
+import os
+import logging
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from script.paths import HOURLY_DIR
+from script.schema import HOURLY_SCHEMA, apply_schema
+from script.storage import find_table, list_partitions, partition_base, read_table, write_table
+
+# Table de faits horaire Open-Meteo, une partition colonnaire par ville (HOURLY_DIR)
+HOURLY_FORMAT = os.getenv("HOURLY_FORMAT", "parquet")
+HOURLY_ENABLED = os.getenv("HISTORICAL_HOURLY", "0") == "1"
+
+# Variables horaires demandées à l'API d'archive -> colonnes de la table horaire
+# (pression au niveau de la mer et vent en m/s, comme les données actuelles OpenWeather)
+HOURLY_VARIABLES = {
+    'temperature_2m': 'temperature',
+    'relative_humidity_2m': 'humidite',
+    'pressure_msl': 'pression',
+    'wind_speed_10m': 'vent_vitesse',
+    'precipitation': 'precipitation',
+}
+HOURLY_MEASURES = list(HOURLY_VARIABLES.values())
+
+# Mesures journalières obtenues par rééchantillonnage (moyenne des heures du jour local)
+DAILY_MEASURES = ['temperature', 'humidite', 'pression', 'vent_vitesse']
+
+SECONDS_PER_DAY = 86400
+
+def hourly_base(city: str) -> str:
+    return partition_base(HOURLY_DIR, 'ville', city)
+
+def build_hourly_frame(city: str, hourly_data: dict, utc_offset: int) -> pd.DataFrame:
+    """
+    Convertit le bloc 'hourly' d'une réponse Open-Meteo (heures locales ISO, timezone=auto)
+    au format ville, timestamp (UTC), timezone (décalage en secondes), mesures
+    """
+    local = pd.to_datetime(pd.Series(hourly_data['time'])).to_numpy().astype('datetime64[s]').astype(np.int64)
+    df = pd.DataFrame({
+        'ville': city,
+        'timestamp': local - utc_offset,
+        'timezone': utc_offset,
+    })
+    for variable, column in HOURLY_VARIABLES.items():
+        df[column] = hourly_data.get(variable, np.nan)
+    return apply_schema(df, HOURLY_SCHEMA)
+
+def local_days(df: pd.DataFrame) -> np.ndarray:
+    """Jour local (nombre de jours depuis 1970-01-01) de chaque heure"""
+    timestamps = df['timestamp'].to_numpy(dtype=np.int64) + df['timezone'].to_numpy(dtype=np.int64)
+    return timestamps // SECONDS_PER_DAY
+
+def load_hourly(city: str, columns: list = None) -> pd.DataFrame:
+    """Charge la partition horaire d'une ville (vide si elle n'existe pas)"""
+    base = hourly_base(city)
+    if find_table(base, HOURLY_FORMAT) is None:
+        return pd.DataFrame(columns=columns or ['ville', 'timestamp', 'timezone'] + HOURLY_MEASURES)
+    return read_table(base, columns=columns, fmt=HOURLY_FORMAT, schema=HOURLY_SCHEMA)
+
+def hourly_start_date(city: str):
+    """
+    Premier jour à (re)demander pour la table horaire d'une ville : le jour de la dernière
+    heure complète (souvent partiel, il est redemandé en entier)
+
+    Returns:
+        datetime | None: None si la ville n'a pas encore d'historique horaire
+    """
+    stored = load_hourly(city)
+    complete = stored.dropna(subset=DAILY_MEASURES)
+    if complete.empty:
+        return None
+    return (pd.Timestamp(0) + pd.Timedelta(days=int(local_days(complete).max()))).to_pydatetime()
+
+def save_hourly_frame(city: str, df: pd.DataFrame, start_date: datetime) -> str:
+    """
+    Remplace les heures de la ville à partir du jour local `start_date` par celles extraites
+    """
+    start_day = (pd.Timestamp(start_date.date()) - pd.Timestamp(0)) // pd.Timedelta(days=1)
+    stored = load_hourly(city)
+    kept = stored[local_days(stored) < start_day] if not stored.empty else stored
+    new = df[local_days(df) >= start_day]
+    merged = pd.concat([kept, new], ignore_index=True) if not kept.empty else new
+    merged = merged.sort_values('timestamp').reset_index(drop=True)
+    return write_table(merged, hourly_base(city), fmt=HOURLY_FORMAT, schema=HOURLY_SCHEMA)
+
+def resample_daily(hourly: pd.DataFrame) -> pd.DataFrame:
+    """
+    Rééchantillonne des heures en jours locaux : moyenne des mesures DAILY_MEASURES par
+    (ville, date), calculée sans regroupement pandas (clés entières et np.bincount)
+
+    Returns:
+        pd.DataFrame: ville, date (YYYY-MM-DD) et mesures journalières
+    """
+    if hourly.empty:
+        return pd.DataFrame(columns=['ville', 'date'] + DAILY_MEASURES)
+
+    codes, villes = pd.factorize(hourly['ville'])
+    days = local_days(hourly)
+    first_day = days.min()
+    span = days.max() - first_day + 1
+    keys, inverse = np.unique(codes.astype(np.int64) * span + (days - first_day), return_inverse=True)
+
+    columns = {
+        'ville': np.asarray(villes)[keys // span],
+        'date': (np.datetime64('1970-01-01', 'D') + (keys % span + first_day)).astype(str),
+    }
+    for measure in DAILY_MEASURES:
+        values = hourly[measure].to_numpy(dtype=np.float64, na_value=np.nan)
+        valid = ~np.isnan(values)
+        counts = np.bincount(inverse, weights=valid, minlength=len(keys))
+        sums = np.bincount(inverse, weights=np.where(valid, values, 0.0), minlength=len(keys))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            columns[measure] = np.where(counts > 0, sums / counts, np.nan)
+    return pd.DataFrame(columns)
+
+def add_hourly_measures(historical: pd.DataFrame) -> pd.DataFrame:
+    """
+    Complète l'historique journalier (ville, date, ...) avec la température moyenne,
+    l'humidité, la pression et le vent issus de la table horaire
+
+    Les partitions horaires sont lues et rééchantillonnées ville par ville : seul le
+    résultat journalier (24 fois plus petit) est conservé en mémoire. Sans table horaire,
+    l'historique est retourné inchangé.
+    """
+    if historical.empty or not list_partitions(HOURLY_DIR):
+        return historical
+
+    frames = []
+    for ville in pd.unique(historical['ville'].dropna()):
+        hourly = load_hourly(ville, columns=['ville', 'timestamp', 'timezone'] + DAILY_MEASURES)
+        if not hourly.empty:
+            frames.append(resample_daily(hourly))
+    if not frames:
+        return historical
+
+    daily = pd.concat(frames, ignore_index=True)
+    keys = pd.DataFrame({
+        'ville': historical['ville'].astype(str).to_numpy(),
+        'date': pd.to_datetime(historical['date']).dt.strftime('%Y-%m-%d').to_numpy(),
+    })
+    measures = keys.merge(daily, on=['ville', 'date'], how='left')
+    enriched = historical.copy()
+    for measure in DAILY_MEASURES:
+        enriched[measure] = measures[measure].to_numpy()
+    logging.debug(f"Mesures horaires rééchantillonnées pour {len(frames)} villes "
+                 f"({int(measures['humidite'].notna().sum())} jours complétés)")
+    return enriched
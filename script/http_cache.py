@@ -0,0 +1,202 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlparse
+
+import requests
+
+from script.paths import DATA_DIR
+
+# Paramètres exclus de la clé de cache (et jamais écrits sur disque)
+SECRET_PARAMS = {'appid', 'apikey', 'api_key', 'key'}
+
+# Durées de vie par défaut (en secondes)
+CURRENT_TTL = int(os.getenv("HTTP_CACHE_CURRENT_TTL", str(10 * 60)))          # données actuelles : minutes
+ARCHIVE_TTL = int(os.getenv("HTTP_CACHE_ARCHIVE_TTL", str(7 * 24 * 3600)))    # archive consolidée : jours
+RECENT_ARCHIVE_TTL = int(os.getenv("HTTP_CACHE_RECENT_ARCHIVE_TTL", "3600"))  # archive de moins d'une semaine
+
+# En-têtes conservés avec la réponse (revalidation conditionnelle)
+KEPT_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+class ResponseCache:
+    """
+    Cache disque des réponses HTTP (un fichier JSON par requête).
+
+    - Clé : endpoint + paramètres triés, sans la clé d'API
+    - Durée de vie par endpoint (voir ttl_for)
+    - Revalidation conditionnelle (If-None-Match / If-Modified-Since) d'une entrée expirée
+    - Éviction LRU (date de dernier accès) au-delà de `max_bytes`
+    - Compteurs de hits/misses journalisés par log_stats()
+    """
+
+    def __init__(self, cache_dir: str = f"{DATA_DIR}/cache/http", max_bytes: int = 200 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.stats = {'hits': 0, 'misses': 0, 'revalidated': 0, 'stored': 0, 'evicted': 0}
+        self._lock = threading.Lock()
+        self._total_bytes = None
+
+    @staticmethod
+    def public_params(params: dict) -> dict:
+        """Retourne les paramètres sans les secrets (clé d'API)"""
+        return {k: v for k, v in (params or {}).items() if k.lower() not in SECRET_PARAMS}
+
+    def key(self, url: str, params: dict) -> str:
+        """Calcule la clé de cache d'une requête"""
+        payload = json.dumps([url, self.public_params(params)], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def ttl_for(self, url: str, params: dict) -> int:
+        """
+        Durée de vie d'une réponse selon l'endpoint
+
+        - /data/2.5/weather : quelques minutes
+        - /v1/archive : plusieurs jours si la période se termine il y a plus d'une semaine,
+          sinon une heure (les derniers jours de l'archive sont encore consolidés)
+        - autres endpoints : pas de cache
+        """
+        path = urlparse(url).path
+        if path.endswith('/data/2.5/weather'):
+            return CURRENT_TTL
+        if path.endswith('/v1/archive'):
+            try:
+                end_date = datetime.strptime(str(params.get('end_date')), "%Y-%m-%d")
+            except ValueError:
+                return RECENT_ARCHIVE_TTL
+            if end_date < datetime.now() - timedelta(days=7):
+                return ARCHIVE_TTL
+            return RECENT_ARCHIVE_TTL
+        return 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def lookup(self, url: str, params: dict):
+        """
+        Recherche une entrée en cache
+
+        Returns:
+            dict | None: Entrée (avec le champ 'fresh') ou None si absente
+        """
+        if self.ttl_for(url, params) <= 0:
+            return None
+        path = self._path(self.key(url, params))
+        try:
+            with open(path, encoding='utf-8') as f:
+                entry = json.load(f)
+            os.utime(path)  # dernier accès, pour l'éviction LRU
+        except (OSError, ValueError):
+            return None
+        entry['fresh'] = time.time() - entry['fetched_at'] < self.ttl_for(url, params)
+        return entry
+
+    @staticmethod
+    def conditional_headers(entry) -> dict:
+        """En-têtes de revalidation conditionnelle pour une entrée expirée"""
+        headers = {}
+        if entry:
+            if entry['headers'].get('ETag'):
+                headers['If-None-Match'] = entry['headers']['ETag']
+            if entry['headers'].get('Last-Modified'):
+                headers['If-Modified-Since'] = entry['headers']['Last-Modified']
+        return headers
+
+    def record_hit(self, url: str):
+        with self._lock:
+            self.stats['hits'] += 1
+        logging.debug(f"Cache HTTP : hit pour {url}")
+
+    def record_miss(self, url: str):
+        with self._lock:
+            self.stats['misses'] += 1
+        logging.debug(f"Cache HTTP : miss pour {url}")
+
+    def revalidate(self, url: str, params: dict, entry: dict):
+        """Prolonge une entrée confirmée par une réponse 304 Not Modified"""
+        entry['fetched_at'] = time.time()
+        self._write(self.key(url, params), entry)
+        with self._lock:
+            self.stats['revalidated'] += 1
+
+    def store(self, url: str, params: dict, response: requests.Response):
+        """Enregistre une réponse réussie si l'endpoint est cacheable"""
+        if self.ttl_for(url, params) <= 0 or response.status_code != 200:
+            return
+        entry = {
+            'url': url,
+            'params': self.public_params(params),
+            'fetched_at': time.time(),
+            'status_code': response.status_code,
+            'headers': {h: response.headers[h] for h in KEPT_HEADERS if h in response.headers},
+            'body': response.text,
+        }
+        self._write(self.key(url, params), entry)
+        with self._lock:
+            self.stats['stored'] += 1
+
+    def _write(self, key: str, entry: dict):
+        entry = {k: v for k, v in entry.items() if k != 'fresh'}
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f)
+        with self._lock:
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+            if self._total_bytes is not None:
+                self._total_bytes += os.path.getsize(path) - old_size
+        self.evict()
+
+    def evict(self):
+        """Supprime les entrées les moins récemment utilisées au-delà de max_bytes"""
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(e.stat().st_size for e in os.scandir(self.cache_dir)
+                                        if e.name.endswith('.json'))
+            if self._total_bytes <= self.max_bytes:
+                return
+            entries = sorted((e for e in os.scandir(self.cache_dir) if e.name.endswith('.json')),
+                             key=lambda e: e.stat().st_mtime)
+            for e in entries:
+                if self._total_bytes <= self.max_bytes:
+                    break
+                size = e.stat().st_size
+                try:
+                    os.remove(e.path)
+                except OSError:
+                    continue
+                self._total_bytes -= size
+                self.stats['evicted'] += 1
+
+    @staticmethod
+    def to_response(url: str, entry: dict) -> requests.Response:
+        """Reconstruit un objet requests.Response à partir d'une entrée du cache"""
+        response = requests.Response()
+        response.status_code = entry['status_code']
+        response._content = entry['body'].encode('utf-8')
+        response.encoding = 'utf-8'
+        response.headers.update(entry['headers'])
+        response.url = url
+        return response
+
+    def log_stats(self):
+        """Journalise les compteurs du cache"""
+        logging.info("Cache HTTP : {hits} hits, {misses} misses, {revalidated} revalidations (304), "
+                     "{stored} réponses stockées, {evicted} évictions".format(**self.stats))
+
+def get_default_cache():
+    """
+    Retourne le cache partagé configuré par les variables d'environnement,
+    ou None si HTTP_CACHE_ENABLED vaut 0
+    """
+    if os.getenv("HTTP_CACHE_ENABLED", "1") == "0":
+        return None
+    return ResponseCache(
+        cache_dir=os.getenv("HTTP_CACHE_DIR", f"{DATA_DIR}/cache/http"),
+        max_bytes=int(os.getenv("HTTP_CACHE_MAX_MB", "200")) * 1024 * 1024
+    )
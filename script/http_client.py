@@ -0,0 +1,184 @@
+import email.utils
+import logging
+import os
+import random
+import threading
+import time
+from datetime import datetime, timezone
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Codes HTTP pour lesquels une nouvelle tentative a du sens
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Nombre de processus qui se partagent chaque quota d'API (instances simultanées d'une tâche
+# d'extraction du DAG) : chaque limiteur ne reçoit que sa part du débit et de la rafale
+RATE_LIMIT_SHARES = max(1, int(os.getenv("HTTP_RATE_SHARES", "1")))
+
+class TokenBucket:
+    """
+    Limiteur de débit à seau de jetons, partagé entre plusieurs threads.
+
+    Le seau se remplit de `rate` jetons par seconde, jusqu'à `burst` jetons.
+    Chaque requête consomme un jeton ; si le seau est vide, l'appelant attend.
+
+    Exemple:
+        >>> limiter = TokenBucket(rate=5, burst=10)
+        >>> limiter.acquire()
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        if rate <= 0:
+            raise ValueError("Le débit (rate) doit être strictement positif")
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+        self._paused_until = 0.0
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self):
+        """Bloque jusqu'à ce qu'un jeton soit disponible puis le consomme"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                else:
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        """Suspend la distribution de jetons (ex : après un HTTP 429 avec Retry-After)"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+def shared_limiter(rate: float, burst: int) -> TokenBucket:
+    """
+    Limiteur d'un processus recevant 1/RATE_LIMIT_SHARES du quota (débit et rafale)
+
+    Exemple:
+        >>> limiter = shared_limiter(rate=2, burst=4)  # 0.5 requête/s et rafale de 1 avec 4 parts
+    """
+    return TokenBucket(rate=rate / RATE_LIMIT_SHARES, burst=max(1, burst // RATE_LIMIT_SHARES))
+
+def create_session(pool_size: int) -> requests.Session:
+    """
+    Crée une session HTTP partagée (connexions keep-alive réutilisées)
+
+    Args:
+        pool_size (int): Nombre de connexions conservées dans le pool
+
+    Returns:
+        requests.Session: Session prête à être partagée entre les threads
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def parse_retry_after(value: str):
+    """
+    Convertit un en-tête Retry-After (secondes ou date HTTP) en nombre de secondes
+
+    Returns:
+        float | None: Délai en secondes, None si l'en-tête est absent ou invalide
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+def backoff_delay(attempt: int, base: float, max_delay: float) -> float:
+    """Délai exponentiel avec jitter complet : uniforme entre 0 et base * 2^attempt"""
+    return random.uniform(0, min(max_delay, base * (2 ** attempt)))
+
+def get_with_retry(session, url: str, params: dict, timeout: float, limiter: TokenBucket = None,
+                   max_retries: int = 4, backoff_base: float = 1.0, max_delay: float = 60.0,
+                   cache=None) -> requests.Response:
+    """
+    Envoie une requête GET en respectant le limiteur de débit et en réessayant
+    sur les erreurs transitoires (HTTP 429/5xx, coupure réseau, timeout).
+
+    Si un cache est fourni, une réponse encore valide est renvoyée sans appel réseau ;
+    une réponse expirée est revalidée par une requête conditionnelle (ETag/Last-Modified).
+
+    Args:
+        session: requests.Session partagée (ou le module requests)
+        url (str): URL de l'API
+        params (dict): Paramètres de la requête
+        timeout (float): Timeout de chaque tentative en secondes
+        limiter (TokenBucket): Limiteur de débit partagé (optionnel)
+        max_retries (int): Nombre maximal de nouvelles tentatives
+        backoff_base (float): Délai de base du backoff exponentiel en secondes
+        max_delay (float): Délai maximal entre deux tentatives en secondes
+        cache (ResponseCache): Cache disque des réponses (optionnel)
+
+    Returns:
+        requests.Response: Dernière réponse reçue (l'appelant appelle raise_for_status)
+
+    Raises:
+        requests.exceptions.RequestException: Si la dernière tentative échoue au niveau réseau
+    """
+    entry = cache.lookup(url, params) if cache is not None else None
+    if entry is not None and entry['fresh']:
+        cache.record_hit(url)
+        return cache.to_response(url, entry)
+    headers = cache.conditional_headers(entry) if cache is not None else {}
+
+    for attempt in range(max_retries + 1):
+        if limiter is not None:
+            limiter.acquire()
+        try:
+            response = session.get(url, params=params, timeout=timeout, headers=headers or None)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            if attempt == max_retries:
+                raise
+            delay = backoff_delay(attempt, backoff_base, max_delay)
+            logging.warning(f"Erreur réseau sur {url} ({e}), nouvelle tentative dans {delay:.1f}s")
+            time.sleep(delay)
+            continue
+
+        if response.status_code not in RETRY_STATUS_CODES or attempt == max_retries:
+            if cache is not None:
+                if response.status_code == 304 and entry is not None:
+                    cache.revalidate(url, params, entry)
+                    cache.record_hit(url)
+                    return cache.to_response(url, entry)
+                cache.record_miss(url)
+                cache.store(url, params, response)
+            return response
+
+        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        if retry_after is not None:
+            delay = min(retry_after, max_delay)
+            if limiter is not None:
+                # Le quota est partagé : tous les threads doivent patienter
+                limiter.pause(delay)
+        else:
+            delay = backoff_delay(attempt, backoff_base, max_delay)
+        logging.warning(f"HTTP {response.status_code} sur {url}, nouvelle tentative dans {delay:.1f}s "
+                        f"({attempt + 1}/{max_retries})")
+        response.close()
+        time.sleep(delay)
+
+    return response
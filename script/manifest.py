@@ -0,0 +1,136 @@
+import os
+import json
+import hashlib
+import logging
+from datetime import datetime
+
+from script.paths import PROCESSED_DIR
+
+# Manifeste des étapes : empreintes des entrées et sorties lors de la dernière exécution réussie
+MANIFEST_FILE = os.getenv("MANIFEST_FILE", f"{PROCESSED_DIR}/manifest.json")
+# 0 pour toujours recalculer les étapes (équivaut à --force sur chaque exécution)
+MANIFEST_ENABLED = os.getenv("MANIFEST_ENABLED", "1") == "1"
+
+# Le code des scripts fait partie des entrées de chaque étape : le modifier invalide le manifeste
+CODE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+HASH_BLOCK = 1024 * 1024
+
+def file_hash(path: str) -> str:
+    """Empreinte BLAKE2b du contenu d'un fichier"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def expand_paths(paths: list) -> list:
+    """Fichiers désignés par une liste de fichiers et de répertoires (parcourus récursivement), triés"""
+    files = set()
+    for path in paths:
+        if os.path.isfile(path):
+            files.add(os.path.normpath(path))
+        elif os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.update(os.path.normpath(os.path.join(root, name)) for name in names
+                             if not name.endswith('.tmp'))
+    return sorted(files)
+
+def fingerprints(paths: list, known: dict = None) -> dict:
+    """
+    Empreintes {fichier: {size, mtime_ns, hash}} des fichiers désignés par paths
+
+    Le contenu n'est relu que si la taille ou la date de modification diffèrent de l'empreinte
+    connue : un fichier réécrit à l'identique garde la même empreinte de contenu.
+    """
+    known = known or {}
+    result = {}
+    for path in expand_paths(paths):
+        stat = os.stat(path)
+        previous = known.get(path)
+        if previous and previous['size'] == stat.st_size and previous['mtime_ns'] == stat.st_mtime_ns:
+            content = previous['hash']
+        else:
+            content = file_hash(path)
+        result[path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'hash': content}
+    return result
+
+def code_files() -> list:
+    return sorted(os.path.join(CODE_DIR, name) for name in os.listdir(CODE_DIR) if name.endswith('.py'))
+
+def same_content(current: dict, recorded: dict) -> bool:
+    return current.keys() == recorded.keys() and all(current[path]['hash'] == recorded[path]['hash']
+                                                      for path in current)
+
+def load_manifest() -> dict:
+    if not os.path.exists(MANIFEST_FILE):
+        return {}
+    try:
+        with open(MANIFEST_FILE, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Manifeste illisible ({MANIFEST_FILE}), toutes les étapes seront recalculées : {e}")
+        return {}
+
+def save_manifest(manifest: dict):
+    os.makedirs(os.path.dirname(MANIFEST_FILE) or ".", exist_ok=True)
+    tmp_path = f"{MANIFEST_FILE}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp_path, MANIFEST_FILE)
+
+def stage_unchanged(stage: str, inputs: list, outputs: list, params: dict = None, force: bool = False) -> bool:
+    """
+    Indique si une étape peut être sautée : ses entrées (et le code des scripts) ont le même
+    contenu que lors de sa dernière exécution, avec les mêmes paramètres, et ses sorties
+    existent toujours, inchangées.
+
+    Args:
+        stage (str): Nom de l'étape dans le manifeste
+        inputs (list): Fichiers et répertoires lus par l'étape
+        outputs (list): Fichiers et répertoires produits par l'étape
+        params (dict): Paramètres influant sur le résultat (format de stockage, options...)
+        force (bool): Ne jamais sauter l'étape
+
+    Exemple:
+        >>> if stage_unchanged('analysis', inputs, outputs):
+        ...     return ANALYSIS_FILE
+    """
+    if force or not MANIFEST_ENABLED:
+        return False
+    entry = load_manifest().get(stage)
+    if entry is None or entry.get('params') != (params or {}):
+        return False
+    if not expand_paths(outputs):
+        return False
+    current = {
+        'code': fingerprints(code_files(), entry['code']),
+        'inputs': fingerprints(inputs, entry['inputs']),
+        'outputs': fingerprints(outputs, entry['outputs']),
+    }
+    if not all(same_content(current[key], entry[key]) for key in current):
+        return False
+
+    if any(current[key] != entry[key] for key in current):
+        # Fichiers réécrits à l'identique : nouvelles dates enregistrées pour ne plus les relire
+        save_entry(stage, {**entry, **current})
+    logging.info(f"Étape {stage} ignorée : entrées et sorties inchangées depuis le {entry['recorded_at']}")
+    return True
+
+def record_stage(stage: str, inputs: list, outputs: list, params: dict = None):
+    """Enregistre les empreintes des entrées et sorties d'une étape après son exécution réussie"""
+    if not MANIFEST_ENABLED:
+        return
+    previous = load_manifest().get(stage, {})
+    save_entry(stage, {
+        'params': params or {},
+        'code': fingerprints(code_files(), previous.get('code')),
+        'inputs': fingerprints(inputs, previous.get('inputs')),
+        'outputs': fingerprints(outputs, previous.get('outputs')),
+        'recorded_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    })
+
+def save_entry(stage: str, entry: dict):
+    manifest = load_manifest()
+    manifest[stage] = entry
+    save_manifest(manifest)
@@ -1,198 +1,725 @@
 import pandas as pd
+import numpy as np
 import os
+import json
+import argparse
 import logging
 from datetime import datetime
+from script.cube import CUBE_ENABLED, sync_cube
+from script.manifest import record_stage, stage_unchanged
+from script.metrics import file_size, instrument, record, step
+from script.paths import (ANALYSIS_DIR, CUBE_DIR, CURRENT_GLOBAL, CURRENT_INPUT_DIR, HISTORICAL_GLOBAL,
+                          HISTORICAL_INPUT_DIR, HISTORICAL_PARTITIONS, PROCESSED_DIR, historical_file_path)
+from script.rollup import record_touched
+from script.running_stats import (RUNNING_STATS_FILE, load_running_stats, save_running_stats, sync_running_stats,
+                                  update_city)
+from script.schema import CURRENT_GLOBAL_SCHEMA, HISTORICAL_GLOBAL_SCHEMA, apply_schema, compute_schema
+from script.sketches import (SKETCH_COMPRESSION, SKETCHES_FILE, load_sketches, percentile_table, save_sketches,
+                             update_city_sketches)
+from script.storage import (STORAGE_FORMAT, find_table, list_partitions, partition_base, partition_files,
+                            read_partitions, read_table, table_exists, table_path, write_table)
 
-# Configuration du logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+# Tables produites (sans extension : le format dépend de STORAGE_FORMAT), voir paths.py ;
+# l'historique fusionné est partitionné par ville (HISTORICAL_PARTITIONS)
+ANALYSIS_FILE = f"{ANALYSIS_DIR}/climate_analysis"
 
-def merge_current_data() -> str:
+HISTORICAL_MEASURES = ['temp_max', 'temp_min', 'precipitation', 'pluie', 'neige']
+HISTORICAL_COLUMNS = ['ville', 'date'] + HISTORICAL_MEASURES + ['date_import']
+ANALYSIS_INPUT_COLUMNS = ['ville'] + HISTORICAL_MEASURES
+ANALYSIS_AGGREGATIONS = {
+    'temp_max': ['mean', 'std'],
+    'temp_min': ['mean', 'std'],
+    'precipitation': ['mean', 'sum'],
+    'pluie': ['mean', 'sum'],
+    'neige': ['mean', 'sum']
+}
+
+# Lignes modifiées par les fusions par ville (tâches mappées du DAG), en attente de report
+HISTORICAL_CHANGES_DIR = f"{PROCESSED_DIR}/historical_changes"
+
+# Données actuelles : une partition par jour d'extraction (CURRENT_INPUT_DIR)
+CURRENT_STATE_FILE = f"{PROCESSED_DIR}/current_partitions.json"
+COMPACTED_NAME = "compacted"
+COMPACTION_FORMAT = os.getenv("CURRENT_COMPACTION_FORMAT", "parquet")
+CURRENT_COLUMNS = [
+    'ville', 'pays', 'date_extraction', 'timestamp_donnees', 'temperature', 
+    'temp_min', 'temp_max', 'humidite', 'pression', 'vent_vitesse', 
+    'vent_direction', 'precipitation', 'couverture_nuageuse', 'conditions', 'timezone', 'date_donnees'
+]
+
+def load_historical_global(columns: list = None, merged: dict = None) -> pd.DataFrame:
+    """
+    Charge l'historique fusionné (toutes les partitions, triées par ville)
+
+    Se rabat sur l'ancien fichier historical_global si aucune partition n'existe encore.
+
+    Args:
+        columns (list): Colonnes à charger (toutes par défaut)
+        merged (dict): Partitions réécrites par merge_historical_data, déjà en mémoire
+            ({ville: partition}) ; seules les autres partitions sont relues
+    """
+    if not merged:
+        return read_partitions(HISTORICAL_PARTITIONS, columns, fallback_base=HISTORICAL_GLOBAL, sort_by='ville',
+                               schema=HISTORICAL_GLOBAL_SCHEMA)
+
+    merged_bases = {partition_base(HISTORICAL_PARTITIONS, 'ville', ville) for ville in merged}
+    frames = [read_table(base, columns, schema=HISTORICAL_GLOBAL_SCHEMA)
+              for base in list_partitions(HISTORICAL_PARTITIONS) if base not in merged_bases]
+    frames += [partition[columns] if columns is not None else partition for partition in merged.values()]
+    # Les catégories diffèrent d'une partition à l'autre : typage après concaténation
+    df = apply_schema(pd.concat(frames, ignore_index=True), compute_schema(HISTORICAL_GLOBAL_SCHEMA))
+    return df.sort_values('ville', kind='stable').reset_index(drop=True)
+
+def current_partition_dir(date_str: str) -> str:
+    """Retourne le répertoire de la partition d'un jour, ex : data/current/date=2025-07-18"""
+    return os.path.join(CURRENT_INPUT_DIR, f"date={date_str}")
+
+def list_current_partitions() -> list:
+    """Liste les dates (YYYY-MM-DD) des partitions présentes dans data/current, triées"""
+    if not os.path.isdir(CURRENT_INPUT_DIR):
+        return []
+    return sorted(name.split('=', 1)[1] for name in os.listdir(CURRENT_INPUT_DIR)
+                  if name.startswith('date=') and os.path.isdir(os.path.join(CURRENT_INPUT_DIR, name)))
+
+def migrate_legacy_current_files() -> int:
+    """
+    Déplace les anciens fichiers plats "YYYY-MM-DD_Ville.csv" vers leur partition
+    data/current/date=YYYY-MM-DD/Ville.csv
+
+    Returns:
+        int: Nombre de fichiers déplacés
+    """
+    if not os.path.isdir(CURRENT_INPUT_DIR):
+        return 0
+    moved = 0
+    for file in os.listdir(CURRENT_INPUT_DIR):
+        file_path = os.path.join(CURRENT_INPUT_DIR, file)
+        if not (os.path.isfile(file_path) and file.endswith('.csv') and "_" in file.split(".")[0]):
+            continue
+        date_str, city_file = file.split('_', 1)
+        os.makedirs(current_partition_dir(date_str), exist_ok=True)
+        os.replace(file_path, os.path.join(current_partition_dir(date_str), city_file))
+        moved += 1
+    if moved:
+        logging.info(f"{moved} fichiers de données actuelles déplacés vers le format partitionné date=YYYY-MM-DD")
+    return moved
+
+def read_current_partition(date_str: str) -> pd.DataFrame:
+    """
+    Lit une partition journalière (fichier compacté et/ou fichiers par ville)
+
+    Returns:
+        pd.DataFrame: Données du jour avec la colonne date_donnees (vide si illisible)
+    """
+    partition_dir = current_partition_dir(date_str)
+    compacted = os.path.join(partition_dir, COMPACTED_NAME)
+    dfs = []
+    if table_exists(compacted):
+        try:
+            dfs.append(read_table(compacted))
+        except Exception as e:
+            logging.error(f"Erreur de lecture du fichier {find_table(compacted)}: {e}")
+    for file in sorted(os.listdir(partition_dir)):
+        if not file.endswith('.csv') or file.startswith(COMPACTED_NAME):
+            continue
+        file_path = os.path.join(partition_dir, file)
+        try:
+            with step('read_csv') as measure:
+                dfs.append(pd.read_csv(file_path))
+                measure.bytes_read, measure.rows_out = file_size(file_path), len(dfs[-1])
+        except Exception as e:
+            logging.error(f"Erreur de lecture du fichier {file_path}: {e}")
+            continue # Passer au fichier suivant
+    if not dfs:
+        return pd.DataFrame()
+
+    with step('concat'):
+        df = pd.concat(dfs, ignore_index=True)
+    # Ajout de la date de la donnée pour le matching avec la dimension temps
+    # La date est dans le nom de la partition pour les données actuelles
+    df['date_donnees'] = date_str
+    return df.drop_duplicates(subset=['ville'], keep='last')
+
+def compact_current_partitions(include_today: bool = False) -> int:
+    """
+    Regroupe les fichiers par ville de chaque journée terminée en un seul fichier
+    colonnaire data/current/date=YYYY-MM-DD/compacted.<format> (CURRENT_COMPACTION_FORMAT)
+
+    Args:
+        include_today (bool): Compacte aussi la journée en cours (encore alimentée par l'extraction)
+
+    Returns:
+        int: Nombre de partitions compactées
+    """
+    migrate_legacy_current_files()
+    today = datetime.now().strftime("%Y-%m-%d")
+    compacted_count = 0
+
+    for date_str in list_current_partitions():
+        if date_str >= today and not include_today:
+            continue
+        partition_dir = current_partition_dir(date_str)
+        city_files = [f for f in os.listdir(partition_dir)
+                      if f.endswith('.csv') and not f.startswith(COMPACTED_NAME)]
+        if not city_files:
+            continue
+
+        day_df = read_current_partition(date_str).drop(columns=['date_donnees'])
+        if day_df.empty:
+            continue
+        write_table(day_df, os.path.join(partition_dir, COMPACTED_NAME), fmt=COMPACTION_FORMAT)
+        for file in city_files:
+            os.remove(os.path.join(partition_dir, file))
+        compacted_count += 1
+        logging.info(f"Partition date={date_str} compactée : {len(city_files)} fichiers -> 1 ({len(day_df)} villes)")
+
+    return compacted_count
+
+def partition_signature(date_str: str) -> list:
+    """Signature d'une partition (nom, taille, date de modification de chaque fichier)"""
+    partition_dir = current_partition_dir(date_str)
+    signature = []
+    for file in sorted(os.listdir(partition_dir)):
+        stat = os.stat(os.path.join(partition_dir, file))
+        signature.append([file, stat.st_size, stat.st_mtime_ns])
+    return signature
+
+def collect_current_data(full_rebuild: bool = False) -> tuple:
     """
-    Fusionne tous les fichiers CSV de données actuelles en un seul fichier global.
+    Construit en mémoire le contenu de current_global à partir des partitions
+    de données actuelles (data/current/date=YYYY-MM-DD/).
+    
+    Seules les partitions nouvelles ou modifiées depuis la fusion précédente sont lues ;
+    les partitions déjà traitées sont suivies dans data/processed/current_partitions.json.
+    
+    Args:
+        full_rebuild (bool): Relit toutes les partitions et reconstruit le fichier global
     
     Returns:
-        str: Chemin du fichier global créé/mis à jour
+        tuple: (données fusionnées, signatures des partitions à enregistrer)
+            Les signatures valent None si aucune partition n'a changé : les données
+            renvoyées sont alors celles du fichier global existant.
     """
-    input_dir = "data/current"
-    output_file = "data/processed/current_global.csv"
+    migrate_legacy_current_files()
+    partitions = list_current_partitions()
     
-    try:
-        os.makedirs(os.path.dirname(output_file), exist_ok=True)
-        
-        # CORRECTION : Rechercher les fichiers avec le format "YYYY-MM-DD_Ville.csv"
-        # et non "_current.csv"
-        all_files = [f for f in os.listdir(input_dir) if f.endswith('.csv') and "_" in f.split(".")[0]]
-        
-        if not all_files:
-            logging.warning("Aucun fichier de données actuelles trouvé dans data/current/. Création d'un fichier vide.")
-            columns = [
-                'ville', 'pays', 'date_extraction', 'timestamp_donnees', 'temperature', 
-                'temp_min', 'temp_max', 'humidite', 'pression', 'vent_vitesse', 
-                'vent_direction', 'precipitation', 'couverture_nuageuse', 'conditions', 'timezone'
-            ]
-            pd.DataFrame(columns=columns).to_csv(output_file, index=False)
-            return output_file
-        
-        dfs = []
-        for file in all_files:
-            file_path = os.path.join(input_dir, file)
-            try:
-                df = pd.read_csv(file_path)
-                # Ajout de la date de la donnée pour le matching avec la dimension temps
-                # La date est dans le nom du fichier pour les données actuelles
-                file_date_str = file.split('_')[0] 
-                df['date_donnees'] = file_date_str 
-                dfs.append(df)
-            except Exception as e:
-                logging.error(f"Erreur de lecture du fichier {file_path}: {e}")
-                continue # Passer au fichier suivant
-        
-        if not dfs:
-            logging.error("Aucun DataFrame valide à fusionner pour les données actuelles.")
-            columns = [ # Assurez-vous que les colonnes sont définies pour un DF vide
-                'ville', 'pays', 'date_extraction', 'timestamp_donnees', 'temperature', 
-                'temp_min', 'temp_max', 'humidite', 'pression', 'vent_vitesse', 
-                'vent_direction', 'precipitation', 'couverture_nuageuse', 'conditions', 'timezone', 'date_donnees'
-            ]
-            pd.DataFrame(columns=columns).to_csv(output_file, index=False)
-            return output_file
+    if not partitions:
+        logging.warning("Aucune donnée actuelle trouvée dans data/current/. Création d'un fichier vide.")
+        return pd.DataFrame(columns=CURRENT_COLUMNS), {}
+    
+    processed = {}
+    if not full_rebuild and os.path.exists(CURRENT_STATE_FILE) and table_exists(CURRENT_GLOBAL):
+        with open(CURRENT_STATE_FILE, encoding='utf-8') as f:
+            processed = json.load(f)
+    
+    signatures = {date_str: partition_signature(date_str) for date_str in partitions}
+    pending = [date_str for date_str in partitions if processed.get(date_str) != signatures[date_str]]
+    if not pending:
+        logging.info("Aucune nouvelle partition de données actuelles à fusionner.")
+        return read_table(CURRENT_GLOBAL, schema=CURRENT_GLOBAL_SCHEMA), None
+    
+    dfs = []
+    if processed:
+        dfs.append(read_table(CURRENT_GLOBAL, schema=CURRENT_GLOBAL_SCHEMA))
+    for date_str in pending:
+        df = read_current_partition(date_str)
+        if not df.empty:
+            dfs.append(df)
+            # Clés des faits correspondants (date issue du timestamp, comme dans transform.py)
+            record_touched(pd.DataFrame({
+                'ville': df['ville'],
+                'date': pd.to_datetime(df['timestamp_donnees'], unit='s').dt.strftime('%Y-%m-%d')
+            }))
+    
+    if not dfs:
+        logging.error("Aucun DataFrame valide à fusionner pour les données actuelles.")
+        return pd.DataFrame(columns=CURRENT_COLUMNS), signatures
 
+    with step('concat') as measure:
         merged_df = pd.concat(dfs, ignore_index=True)
-        
-        # NOUVEAU : Déduplication des données actuelles.
-        # En théorie, un seul enregistrement par ville et par jour d'extraction est attendu.
+        measure.rows_out = len(merged_df)
+    merged_df['date_donnees'] = merged_df['date_donnees'].astype(str)
+    
+    # NOUVEAU : Déduplication des données actuelles.
+    # En théorie, un seul enregistrement par ville et par jour d'extraction est attendu.
+    with step('dedup', rows_in=len(merged_df)) as measure:
         merged_df = merged_df.drop_duplicates(subset=['ville', 'date_donnees'], keep='last')
-        
-        merged_df.to_csv(output_file, index=False)
-        logging.info(f"Fichier current_global.csv créé avec {len(merged_df)} enregistrements uniques.")
-        return output_file
+        measure.rows_out = len(merged_df)
+    merged_df = apply_schema(merged_df, compute_schema(CURRENT_GLOBAL_SCHEMA), name='current_global')
+    logging.info(f"{len(pending)} partitions de données actuelles fusionnées : "
+                 f"{len(merged_df)} enregistrements uniques.")
+    return merged_df, signatures
+
+def save_current_data(merged_df: pd.DataFrame, signatures: dict) -> str:
+    """Écrit current_global et enregistre les partitions traitées"""
+    output_file = write_table(merged_df, CURRENT_GLOBAL, schema=CURRENT_GLOBAL_SCHEMA)
+    with open(CURRENT_STATE_FILE, 'w', encoding='utf-8') as f:
+        json.dump(signatures, f, indent=2)
+    logging.info(f"Fichier {output_file} créé avec {len(merged_df)} enregistrements uniques.")
+    return output_file
+
+@instrument
+def merge_current_data(full_rebuild: bool = False) -> str:
+    """
+    Fusionne les partitions de données actuelles (data/current/date=YYYY-MM-DD/)
+    dans un seul fichier global, de manière incrémentale (voir collect_current_data).
+    
+    Args:
+        full_rebuild (bool): Relit toutes les partitions et reconstruit le fichier global
+    
+    Returns:
+        str: Chemin du fichier global créé/mis à jour
+    """
+    try:
+        os.makedirs(os.path.dirname(CURRENT_GLOBAL), exist_ok=True)
+        merged_df, signatures = collect_current_data(full_rebuild)
+        record(rows_out=len(merged_df))
+        if signatures is None:
+            return table_path(CURRENT_GLOBAL)
+        return save_current_data(merged_df, signatures)
         
     except Exception as e:
         logging.error(f"Erreur critique lors de la fusion des données actuelles : {str(e)}")
         raise
 
-def merge_historical_data() -> str:
+def load_partition_index() -> dict:
+    """Charge l'index des fichiers sources déjà fusionnés ({fichier: {size, mtime_ns}})"""
+    index_path = os.path.join(HISTORICAL_PARTITIONS, "_index.json")
+    if not os.path.exists(index_path):
+        return {}
+    try:
+        with open(index_path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Index des partitions historiques illisible, tous les fichiers seront relus : {e}")
+        return {}
+
+def save_partition_index(index: dict):
+    """Sauvegarde l'index des fichiers sources déjà fusionnés"""
+    os.makedirs(HISTORICAL_PARTITIONS, exist_ok=True)
+    with open(os.path.join(HISTORICAL_PARTITIONS, "_index.json"), 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=2, ensure_ascii=False)
+
+def seed_partitions_from_global():
+    """
+    Migration unique : découpe l'ancien historical_global en partitions par ville
+    (les date_import existantes sont conservées)
+    """
+    if list_partitions(HISTORICAL_PARTITIONS) or not table_exists(HISTORICAL_GLOBAL):
+        return
+    legacy_df = read_table(HISTORICAL_GLOBAL)
+    legacy_df['date'] = pd.to_datetime(legacy_df['date']).dt.strftime('%Y-%m-%d')
+    for ville, city_df in legacy_df.groupby('ville', sort=False):
+        write_table(city_df.sort_values('date'), partition_base(HISTORICAL_PARTITIONS, 'ville', ville),
+                    schema=HISTORICAL_GLOBAL_SCHEMA)
+    logging.info(f"Partitions historiques initialisées depuis {find_table(HISTORICAL_GLOBAL)}")
+
+def seed_city_partition(ville: str):
+    """Migration de l'ancien historical_global pour une seule ville dont la partition n'existe pas encore"""
+    base = partition_base(HISTORICAL_PARTITIONS, 'ville', ville)
+    if table_exists(base) or not table_exists(HISTORICAL_GLOBAL):
+        return
+    legacy_df = read_table(HISTORICAL_GLOBAL)
+    city_df = legacy_df[legacy_df['ville'] == ville].copy()
+    if city_df.empty:
+        return
+    city_df['date'] = pd.to_datetime(city_df['date']).dt.strftime('%Y-%m-%d')
+    write_table(city_df.sort_values('date'), base, schema=HISTORICAL_GLOBAL_SCHEMA)
+    logging.info(f"Partition historique de {ville} initialisée depuis {find_table(HISTORICAL_GLOBAL)}")
+
+def upsert_city_partition(ville: str, source_df: pd.DataFrame, import_date: str, merged: dict = None) -> tuple:
+    """
+    Met à jour la partition d'une ville avec les seules lignes nouvelles ou modifiées
+
+    Args:
+        ville (str): Ville de la partition
+        source_df (pd.DataFrame): Données collectées pour la ville (dates au format YYYY-MM-DD)
+        import_date (str): Horodatage appliqué aux lignes nouvelles ou modifiées
+        merged (dict): Si fourni, reçoit la partition réécrite ({ville: partition}), telle
+            qu'elle serait relue (mesures arrondies à la précision de stockage)
+
+    Returns:
+        tuple: (lignes ajoutées ou modifiées, anciennes versions des lignes modifiées)
+    """
+    base = partition_base(HISTORICAL_PARTITIONS, 'ville', ville)
+    measures = [c for c in HISTORICAL_MEASURES if c in source_df.columns]
+    source_df = apply_schema(source_df, compute_schema(HISTORICAL_GLOBAL_SCHEMA))
+    existing = (read_table(base, schema=HISTORICAL_GLOBAL_SCHEMA) if table_exists(base)
+                else apply_schema(pd.DataFrame(columns=HISTORICAL_COLUMNS), compute_schema(HISTORICAL_GLOBAL_SCHEMA)))
+
+    # Comparaison (ville, date) entre les données collectées et la partition existante
+    with step('merge', rows_in=len(source_df)):
+        compared = source_df.merge(existing[['date'] + measures], on='date', how='left',
+                                   suffixes=('', '_existant'), indicator=True)
+    is_new = compared['_merge'] == 'left_only'
+    is_changed = pd.Series(False, index=compared.index)
+    for col in measures:
+        # Comparaison à la précision de stockage (float32) : une mesure relue n'est pas modifiée
+        new, old = compared[col].astype('float32'), compared[f"{col}_existant"].astype('float32')
+        is_changed |= ~((new == old) | (new.isna() & old.isna()))
+    is_changed &= ~is_new
+
+    changed_dates = compared.loc[is_changed, 'date']
+    if not is_new.any() and changed_dates.empty:
+        return source_df.iloc[0:0], existing.iloc[0:0]
+
+    updates = source_df[(is_new | is_changed).to_numpy()].copy()
+    updates['date_import'] = import_date
+    replaced = existing[existing['date'].isin(changed_dates)]
+
+    with step('concat'):
+        upserted = pd.concat([existing[~existing['date'].isin(changed_dates)], updates], ignore_index=True)
+    with step('sort', rows_in=len(upserted)):
+        upserted = upserted.sort_values('date').reset_index(drop=True)
+    partition = apply_schema(upserted[[c for c in HISTORICAL_COLUMNS if c in upserted.columns]],
+                             HISTORICAL_GLOBAL_SCHEMA)
+    write_table(partition, base)
+    if merged is not None:
+        merged[ville] = apply_schema(partition, compute_schema(HISTORICAL_GLOBAL_SCHEMA)).infer_objects()
+    return updates, replaced
+
+def historical_merge_stage() -> tuple:
+    """Entrées, sorties et paramètres de l'étape 'merge_historical' du manifeste (voir manifest.py)"""
+    inputs = [HISTORICAL_INPUT_DIR, table_path(HISTORICAL_GLOBAL)]
+    # Les statistiques et esquisses sont resynchronisées par create_analysis_file si besoin
+    outputs = [HISTORICAL_PARTITIONS]
+    params = {'storage_format': STORAGE_FORMAT, 'sketch_compression': SKETCH_COMPRESSION}
+    return inputs, outputs, params
+
+def source_signature(file_path: str) -> dict:
+    """Signature (taille, date de modification) d'un fichier source, enregistrée dans l'index"""
+    stat = os.stat(file_path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+def read_historical_file(file_path: str) -> pd.DataFrame:
+    """Lit un fichier historique brut : dates au format YYYY-MM-DD, une seule ligne par (ville, date)"""
+    with step('read_csv') as measure:
+        df = pd.read_csv(file_path)
+        measure.bytes_read, measure.rows_out = file_size(file_path), len(df)
+    # Convertir la colonne 'date' en format standard pour une comparaison fiable
+    df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
+    with step('dedup', rows_in=len(df)) as measure:
+        df = df.drop_duplicates(subset=['ville', 'date'], keep='last')
+        measure.rows_out = len(df)
+    return df
+
+def apply_city_changes(ville: str, updates: pd.DataFrame, replaced: pd.DataFrame,
+                       running_stats: dict, sketches: dict):
+    """
+    Reporte les lignes ajoutées ou modifiées d'une ville sur les états partagés :
+    clés en attente des agrégats, statistiques courantes et esquisses de quantiles
+    """
+    record_touched(updates)
+    if updates.empty:
+        return
+    base = partition_base(HISTORICAL_PARTITIONS, 'ville', ville)
+    with step('running_stats'):
+        update_city(running_stats, ville, updates, replaced, base)
+    with step('sketches'):
+        update_city_sketches(sketches, ville, updates, replaced, base)
+
+def changes_base(file: str) -> str:
+    """Table des lignes modifiées par la fusion d'un fichier source, en attente de report"""
+    return os.path.join(HISTORICAL_CHANGES_DIR, os.path.splitext(file)[0])
+
+@instrument
+def merge_city_historical(city: str, force: bool = False) -> int:
+    """
+    Fusionne l'historique d'une seule ville (une tâche mappée par ville dans le DAG).
+
+    Le fichier brut de la ville est lu et dédoublonné, puis sa partition est mise à jour
+    (upsert_city_partition). Les états partagés par toutes les villes (index des fichiers,
+    statistiques, esquisses, clés des agrégats) ne sont pas modifiés : les lignes ajoutées
+    et modifiées sont déposées dans HISTORICAL_CHANGES_DIR et reportées une seule fois par
+    reduce_historical_changes. Les tâches de villes différentes peuvent donc s'exécuter en parallèle.
+
+    Args:
+        city (str): Ville du référentiel (script/cities.py)
+        force (bool): Relit le fichier brut même si l'index le juge inchangé
+
+    Returns:
+        int: Nombre de lignes ajoutées ou modifiées
+    """
+    file_path = historical_file_path(city)
+    file = os.path.basename(file_path)
+    try:
+        if not os.path.exists(file_path):
+            logging.warning(f"Aucun fichier historique pour {city} ({file_path}).")
+            return 0
+        signature = source_signature(file_path)
+        if not force and load_partition_index().get(file) == signature:
+            logging.info(f"Fichier historique {file} inchangé depuis la dernière fusion.")
+            return 0
+
+        df = read_historical_file(file_path)
+        import_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        frames = []
+        for ville, city_df in df.groupby('ville', sort=False):
+            seed_city_partition(ville)
+            updates, replaced = upsert_city_partition(ville, city_df.reset_index(drop=True), import_date)
+            frames += [updates.assign(version='nouvelle'), replaced.assign(version='ancienne')]
+
+        # Une tentative précédente non encore reportée (tâche relancée) est conservée
+        base = changes_base(file)
+        if table_exists(base):
+            frames.insert(0, read_table(base, schema=HISTORICAL_GLOBAL_SCHEMA))
+        changes = pd.concat(frames, ignore_index=True)
+        os.makedirs(HISTORICAL_CHANGES_DIR, exist_ok=True)
+        if not changes.empty:
+            write_table(changes, base, schema=HISTORICAL_GLOBAL_SCHEMA)
+        with open(f"{base}.json", 'w', encoding='utf-8') as f:
+            json.dump({'file': file, 'signature': signature}, f)
+
+        n_changed = int((changes['version'] == 'nouvelle').sum())
+        record(rows_in=len(df), rows_out=n_changed)
+        logging.info(f"Partition historique de {city} fusionnée : {n_changed} lignes ajoutées ou modifiées.")
+        return n_changed
+
+    except Exception as e:
+        logging.error(f"Erreur lors de la fusion historique de {city} : {str(e)}")
+        raise
+
+def apply_pending_changes(index: dict, running_stats: dict, sketches: dict) -> int:
+    """
+    Reporte sur les états partagés les fusions par ville déposées dans HISTORICAL_CHANGES_DIR
+    (index, statistiques et esquisses modifiés sur place)
+
+    Returns:
+        int: Nombre de fichiers sources reportés
+    """
+    if not os.path.isdir(HISTORICAL_CHANGES_DIR):
+        return 0
+    pending = sorted(name for name in os.listdir(HISTORICAL_CHANGES_DIR) if name.endswith('.json'))
+    for name in pending:
+        base = os.path.join(HISTORICAL_CHANGES_DIR, name[:-len('.json')])
+        with open(f"{base}.json", encoding='utf-8') as f:
+            meta = json.load(f)
+        if table_exists(base):
+            changes = read_table(base, schema=HISTORICAL_GLOBAL_SCHEMA)
+            for ville, city_changes in changes.groupby('ville', observed=True, sort=False):
+                is_new = city_changes['version'] == 'nouvelle'
+                apply_city_changes(str(ville), city_changes[is_new].drop(columns='version'),
+                                   city_changes[~is_new].drop(columns='version'), running_stats, sketches)
+        index[meta['file']] = meta['signature']
+    return len(pending)
+
+def clear_pending_changes():
+    """Supprime les fusions par ville reportées (après sauvegarde des états partagés)"""
+    if os.path.isdir(HISTORICAL_CHANGES_DIR):
+        for name in os.listdir(HISTORICAL_CHANGES_DIR):
+            os.remove(os.path.join(HISTORICAL_CHANGES_DIR, name))
+
+@instrument
+def reduce_historical_changes() -> str:
+    """
+    Étape de réduction des fusions par ville (merge_city_historical) : met à jour, une seule
+    fois pour toutes les villes, l'index des fichiers sources, les statistiques courantes,
+    les esquisses et les clés des agrégats, puis enregistre l'étape merge_historical.
+
+    Returns:
+        str: Répertoire des partitions historiques
+    """
+    try:
+        index, running_stats, sketches = load_partition_index(), load_running_stats(), load_sketches()
+        reduced = apply_pending_changes(index, running_stats, sketches)
+        if reduced:
+            save_partition_index(index)
+            save_running_stats(running_stats)
+            save_sketches(sketches)
+            clear_pending_changes()
+        record_stage('merge_historical', *historical_merge_stage())
+        logging.info(f"Fusions historiques reportées pour {reduced} fichiers sources.")
+        return HISTORICAL_PARTITIONS
+
+    except Exception as e:
+        logging.error(f"Erreur lors du report des fusions historiques : {str(e)}")
+        raise
+
+@instrument
+def merge_historical_data(full_rebuild: bool = False, force: bool = False, merged: dict = None) -> str:
     """
-    Fusionne tous les fichiers CSV de données historiques en un seul fichier global,
-    en assurant la déduplication.
+    Fusionne les fichiers CSV de données historiques dans des partitions par ville,
+    de manière incrémentale, dans un seul processus.
+    
+    Seuls les fichiers sources modifiés depuis la dernière fusion (taille ou date de
+    modification) sont relus, et seules les lignes (ville, date) nouvelles ou modifiées
+    sont écrites : une partition sans changement n'est pas réécrite et les lignes
+    existantes conservent leur date_import. L'étape est sautée si le manifeste indique
+    des sources et des sorties au contenu inchangé. Le DAG exécute la même fusion ville
+    par ville (merge_city_historical) puis reduce_historical_changes.
+    
+    Args:
+        full_rebuild (bool): Relit tous les fichiers sources, même inchangés
+        force (bool): Exécute l'étape même si le manifeste la juge inchangée
+        merged (dict): Si fourni, reçoit les partitions réécrites ({ville: partition}),
+            à passer à load_historical_global pour ne pas les relire
     
     Returns:
-        str: Chemin du fichier global créé/mis à jour
+        str: Répertoire des partitions historiques (data/processed/historical)
     """
-    input_dir = "data/historical"
-    output_file = "data/processed/historical_global.csv"
+    input_dir = HISTORICAL_INPUT_DIR
+    inputs, outputs, params = historical_merge_stage()
     
     try:
-        os.makedirs(os.path.dirname(output_file), exist_ok=True)
+        if stage_unchanged('merge_historical', inputs, outputs, params, force=force or full_rebuild):
+            return HISTORICAL_PARTITIONS
+        os.makedirs(HISTORICAL_PARTITIONS, exist_ok=True)
+        seed_partitions_from_global()
         
-        all_historical_files = [f for f in os.listdir(input_dir) if f.endswith('_historical.csv')]
+        all_historical_files = sorted(f for f in os.listdir(input_dir) if f.endswith('_historical.csv'))
         
         if not all_historical_files:
-            logging.warning("Aucun fichier de données historiques trouvé dans data/historical/. Création d'un fichier vide.")
-            columns = ['ville', 'date', 'temp_max', 'temp_min', 'precipitation', 'pluie', 'neige', 'date_import']
-            pd.DataFrame(columns=columns).to_csv(output_file, index=False)
-            return output_file
+            logging.warning("Aucun fichier de données historiques trouvé dans data/historical/.")
+            return HISTORICAL_PARTITIONS
 
-        dfs_new_collection = []
+        index = {} if full_rebuild else load_partition_index()
+        # Statistiques courantes par ville, mises à jour avec les seules lignes fusionnées
+        running_stats = {} if full_rebuild else load_running_stats()
+        # Esquisses de quantiles par (ville, variable, mois), mises à jour de la même manière
+        sketches = {} if full_rebuild else load_sketches()
+        # Fusions par ville d'une exécution du DAG interrompue avant leur report
+        apply_pending_changes(index, running_stats, sketches)
+        import_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        skipped, added, updated, written, rows_in = 0, 0, 0, 0, 0
+        
         for file in all_historical_files:
             file_path = os.path.join(input_dir, file)
+            signature = source_signature(file_path)
+            if index.get(file) == signature:
+                skipped += 1
+                continue
+            
             try:
-                df = pd.read_csv(file_path)
-                df['date_import'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                dfs_new_collection.append(df)
+                df = read_historical_file(file_path)
+                rows_in += len(df)
             except Exception as e:
                 logging.error(f"Erreur de lecture du fichier historique {file_path}: {e}")
                 continue # Passer au fichier suivant
+            
+            for ville, city_df in df.groupby('ville', sort=False):
+                updates, replaced = upsert_city_partition(ville, city_df.reset_index(drop=True), import_date,
+                                                          merged)
+                apply_city_changes(ville, updates, replaced, running_stats, sketches)
+                if not updates.empty:
+                    written += 1
+                    updated += len(replaced)
+                    added += len(updates) - len(replaced)
+            index[file] = signature
         
-        if not dfs_new_collection:
-            logging.warning("Aucune nouvelle donnée historique valide à fusionner.")
-            return output_file # Retourne le chemin du fichier existant/vide
-
-        newly_collected_df = pd.concat(dfs_new_collection, ignore_index=True)
-        
-        # Convertir la colonne 'date' en format standard pour une comparaison fiable
-        newly_collected_df['date'] = pd.to_datetime(newly_collected_df['date']).dt.strftime('%Y-%m-%d')
-
-        existing_global_df = pd.DataFrame()
-        if os.path.exists(output_file) and os.path.getsize(output_file) > 0:
-            try:
-                existing_global_df = pd.read_csv(output_file)
-                existing_global_df['date'] = pd.to_datetime(existing_global_df['date']).dt.strftime('%Y-%m-%d')
-            except Exception as e:
-                logging.warning(f"Impossible de lire le fichier historique global existant, il sera recréé : {e}")
-                existing_global_df = pd.DataFrame() # Réinitialiser si erreur de lecture
-
-        # NOUVEAU : Concaténation et déduplication pour éviter les doublons
-        combined_df = pd.concat([existing_global_df, newly_collected_df], ignore_index=True)
-        
-        # Déduplication : Conserver la dernière entrée pour chaque combinaison (ville, date)
-        # Ceci est crucial pour éviter la répétition des mêmes données historiques à chaque run.
-        deduplicated_df = combined_df.drop_duplicates(subset=['ville', 'date'], keep='last')
-        
-        deduplicated_df = deduplicated_df.sort_values(by=['ville', 'date']).reset_index(drop=True)
-        
-        deduplicated_df.to_csv(output_file, index=False)
-        logging.info(f"Fusion historique réussie : {len(deduplicated_df)} enregistrements uniques.")
-        return output_file
+        save_partition_index(index)
+        save_running_stats(running_stats)
+        save_sketches(sketches)
+        clear_pending_changes()
+        record_stage('merge_historical', inputs, outputs, params)
+        record(rows_in=rows_in, rows_out=added + updated)
+        logging.info(f"Fusion historique incrémentale : {added} lignes ajoutées, {updated} lignes modifiées, "
+                     f"{written} partitions réécrites, {skipped} fichiers inchangés ignorés.")
+        return HISTORICAL_PARTITIONS
         
     except Exception as e:
         logging.error(f"Erreur lors de la fusion des données historiques : {str(e)}")
         raise
 
-def create_analysis_file() -> str:
+def build_analysis(current_df: pd.DataFrame, historical_df: pd.DataFrame) -> pd.DataFrame:
     """
-    Crée un fichier d'analyse combinant données actuelles et indicateurs historiques.
+    Combine en mémoire les données actuelles et les indicateurs historiques par ville.
+    
+    Args:
+        current_df (pd.DataFrame): Données actuelles fusionnées
+        historical_df (pd.DataFrame): Historique fusionné (colonnes ville et mesures)
     
     Returns:
-        str: Chemin du fichier d'analyse créé
+        pd.DataFrame: Table d'analyse
     """
-    try:
-        # Chargement des données fusionnées
-        current_df = pd.read_csv("data/processed/current_global.csv")
-        historical_df = pd.read_csv("data/processed/historical_global.csv")
-        
-        # Assurez-vous que la colonne 'date' est bien au format date pour le regroupement
-        historical_df['date'] = pd.to_datetime(historical_df['date'])
-
-        # Calcul des statistiques historiques par ville
-        stats = historical_df.groupby('ville').agg({
-            'temp_max': ['mean', 'std'],
-            'temp_min': ['mean', 'std'],
-            'precipitation': ['mean', 'sum'],
-            'pluie': ['mean', 'sum'],
-            'neige': ['mean', 'sum']
-        }).reset_index()
-        
-        # Renommage des colonnes (aplatir le MultiIndex)
-        stats.columns = ['_'.join(col).strip() if col[1] else col[0] for col in stats.columns.values]
-        stats.rename(columns={
-            'temp_max_mean': 'temp_max_moyenne', 'temp_max_std': 'temp_max_std',
-            'temp_min_mean': 'temp_min_moyenne', 'temp_min_std': 'temp_min_std',
-            'precipitation_mean': 'precipitation_moyenne', 'precipitation_sum': 'precipitation_totale',
-            'pluie_mean': 'pluie_moyenne', 'pluie_sum': 'pluie_totale',
-            'neige_mean': 'neige_moyenne', 'neige_sum': 'neige_totale'
-        }, inplace=True)
-        
-        # Fusion avec les données actuelles
+    # Calcul des statistiques historiques par ville
+    with step('aggregate', rows_in=len(historical_df)):
+        stats = historical_df.groupby('ville', observed=True).agg(ANALYSIS_AGGREGATIONS).reset_index()
+    
+    # Renommage des colonnes (aplatir le MultiIndex)
+    stats.columns = ['_'.join(col).strip() if col[1] else col[0] for col in stats.columns.values]
+    return build_analysis_from_stats(current_df, stats)
+
+def build_analysis_from_stats(current_df: pd.DataFrame, stats: pd.DataFrame) -> pd.DataFrame:
+    """
+    Combine les données actuelles et des statistiques historiques déjà agrégées par ville
+    (colonnes <mesure>_mean, <mesure>_std, <mesure>_sum, issues du groupby ou du cube)
+    """
+    stats = stats[['ville'] + [f"{col}_{agg}" for col, aggs in ANALYSIS_AGGREGATIONS.items() for agg in aggs]].copy()
+    stats.rename(columns={
+        'temp_max_mean': 'temp_max_moyenne', 'temp_max_std': 'temp_max_std',
+        'temp_min_mean': 'temp_min_moyenne', 'temp_min_std': 'temp_min_std',
+        'precipitation_mean': 'precipitation_moyenne', 'precipitation_sum': 'precipitation_totale',
+        'pluie_mean': 'pluie_moyenne', 'pluie_sum': 'pluie_totale',
+        'neige_mean': 'neige_moyenne', 'neige_sum': 'neige_totale'
+    }, inplace=True)
+    
+    # Fusion avec les données actuelles
+    with step('merge', rows_in=len(current_df)):
         analysis_df = pd.merge(
             current_df,
             stats,
             on='ville',
             how='left'
         )
-        
-        # Calcul d'indicateurs complémentaires (gérer les NaN pour le STD)
-        analysis_df['variabilite_climatique'] = analysis_df['temp_max_std'].fillna(0) + analysis_df['temp_min_std'].fillna(0)
-        # Éviter la division par zéro si variabilite_climatique est 0
-        analysis_df['stabilite_climatique'] = analysis_df['variabilite_climatique'].apply(lambda x: 1 / (1 + x) if x is not None and x > 0 else 1) # Si 0 ou NaN, stabilité est 1
+    
+    # Calcul d'indicateurs complémentaires (gérer les NaN pour le STD)
+    analysis_df['variabilite_climatique'] = analysis_df['temp_max_std'].fillna(0) + analysis_df['temp_min_std'].fillna(0)
+    # Si la variabilité est nulle, la stabilité vaut 1
+    variabilite = analysis_df['variabilite_climatique'].to_numpy(dtype=np.float64)
+    analysis_df['stabilite_climatique'] = np.where(variabilite > 0, 1 / (1 + np.maximum(variabilite, 0)), 1.0)
+    
+    # Centiles historiques (p5, p50, p95) issus des esquisses de quantiles
+    analysis_df = pd.merge(analysis_df, percentile_table(), on='ville', how='left')
+    
+    return analysis_df
+
+def analysis_stage() -> tuple:
+    """Entrées, sorties et paramètres de l'étape 'analysis' du manifeste (voir manifest.py)"""
+    inputs = ([table_path(CURRENT_GLOBAL), table_path(HISTORICAL_GLOBAL), RUNNING_STATS_FILE, SKETCHES_FILE]
+              + partition_files(HISTORICAL_PARTITIONS))
+    outputs = [table_path(ANALYSIS_FILE)] + ([CUBE_DIR] if CUBE_ENABLED else [])
+    params = {'storage_format': STORAGE_FORMAT, 'cube': CUBE_ENABLED}
+    return inputs, outputs, params
+
+@instrument
+def create_analysis_file(force: bool = False) -> str:
+    """
+    Crée un fichier d'analyse combinant données actuelles et indicateurs historiques.
+    
+    Le fichier n'est pas recalculé si current_global, les partitions historiques et leurs
+    statistiques ont le même contenu que lors de sa création (voir manifest.py).
+    
+    Args:
+        force (bool): Recalcule le fichier même si ses entrées sont inchangées
+    
+    Returns:
+        str: Chemin du fichier d'analyse créé
+    """
+    inputs, outputs, params = analysis_stage()
+    try:
+        if stage_unchanged('analysis', inputs, outputs, params, force=force):
+            return table_path(ANALYSIS_FILE)
+        # Chargement des données fusionnées
+        current_df = read_table(CURRENT_GLOBAL, schema=CURRENT_GLOBAL_SCHEMA)
+        if CUBE_ENABLED:
+            # Statistiques calculées sur le cube dense, sans regroupement de l'historique
+            cube = sync_cube()
+            analysis_df = (build_analysis_from_stats(current_df, cube.city_stats()) if cube is not None
+                           else build_analysis(current_df, load_historical_global(columns=ANALYSIS_INPUT_COLUMNS)))
+        else:
+            # Statistiques courantes par ville (Welford), tenues à jour par merge_historical_data :
+            # l'historique complet n'est relu que s'il n'existe pas encore de partitions
+            stats = sync_running_stats()
+            if stats is not None:
+                analysis_df = build_analysis_from_stats(current_df, stats)
+            else:
+                historical_df = load_historical_global(columns=ANALYSIS_INPUT_COLUMNS)
+                analysis_df = build_analysis(current_df, historical_df)
         
         # Sauvegarde
-        os.makedirs("data/analysis", exist_ok=True)
-        output_file = "data/analysis/climate_analysis.csv"
-        analysis_df.to_csv(output_file, index=False)
+        output_file = write_table(analysis_df, ANALYSIS_FILE)
+        record_stage('analysis', inputs, outputs, params)
+        record(rows_out=len(analysis_df))
         
         logging.info(f"Fichier d'analyse créé avec {len(analysis_df)} enregistrements")
         return output_file
@@ -201,23 +728,39 @@ def create_analysis_file() -> str:
         logging.error(f"Erreur lors de la création du fichier d'analyse : {str(e)}")
         raise
 
-def main():
-    """Fonction principale pour la fusion des données"""
+def main(force: bool = False):
+    """
+    Fonction principale pour la fusion des données
+
+    Args:
+        force (bool): Exécute la fusion historique et l'analyse même si le manifeste
+            les juge inchangées
+    """
     try:
-        # Fusion des données actuelles
+        # Compactage des journées terminées puis fusion des données actuelles
+        compact_current_partitions()
         current_path = merge_current_data()
         logging.info(f"Données actuelles fusionnées : {current_path}")
         
         # Fusion des données historiques
-        historical_path = merge_historical_data()
+        historical_path = merge_historical_data(force=force)
         logging.info(f"Données historiques fusionnées : {historical_path}")
         
         # Création du fichier d'analyse
-        analysis_path = create_analysis_file()
+        analysis_path = create_analysis_file(force=force)
         logging.info(f"Fichier d'analyse créé : {analysis_path}")
         
     except Exception as e:
         logging.error(f"Échec du processus de fusion : {str(e)}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # Configuration du logging
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(description="Fusion des données actuelles et historiques")
+    parser.add_argument("--force", action="store_true",
+                        help="Recalcule les étapes même si leurs entrées sont inchangées (manifeste)")
+    args = parser.parse_args()
+    main(force=args.force)
\ No newline at end of file
@@ -0,0 +1,298 @@
+import os
+import json
+import time
+import logging
+import threading
+import functools
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+from script.paths import DATA_DIR
+
+# Mesures structurées des étapes du pipeline (une ligne JSON par étape et par sous-étape)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+METRICS_FILE = os.getenv("METRICS_FILE", f"{DATA_DIR}/metrics/pipeline_metrics.jsonl")
+# Pic mémoire Python par sous-étape via tracemalloc (ralentit les traitements) ; la mémoire
+# résidente du processus (RSS courante et pic) est relevée dans tous les cas
+METRICS_TRACE_MEMORY = os.getenv("METRICS_TRACE_MEMORY", "0") == "1"
+RUN_ID = os.getenv("METRICS_RUN_ID") or f"{datetime.now():%Y%m%dT%H%M%S}-{os.getpid()}"
+
+# Journaux fichiers (ajoutés à l'exécution et non plus à l'import des modules)
+LOG_DIR = os.getenv("LOG_DIR", DATA_DIR)
+
+MB = 1024 * 1024
+
+_local = threading.local()
+_emitted = []
+_lock = threading.Lock()
+
+class Measure:
+    """
+    Mesures d'une étape ou d'une sous-étape (cumulées sur tous ses appels)
+
+    Les champs rows_in, rows_out, bytes_read et bytes_written sont renseignés par le code
+    mesuré (voir record) ; les temps et la mémoire sont relevés automatiquement : mémoire
+    résidente à la sortie (rss_mb), pic du processus (max_rss_mb) et hausse de ce pic pendant
+    la mesure (max_rss_growth_mb), plus le pic tracemalloc (peak_mb) si METRICS_TRACE_MEMORY.
+    """
+
+    def __init__(self, stage: str, step: str = None):
+        self.stage = stage
+        self.step = step
+        self.calls = 0
+        self.wall_s = 0.0
+        self.cpu_s = 0.0
+        self.rows_in = None
+        self.rows_out = None
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.peak_mb = None
+        self.rss_mb = None
+        self.max_rss_mb = None
+        self.max_rss_growth_mb = None
+        self.status = 'ok'
+        self.steps = {}
+
+    def add(self, field: str, value):
+        if value is None:
+            return
+        current = getattr(self, field)
+        setattr(self, field, value if current is None else current + value)
+
+    def observe_peak(self, peak_bytes: int):
+        peak = peak_bytes / MB
+        self.peak_mb = peak if self.peak_mb is None else max(self.peak_mb, peak)
+
+    def observe_rss(self, rss_mb: float, max_rss: float, growth_mb: float):
+        """Mémoire résidente à la sortie d'un appel : maximum sur les appels, hausses du pic cumulées"""
+        if rss_mb is not None:
+            self.rss_mb = rss_mb if self.rss_mb is None else max(self.rss_mb, rss_mb)
+        if max_rss is not None:
+            self.max_rss_mb = max_rss if self.max_rss_mb is None else max(self.max_rss_mb, max_rss)
+        self.add('max_rss_growth_mb', growth_mb)
+
+    def to_dict(self) -> dict:
+        return {
+            'run_id': RUN_ID,
+            'stage': self.stage,
+            'step': self.step,
+            'calls': self.calls,
+            'wall_s': round(self.wall_s, 4),
+            'cpu_s': round(self.cpu_s, 4),
+            'rows_in': self.rows_in,
+            'rows_out': self.rows_out,
+            'bytes_read': self.bytes_read,
+            'bytes_written': self.bytes_written,
+            'peak_mb': None if self.peak_mb is None else round(self.peak_mb, 2),
+            'rss_mb': None if self.rss_mb is None else round(self.rss_mb, 1),
+            'max_rss_mb': None if self.max_rss_mb is None else round(self.max_rss_mb, 1),
+            'max_rss_growth_mb': None if self.max_rss_growth_mb is None else round(self.max_rss_growth_mb, 1),
+        }
+
+def _stack() -> list:
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    return _local.stack
+
+def max_rss_mb() -> float:
+    """Pic de mémoire résidente du processus depuis son démarrage (None hors Unix)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss est en Ko sous Linux, en octets sous macOS
+    return peak / MB if os.uname().sysname == 'Darwin' else peak / 1024
+
+def rss_mb() -> float:
+    """Mémoire résidente courante du processus (None si /proc n'est pas disponible)"""
+    try:
+        with open('/proc/self/statm', encoding='ascii') as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return resident_pages * os.sysconf('SC_PAGE_SIZE') / MB
+
+@contextmanager
+def _measured(measure: Measure):
+    """Mesure le temps écoulé, le temps CPU, la mémoire résidente et le pic mémoire (tracemalloc) d'un bloc"""
+    stack = _stack()
+    max_rss_before = max_rss_mb()
+    if METRICS_TRACE_MEMORY:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        # Le pic courant appartient aux mesures englobantes, avant sa remise à zéro
+        peak = tracemalloc.get_traced_memory()[1]
+        for parent in stack:
+            parent.observe_peak(peak)
+        tracemalloc.reset_peak()
+
+    stack.append(measure)
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        yield measure
+    except BaseException:
+        measure.status = 'error'
+        raise
+    finally:
+        measure.calls += 1
+        measure.wall_s += time.perf_counter() - wall
+        measure.cpu_s += time.process_time() - cpu
+        rss, max_rss = rss_mb(), max_rss_mb()
+        if rss is not None and max_rss is not None:
+            # ru_maxrss peut être relevé en retard sur /proc : le pic vaut au moins la RSS courante
+            max_rss = max(max_rss, rss)
+        measure.observe_rss(rss, max_rss, None if max_rss is None else max(0.0, max_rss - max_rss_before))
+        if METRICS_TRACE_MEMORY:
+            measure.observe_peak(tracemalloc.get_traced_memory()[1])
+        stack.pop()
+        if stack and measure.peak_mb is not None:
+            stack[-1].observe_peak(measure.peak_mb * MB)
+
+@contextmanager
+def step(name: str, rows_in: int = None):
+    """
+    Sous-étape d'une étape instrumentée (lecture, concaténation, déduplication, tri, écriture...)
+
+    Les appels successifs d'une même sous-étape sont cumulés dans l'étape englobante.
+    Hors d'une étape instrumentée (ou si METRICS_ENABLED=0), le bloc n'est pas mesuré.
+
+    Exemple:
+        >>> with step('dedup', rows_in=len(df)) as m:
+        ...     df = df.drop_duplicates()
+        ...     m.rows_out = len(df)
+    """
+    stack = _stack()
+    if not METRICS_ENABLED or not stack:
+        yield Measure(None, name)
+        return
+
+    stage = stack[0]
+    call = Measure(stage.stage, name)
+    call.rows_in = rows_in
+    try:
+        with _measured(call):
+            yield call
+    finally:
+        total = stage.steps.setdefault(name, Measure(stage.stage, name))
+        total.calls += 1
+        total.wall_s += call.wall_s
+        total.cpu_s += call.cpu_s
+        for field in ('rows_in', 'rows_out', 'bytes_read', 'bytes_written'):
+            total.add(field, getattr(call, field))
+        if call.peak_mb is not None:
+            total.observe_peak(call.peak_mb * MB)
+        total.observe_rss(call.rss_mb, call.max_rss_mb, call.max_rss_growth_mb)
+        # Les octets lus et écrits remontent jusqu'à l'étape
+        stage.bytes_read += call.bytes_read
+        stage.bytes_written += call.bytes_written
+
+def record(**values):
+    """
+    Renseigne des mesures (rows_in, rows_out, bytes_read, bytes_written) de la sous-étape
+    ou de l'étape en cours ; sans effet hors d'une étape instrumentée
+    """
+    stack = _stack()
+    if METRICS_ENABLED and stack:
+        for field, value in values.items():
+            setattr(stack[-1], field, value)
+
+def file_size(path: str) -> int:
+    return os.path.getsize(path) if path and os.path.isfile(path) else 0
+
+def instrument(func=None, name: str = None):
+    """
+    Décorateur d'une fonction du pipeline.
+
+    Appelée directement, la fonction est une étape : à sa sortie, une ligne est écrite dans
+    METRICS_FILE pour l'étape (temps écoulé et CPU, lignes, octets lus/écrits, pic mémoire)
+    et une ligne par sous-étape (cumul des appels de step). Appelée depuis une autre étape
+    instrumentée, elle est mesurée comme une sous-étape de celle-ci.
+
+    Exemple:
+        >>> @instrument
+        ... def merge_current_data(): ...
+    """
+    if func is None:
+        return lambda f: instrument(f, name)
+    stage_name = name or func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not METRICS_ENABLED:
+            return func(*args, **kwargs)
+        if _stack():
+            with step(stage_name) as measure:
+                result = func(*args, **kwargs)
+                if measure.rows_out is None and hasattr(result, 'shape'):
+                    measure.rows_out = len(result)
+                return result
+
+        stage = Measure(stage_name)
+        try:
+            with _measured(stage):
+                result = func(*args, **kwargs)
+                if stage.rows_out is None and hasattr(result, 'shape'):
+                    stage.rows_out = len(result)
+                return result
+        finally:
+            emit(stage)
+
+    return wrapper
+
+def emit(stage: Measure):
+    """Écrit les mesures d'une étape et de ses sous-étapes dans METRICS_FILE"""
+    rows = [{**stage.to_dict(), 'status': stage.status,
+             'finished_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S")}]
+    rows += [measure.to_dict() for measure in sorted(stage.steps.values(), key=lambda m: -m.wall_s)]
+    with _lock:
+        _emitted.extend(rows)
+    try:
+        os.makedirs(os.path.dirname(METRICS_FILE) or ".", exist_ok=True)
+        with _lock, open(METRICS_FILE, 'a', encoding='utf-8') as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+    except OSError as e:
+        # Les mesures ne doivent jamais faire échouer le pipeline
+        logging.warning(f"Mesures non enregistrées dans {METRICS_FILE} : {e}")
+
+def collect_metrics(clear: bool = True) -> list:
+    """Mesures émises par le processus courant (depuis le dernier appel si clear)"""
+    with _lock:
+        rows = list(_emitted)
+        if clear:
+            _emitted.clear()
+    return rows
+
+def push_metrics(ti, key: str = 'metrics') -> list:
+    """
+    Publie les mesures de la tâche en XCom Airflow
+
+    Args:
+        ti: TaskInstance Airflow (context['ti'])
+        key (str): Clé XCom
+
+    Returns:
+        list: Mesures publiées
+    """
+    rows = collect_metrics()
+    ti.xcom_push(key=key, value=rows)
+    return rows
+
+def add_log_file(file_name: str) -> str:
+    """
+    Ajoute (une seule fois) un journal fichier LOG_DIR/<file_name> au logger racine
+
+    Returns:
+        str: Chemin du journal
+    """
+    path = os.path.abspath(os.path.join(LOG_DIR, file_name))
+    root = logging.getLogger()
+    if any(isinstance(h, logging.FileHandler) and h.baseFilename == path for h in root.handlers):
+        return path
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    handler = logging.FileHandler(path)
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    root.addHandler(handler)
+    return path
@@ -0,0 +1,272 @@
+import json
+import time
+import zlib
+import random
+import argparse
+import logging
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+# Serveur local imitant /data/2.5/weather (OpenWeather) et /v1/archive (Open-Meteo archive),
+# pour tester les extracteurs sans réseau (OPENWEATHER_BASE_URL / OPEN_METEO_BASE_URL)
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+CONDITIONS = ['ciel dégagé', 'peu nuageux', 'nuageux', 'couvert', 'légère pluie', 'orage', 'brume']
+
+class MockBehaviour:
+    """
+    Comportement simulé du serveur
+
+    Args:
+        latency_ms (float): Latence ajoutée à chaque réponse
+        jitter_ms (float): Variation aléatoire (uniforme) de la latence
+        error_rate (float): Proportion de réponses HTTP 500/503
+        rate_limit (float): Requêtes par seconde acceptées (0 = illimité) ; au-delà, HTTP 429
+        retry_after (int): Valeur de l'en-tête Retry-After des réponses 429 (secondes)
+        padding_bytes (int): Octets ajoutés à chaque réponse JSON (champ "padding")
+        seed (int): Graine des tirages aléatoires (erreurs, latence)
+    """
+
+    def __init__(self, latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0,
+                 rate_limit: float = 0, retry_after: int = 1, padding_bytes: int = 0, seed: int = 0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.padding = "x" * padding_bytes
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.window_start = time.monotonic()
+        self.window_count = 0
+        self.stats = {'requests': 0, 'ok': 0, 'throttled': 0, 'errors': 0, 'not_found': 0}
+
+    def count(self, key: str):
+        with self.lock:
+            self.stats[key] += 1
+
+    def throttled(self) -> bool:
+        """Fenêtre fixe d'une seconde : au-delà de rate_limit requêtes, la requête est refusée"""
+        if self.rate_limit <= 0:
+            return False
+        with self.lock:
+            now = time.monotonic()
+            if now - self.window_start >= 1:
+                self.window_start, self.window_count = now, 0
+            self.window_count += 1
+            return self.window_count > self.rate_limit
+
+    def draw(self) -> tuple:
+        """Tire la latence (s) et l'éventuelle erreur serveur d'une requête"""
+        with self.lock:
+            delay = max(0.0, self.latency_ms + self.random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+            error = self.random.random() < self.error_rate
+            status = self.random.choice([500, 503]) if error else None
+        return delay, status
+
+def city_seed(*parts) -> int:
+    """Graine stable dérivée d'un nom de ville ou de coordonnées (mêmes données à chaque appel)"""
+    return zlib.crc32("|".join(str(p) for p in parts).encode('utf-8'))
+
+def current_payload(city: str) -> dict:
+    """Réponse au format /data/2.5/weather (units=metric) pour une ville quelconque"""
+    rng = np.random.default_rng(city_seed(city, datetime.now().strftime('%Y-%m-%d-%H')))
+    temperature = round(float(rng.normal(15, 9)), 2)
+    payload = {
+        'coord': {'lon': round(float(rng.uniform(-180, 180)), 4), 'lat': round(float(rng.uniform(-60, 70)), 4)},
+        'weather': [{'id': 800, 'main': 'Clouds', 'description': str(rng.choice(CONDITIONS)), 'icon': '04d'}],
+        'main': {
+            'temp': temperature,
+            'feels_like': temperature,
+            'temp_min': round(temperature - float(rng.uniform(0, 2)), 2),
+            'temp_max': round(temperature + float(rng.uniform(0, 2)), 2),
+            'pressure': int(rng.integers(990, 1035)),
+            'humidity': int(rng.integers(25, 100)),
+        },
+        'wind': {'speed': round(float(rng.gamma(2, 1.8)), 2), 'deg': int(rng.integers(0, 360))},
+        'clouds': {'all': int(rng.integers(0, 101))},
+        'dt': int(time.time()),
+        'sys': {'country': 'ZZ'},
+        'timezone': int(rng.integers(-12, 13)) * 3600,
+        'name': city,
+        'cod': 200,
+    }
+    if rng.random() < 0.2:
+        payload['rain'] = {'1h': round(float(rng.gamma(0.8, 1.5)), 2)}
+    return payload
+
+def archive_location(latitude: float, longitude: float, start: str, end: str,
+                     daily: list, hourly: list) -> dict:
+    """Réponse /v1/archive d'une coordonnée : blocs 'daily' et 'hourly' des variables demandées"""
+    rng = np.random.default_rng(city_seed(latitude, longitude))
+    days = pd.date_range(start, end, freq='D')
+    offset = int(round(longitude / 15)) * 3600
+    doy = days.dayofyear.to_numpy()
+    peak = 200 if latitude >= 0 else 20
+    mean = 28 - 0.45 * abs(latitude) + 0.25 * abs(latitude) * np.cos(2 * np.pi * (doy - peak) / 365.25)
+    mean = mean + rng.normal(0, 2.5, len(days))
+    precipitation = np.where(rng.random(len(days)) < 0.35, rng.gamma(0.8, 6.0, len(days)), 0.0)
+    snowy = mean < -1
+
+    daily_values = {
+        'temperature_2m_max': mean + 4,
+        'temperature_2m_min': mean - 4,
+        'precipitation_sum': precipitation,
+        'rain_sum': np.where(snowy, 0.0, precipitation),
+        'snowfall_sum': np.where(snowy, precipitation * 0.7, 0.0),
+    }
+    payload = {
+        'latitude': latitude, 'longitude': longitude, 'generationtime_ms': 0.1,
+        'utc_offset_seconds': offset, 'timezone': 'GMT', 'timezone_abbreviation': 'GMT',
+    }
+    if daily:
+        payload['daily_units'] = {'time': 'iso8601'}
+        payload['daily'] = {'time': days.strftime('%Y-%m-%d').tolist()}
+        for variable in daily:
+            values = daily_values.get(variable, np.zeros(len(days)))
+            payload['daily'][variable] = np.round(values, 1).tolist()
+    if hourly:
+        hours = pd.date_range(days[0], days[-1] + timedelta(hours=23), freq='h')
+        cycle = 4 * np.sin(2 * np.pi * (hours.hour.to_numpy() - 9) / 24)
+        base = np.repeat(mean, 24)
+        hourly_values = {
+            'temperature_2m': base + cycle,
+            'relative_humidity_2m': np.clip(70 - 2 * cycle + rng.normal(0, 8, len(hours)), 5, 100).round(),
+            'pressure_msl': 1013 + rng.normal(0, 6, len(hours)),
+            'wind_speed_10m': rng.gamma(2, 1.8, len(hours)),
+            'precipitation': np.repeat(precipitation / 24, 24),
+        }
+        payload['hourly'] = {'time': hours.strftime('%Y-%m-%dT%H:%M').tolist()}
+        for variable in hourly:
+            values = hourly_values.get(variable, np.zeros(len(hours)))
+            payload['hourly'][variable] = np.round(values, 1).tolist()
+    return payload
+
+def archive_payload(query: dict):
+    """Réponse /v1/archive : un objet pour une coordonnée, une liste dans l'ordre pour plusieurs"""
+    latitudes = [float(v) for v in query['latitude'][0].split(',')]
+    longitudes = [float(v) for v in query['longitude'][0].split(',')]
+    if len(latitudes) != len(longitudes):
+        raise ValueError("latitude et longitude doivent avoir le même nombre de valeurs")
+    daily = [v for values in query.get('daily', []) for v in values.split(',')]
+    hourly = [v for values in query.get('hourly', []) for v in values.split(',')]
+    locations = [archive_location(lat, lon, query['start_date'][0], query['end_date'][0], daily, hourly)
+                 for lat, lon in zip(latitudes, longitudes)]
+    return locations[0] if len(locations) == 1 else locations
+
+def make_handler(behaviour: MockBehaviour):
+    class MockHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            # Journalisation des requêtes désactivée (charge élevée)
+            pass
+
+        def send_json(self, status: int, body, headers: dict = None):
+            if behaviour.padding:
+                body = ([{**item, 'padding': behaviour.padding} for item in body] if isinstance(body, list)
+                        else {**body, 'padding': behaviour.padding})
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            behaviour.count('requests')
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+
+            if url.path == '/stats':
+                self.send_json(200, dict(behaviour.stats))
+                return
+
+            delay, error_status = behaviour.draw()
+            time.sleep(delay)
+            if behaviour.throttled():
+                behaviour.count('throttled')
+                self.send_json(429, {'cod': 429, 'message': 'Too many requests'},
+                               {'Retry-After': str(behaviour.retry_after)})
+                return
+            if error_status is not None:
+                behaviour.count('errors')
+                self.send_json(error_status, {'cod': error_status, 'message': 'Simulated server error'})
+                return
+
+            try:
+                if url.path.endswith('/data/2.5/weather') and 'q' in query:
+                    body = current_payload(query['q'][0])
+                elif url.path.endswith('/v1/archive') and 'latitude' in query:
+                    body = archive_payload(query)
+                else:
+                    behaviour.count('not_found')
+                    self.send_json(404, {'cod': 404, 'message': 'Not found'})
+                    return
+            except (KeyError, ValueError) as e:
+                behaviour.count('errors')
+                self.send_json(400, {'error': True, 'reason': str(e)})
+                return
+            behaviour.count('ok')
+            self.send_json(200, body)
+
+    return MockHandler
+
+def start_mock_server(host: str = DEFAULT_HOST, port: int = 0, **options) -> ThreadingHTTPServer:
+    """
+    Démarre le serveur dans un thread d'arrière-plan (port 0 : port libre choisi par le système)
+
+    Exemple:
+        >>> server = start_mock_server(latency_ms=50, error_rate=0.05, rate_limit=100)
+        >>> os.environ["OPENWEATHER_BASE_URL"] = f"http://127.0.0.1:{server.server_port}"
+        >>> server.shutdown()
+
+    Returns:
+        ThreadingHTTPServer: Serveur démarré (attribut behaviour : statistiques des requêtes)
+    """
+    behaviour = MockBehaviour(**options)
+    server = ThreadingHTTPServer((host, port), make_handler(behaviour))
+    server.daemon_threads = True
+    server.behaviour = behaviour
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logging.info(f"Serveur météo simulé sur http://{host}:{server.server_port}")
+    return server
+
+if __name__ == "__main__":
+    # Configuration du logging
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(description="Serveur local imitant les API OpenWeather et Open-Meteo")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency-ms", type=float, default=0, help="Latence ajoutée à chaque réponse")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Variation aléatoire de la latence")
+    parser.add_argument("--error-rate", type=float, default=0, help="Proportion de réponses 500/503")
+    parser.add_argument("--rate-limit", type=float, default=0, help="Requêtes/s acceptées avant HTTP 429 (0 = illimité)")
+    parser.add_argument("--retry-after", type=int, default=1, help="En-tête Retry-After des réponses 429")
+    parser.add_argument("--padding-bytes", type=int, default=0, help="Octets ajoutés à chaque réponse")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    behaviour = MockBehaviour(args.latency_ms, args.jitter_ms, args.error_rate, args.rate_limit,
+                              args.retry_after, args.padding_bytes, args.seed)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(behaviour))
+    server.daemon_threads = True
+    logging.info(f"Serveur météo simulé sur http://{args.host}:{args.port} (Ctrl+C pour arrêter)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        logging.info(f"Statistiques : {behaviour.stats}")
@@ -0,0 +1,27 @@
+import os
+
+# Chemins des données partagés par les scripts, définis une seule fois.
+# Tables sans extension : le format est choisi par STORAGE_FORMAT (voir storage.py).
+# WEATHER_DATA_DIR : racine des données ("data", relative au répertoire courant, par défaut) ;
+# un chemin absolu permet d'exécuter les scripts depuis n'importe quel répertoire (Airflow).
+DATA_DIR = os.getenv("WEATHER_DATA_DIR", "data")
+
+# Fichiers bruts des extracteurs
+CURRENT_INPUT_DIR = f"{DATA_DIR}/current"
+HISTORICAL_INPUT_DIR = f"{DATA_DIR}/historical"
+HOURLY_DIR = f"{DATA_DIR}/historical_hourly"
+
+def historical_file_path(city: str) -> str:
+    """Retourne le chemin du fichier historique brut d'une ville (écrit par extract_historic.py)"""
+    return f"{HISTORICAL_INPUT_DIR}/{city.lower().replace(' ', '_')}_historical.csv"
+
+# Couche processed : données fusionnées et états des mises à jour incrémentales
+PROCESSED_DIR = f"{DATA_DIR}/processed"
+CURRENT_GLOBAL = f"{PROCESSED_DIR}/current_global"
+HISTORICAL_GLOBAL = f"{PROCESSED_DIR}/historical_global"
+HISTORICAL_PARTITIONS = f"{PROCESSED_DIR}/historical"
+
+# Couches analysis et star_schema
+ANALYSIS_DIR = f"{DATA_DIR}/analysis"
+STAR_SCHEMA_DIR = f"{DATA_DIR}/star_schema"
+CUBE_DIR = f"{DATA_DIR}/cube"
@@ -0,0 +1,94 @@
+import os
+import argparse
+import logging
+
+from script import extract_historic
+from script.cities import CITIES
+from script.cube import CUBE_ENABLED
+from script.extract import extract_current_weather
+from script.hourly import add_hourly_measures
+from script.manifest import record_stage
+from script.merge import (ANALYSIS_FILE, ANALYSIS_INPUT_COLUMNS, analysis_stage, build_analysis,
+                          collect_current_data, compact_current_partitions, create_analysis_file,
+                          load_historical_global, merge_historical_data, save_current_data)
+from script.paths import STAR_SCHEMA_DIR
+from script.storage import table_path, write_table
+from script.transform import (HISTORICAL_INPUT_COLUMNS, STAR_SCHEMA_TABLES, build_star_schema, save_results,
+                              star_schema_stage, update_derived_tables)
+
+def run_pipeline(cities: list = None, api_key: str = None, skip_extract: bool = False) -> dict:
+    """
+    Exécute extraction → fusion → transformation dans un seul processus.
+
+    current_global est passé en mémoire à l'analyse et à la transformation. L'historique
+    est fusionné de manière incrémentale dans les partitions par ville (merge_historical_data) :
+    les partitions réécrites restent en mémoire, seules les partitions inchangées sont relues,
+    et le tout est partagé par l'analyse et le schéma en étoile. Chaque artefact
+    (current_global, fichier d'analyse, dimensions, table de faits) n'est écrit qu'une fois,
+    et les étapes produites sont enregistrées dans le manifeste : une exécution séparée de
+    merge.py ou transform.py qui suit ne les recalcule pas.
+    Les fonctions de chaque étape restent utilisables séparément (tâches Airflow).
+
+    Args:
+        cities (list): Villes à traiter (référentiel script/cities.py par défaut)
+        api_key (str): Clé d'API OpenWeather (variable d'environnement API_KEY par défaut)
+        skip_extract (bool): Réutilise les fichiers bruts déjà présents dans data/
+
+    Returns:
+        dict: Chemins des artefacts écrits
+    """
+    cities = cities or CITIES
+
+    try:
+        # 1. Extraction (les fichiers bruts restent l'interface avec les API)
+        if not skip_extract:
+            extract_current_weather(cities, api_key or os.getenv("API_KEY"))
+            extract_historic.main(cities=cities)
+
+        # 2. Fusion : current_global en mémoire, historique incrémental dans les partitions
+        compact_current_partitions()
+        current_df, current_signatures = collect_current_data()
+        merged = {}
+        merge_historical_data(merged=merged)
+        columns = list(dict.fromkeys(HISTORICAL_INPUT_COLUMNS + ANALYSIS_INPUT_COLUMNS))
+        historical_df = load_historical_global(columns=columns, merged=merged)
+
+        # 3. Schéma en étoile à partir des mêmes DataFrames
+        dims, fact = build_star_schema(current_df, add_hourly_measures(historical_df[HISTORICAL_INPUT_COLUMNS]))
+
+        # 4. Persistance unique de chaque artefact, enregistrée dans le manifeste
+        outputs = {}
+        if current_signatures is not None:
+            outputs['current_global'] = save_current_data(current_df, current_signatures)
+        if CUBE_ENABLED:
+            # Le cube dense est tenu à jour par create_analysis_file
+            outputs['analysis'] = create_analysis_file()
+        else:
+            analysis_df = build_analysis(current_df, historical_df[ANALYSIS_INPUT_COLUMNS])
+            outputs['analysis'] = write_table(analysis_df, ANALYSIS_FILE)
+            record_stage('analysis', *analysis_stage())
+        save_results(dims, fact)
+        record_stage('star_schema', *star_schema_stage())
+        outputs.update({name: table_path(f"{STAR_SCHEMA_DIR}/{name}") for name in STAR_SCHEMA_TABLES})
+
+        # 5. Tables dérivées activées (base SQLite, agrégats, anomalies)
+        outputs.update(update_derived_tables())
+
+        logging.info(f"Pipeline fusionné terminé : {len(fact)} faits, {len(dims['ville'])} villes")
+        return outputs
+
+    except Exception as e:
+        logging.error(f"Échec du pipeline fusionné : {str(e)}")
+        raise
+
+if __name__ == "__main__":
+    # Configuration du logging
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(description="Pipeline complet extraction → fusion → transformation")
+    parser.add_argument("--skip-extract", action="store_true",
+                        help="Réutilise les fichiers bruts déjà extraits dans data/")
+    args = parser.parse_args()
+    run_pipeline(skip_extract=args.skip_extract)
@@ -0,0 +1,222 @@
+import os
+import argparse
+import logging
+import sqlite3
+from contextlib import closing
+
+import pandas as pd
+
+from script.paths import STAR_SCHEMA_DIR
+from script.schema import FACT_WEATHER_SCHEMA
+from script.storage import iter_table, read_table
+
+# Base SQLite embarquée, reconstruite à partir des tables du schéma en étoile
+STAR_SCHEMA_DB = os.getenv("STAR_SCHEMA_DB", f"{STAR_SCHEMA_DIR}/weather.sqlite")
+STAR_SCHEMA_DB_ENABLED = os.getenv("STAR_SCHEMA_DB_ENABLED", "0") == "1"
+
+# Nombre de lignes de faits insérées par lot
+DB_BATCH_ROWS = 100_000
+
+DIMENSIONS = ['dim_ville', 'dim_temps', 'dim_climat']
+
+INDEXES = [
+    "CREATE INDEX idx_fact_ville_date ON fact_weather (ville_id, date_id)",
+    "CREATE INDEX idx_fact_climat ON fact_weather (climat_id)",
+    "CREATE UNIQUE INDEX idx_dim_ville ON dim_ville (ville_id)",
+    "CREATE UNIQUE INDEX idx_dim_ville_nom ON dim_ville (ville)",
+    "CREATE UNIQUE INDEX idx_dim_temps ON dim_temps (date_id)",
+    "CREATE INDEX idx_dim_temps_mois ON dim_temps (annee, mois)",
+]
+
+# Mesures et regroupements autorisés dans les requêtes (noms de colonnes insérés dans le SQL)
+MEASURES = ['temperature', 'temp_min', 'temp_max', 'humidite', 'pression', 'vent_vitesse',
+            'precipitation', 'pluie', 'neige', 'couverture_nuageuse']
+GROUPINGS = {
+    'mois': ['t.annee', 't.mois'],
+    'saison': ['t.annee', 't.saison'],
+    'annee': ['t.annee'],
+}
+
+def materialize_star_schema(db_path: str = None) -> str:
+    """
+    Charge les dimensions et la table de faits publiées dans une base SQLite et crée les index.
+
+    La table de faits est insérée par lots (elle n'est jamais chargée entièrement).
+    La base est construite dans un fichier temporaire puis remplace l'ancienne.
+
+    Args:
+        db_path (str): Fichier de la base (STAR_SCHEMA_DB par défaut)
+
+    Returns:
+        str: Chemin de la base créée
+    """
+    db_path = db_path or STAR_SCHEMA_DB
+    tmp_path = f"{db_path}.tmp"
+
+    try:
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+        with sqlite3.connect(tmp_path) as conn:
+            for name in DIMENSIONS:
+                dim = read_table(f"{STAR_SCHEMA_DIR}/{name}")
+                if name == 'dim_temps':
+                    # Clé entière (YYYYMMDD) pour la jointure indexée avec fact_weather
+                    dim['date_id'] = pd.to_numeric(dim['date_id']).astype('int64')
+                    dim['date'] = pd.to_datetime(dim['date']).dt.strftime('%Y-%m-%d')
+                dim.to_sql(name, conn, index=False)
+
+            rows = 0
+            for batch in iter_table(f"{STAR_SCHEMA_DIR}/fact_weather", DB_BATCH_ROWS, schema=FACT_WEATHER_SCHEMA):
+                batch.to_sql('fact_weather', conn, index=False, if_exists='append')
+                rows += len(batch)
+
+            for statement in INDEXES:
+                conn.execute(statement)
+            conn.execute("ANALYZE")
+        conn.close()
+
+        os.replace(tmp_path, db_path)
+        logging.info(f"Base {db_path} créée : {rows} faits, index sur (ville_id, date_id) et climat_id")
+        return db_path
+
+    except Exception as e:
+        logging.error(f"Erreur lors de la création de la base du schéma en étoile : {str(e)}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def connect(db_path: str = None) -> sqlite3.Connection:
+    """Ouvre la base en lecture seule"""
+    db_path = db_path or STAR_SCHEMA_DB
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(f"Base introuvable : {db_path} (lancer transform.py avec STAR_SCHEMA_DB_ENABLED=1)")
+    return sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+
+def check_measure(measure: str):
+    if measure not in MEASURES:
+        raise ValueError(f"Mesure inconnue : {measure} (attendu : {', '.join(MEASURES)})")
+
+def date_filters(start: str = None, end: str = None) -> tuple:
+    """Conditions sur date_id (YYYYMMDD, colonne indexée) pour une période"""
+    clauses, params = [], []
+    if start:
+        clauses.append("f.date_id >= ?")
+        params.append(int(pd.Timestamp(start).strftime('%Y%m%d')))
+    if end:
+        clauses.append("f.date_id <= ?")
+        params.append(int(pd.Timestamp(end).strftime('%Y%m%d')))
+    return clauses, params
+
+def city_series(ville: str, start: str = None, end: str = None, measures: list = None,
+                db_path: str = None) -> pd.DataFrame:
+    """
+    Série journalière d'une ville sur une période (recherche par l'index (ville_id, date_id))
+
+    Args:
+        ville (str): Nom de la ville
+        start (str): Première date incluse (YYYY-MM-DD)
+        end (str): Dernière date incluse (YYYY-MM-DD)
+        measures (list): Mesures retournées (toutes par défaut)
+    """
+    measures = measures or MEASURES
+    for measure in measures:
+        check_measure(measure)
+    clauses, params = date_filters(start, end)
+    sql = (f"SELECT t.date, {', '.join('f.' + m for m in measures)}, f.description, f.source_type "
+           "FROM fact_weather f "
+           "JOIN dim_ville v ON v.ville_id = f.ville_id "
+           "JOIN dim_temps t ON t.date_id = f.date_id "
+           f"WHERE {' AND '.join(['v.ville = ?'] + clauses)} "
+           "ORDER BY f.date_id")
+    with closing(connect(db_path)) as conn:
+        return pd.read_sql_query(sql, conn, params=[ville] + params)
+
+def compare_cities(villes: list, measure: str = 'temperature', by: str = 'mois',
+                   start: str = None, end: str = None, db_path: str = None) -> pd.DataFrame:
+    """
+    Moyenne, minimum et maximum d'une mesure par ville et par période (mois, saison ou année)
+
+    Exemple:
+        >>> compare_cities(["Tokyo", "Paris"], "temperature", by="mois")
+    """
+    check_measure(measure)
+    if by not in GROUPINGS:
+        raise ValueError(f"Regroupement inconnu : {by} (attendu : {', '.join(GROUPINGS)})")
+    clauses, params = date_filters(start, end)
+    clauses.insert(0, f"v.ville IN ({', '.join('?' for _ in villes)})")
+    groups = ', '.join(GROUPINGS[by])
+    sql = (f"SELECT v.ville, {groups}, COUNT(f.{measure}) AS nb_jours, "
+           f"AVG(f.{measure}) AS moyenne, MIN(f.{measure}) AS minimum, MAX(f.{measure}) AS maximum "
+           "FROM fact_weather f "
+           "JOIN dim_ville v ON v.ville_id = f.ville_id "
+           "JOIN dim_temps t ON t.date_id = f.date_id "
+           f"WHERE {' AND '.join(clauses)} "
+           f"GROUP BY v.ville, {groups} ORDER BY {groups}, v.ville")
+    with closing(connect(db_path)) as conn:
+        return pd.read_sql_query(sql, conn, params=list(villes) + params)
+
+def climate_distribution(villes: list = None, db_path: str = None) -> pd.DataFrame:
+    """Nombre de jours par type de climat (dim_climat) et par ville"""
+    where, params = "", []
+    if villes:
+        where = f"WHERE v.ville IN ({', '.join('?' for _ in villes)}) "
+        params = list(villes)
+    sql = ("SELECT v.ville, c.type AS climat, COUNT(*) AS nb_jours "
+           "FROM fact_weather f "
+           "JOIN dim_ville v ON v.ville_id = f.ville_id "
+           "JOIN dim_climat c ON c.climat_id = f.climat_id "
+           f"{where}GROUP BY v.ville, c.type ORDER BY v.ville, nb_jours DESC")
+    with closing(connect(db_path)) as conn:
+        return pd.read_sql_query(sql, conn, params=params)
+
+def run_sql(sql: str, db_path: str = None) -> pd.DataFrame:
+    """Exécute une requête SQL libre (connexion en lecture seule)"""
+    with closing(connect(db_path)) as conn:
+        return pd.read_sql_query(sql, conn)
+
+if __name__ == "__main__":
+    # Configuration du logging
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(description="Requêtes sur la base SQLite du schéma en étoile")
+    parser.add_argument("--db", default=None, help="Fichier de la base (STAR_SCHEMA_DB par défaut)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("build", help="(Re)construit la base à partir de data/star_schema/")
+
+    series = commands.add_parser("series", help="Série journalière d'une ville")
+    series.add_argument("ville")
+    series.add_argument("--start")
+    series.add_argument("--end")
+    series.add_argument("--measures", nargs="+")
+
+    compare = commands.add_parser("compare", help="Comparaison de villes par mois, saison ou année")
+    compare.add_argument("villes", nargs="+")
+    compare.add_argument("--measure", default="temperature", choices=MEASURES)
+    compare.add_argument("--by", default="mois", choices=list(GROUPINGS))
+    compare.add_argument("--start")
+    compare.add_argument("--end")
+
+    climate = commands.add_parser("climats", help="Répartition des jours par type de climat")
+    climate.add_argument("villes", nargs="*")
+
+    free = commands.add_parser("sql", help="Requête SQL libre")
+    free.add_argument("query")
+
+    args = parser.parse_args()
+    if args.command == "build":
+        materialize_star_schema(args.db)
+    else:
+        if args.command == "series":
+            result = city_series(args.ville, args.start, args.end, args.measures, db_path=args.db)
+        elif args.command == "compare":
+            result = compare_cities(args.villes, args.measure, args.by, args.start, args.end, db_path=args.db)
+        elif args.command == "climats":
+            result = climate_distribution(args.villes, db_path=args.db)
+        else:
+            result = run_sql(args.query, db_path=args.db)
+        print(result.to_string(index=False))
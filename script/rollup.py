@@ -0,0 +1,247 @@
+import os
+import argparse
+import logging
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+
+from script.paths import PROCESSED_DIR, STAR_SCHEMA_DIR
+from script.query import STAR_SCHEMA_DB, STAR_SCHEMA_DB_ENABLED, connect
+from script.schema import FACT_WEATHER_SCHEMA
+from script.storage import find_table, iter_table, read_table, table_exists, table_path, write_table
+
+# Agrégats pré-calculés par ville, publiés à côté du schéma en étoile
+ROLLUP_TABLES = {
+    'mois': f"{STAR_SCHEMA_DIR}/rollup_mensuel",
+    'saison': f"{STAR_SCHEMA_DIR}/rollup_saisonnier",
+    'annee': f"{STAR_SCHEMA_DIR}/rollup_annuel",
+}
+ROLLUPS_ENABLED = os.getenv("ROLLUPS_ENABLED", "0") == "1"
+
+# Clés (ville, date) touchées par les fusions et pas encore reportées dans les agrégats
+PENDING_FILE = f"{PROCESSED_DIR}/rollup_pending.csv"
+
+ROLLUP_MEASURES = ['temperature', 'temp_min', 'temp_max', 'humidite', 'pression',
+                   'vent_vitesse', 'precipitation', 'pluie', 'neige']
+# Statistiques suffisantes, fusionnables entre lots, mois ou villes
+STATISTICS = ['count', 'sum', 'sumsq', 'min', 'max']
+
+# Même correspondance que dim_temps.saison (trimestre de l'année)
+SAISONS = {1: 'Hiver', 2: 'Printemps', 3: 'Été', 4: 'Automne'}
+
+def record_touched(keys: pd.DataFrame):
+    """
+    Enregistre les clés (ville, date YYYY-MM-DD) nouvelles ou modifiées lors d'une fusion,
+    pour que seules les périodes correspondantes soient recalculées
+
+    Ne fait rien si les agrégats ne sont pas activés (ROLLUPS_ENABLED).
+    """
+    if not ROLLUPS_ENABLED or keys.empty:
+        return
+    keys = keys[['ville', 'date']].drop_duplicates()
+    os.makedirs(os.path.dirname(PENDING_FILE), exist_ok=True)
+    keys.to_csv(PENDING_FILE, mode='a', header=not os.path.exists(PENDING_FILE), index=False)
+
+def statistics_columns() -> list:
+    return [f"{m}_{s}" for m in ROLLUP_MEASURES for s in STATISTICS]
+
+def statistics_aggregations() -> dict:
+    """Fonction de fusion de chaque statistique : somme pour count/sum/sumsq, min et max sinon"""
+    return {col: col.rsplit('_', 1)[1] if col.endswith(('_min', '_max')) else 'sum'
+            for col in statistics_columns()}
+
+def monthly_statistics(fact: pd.DataFrame) -> pd.DataFrame:
+    """Statistiques suffisantes par (ville_id, annee, mois) d'un lot de faits"""
+    keys = pd.DataFrame({
+        'ville_id': fact['ville_id'].to_numpy(),
+        'annee': fact['date_id'].to_numpy() // 10000,
+        'mois': fact['date_id'].to_numpy() // 100 % 100,
+    })
+    columns = {}
+    for measure in ROLLUP_MEASURES:
+        values = pd.to_numeric(fact[measure], errors='coerce').astype('float64').to_numpy()
+        columns[f"{measure}_count"] = ~np.isnan(values)
+        columns[f"{measure}_sum"] = values
+        columns[f"{measure}_sumsq"] = values ** 2
+        columns[f"{measure}_min"] = values
+        columns[f"{measure}_max"] = values
+    data = pd.concat([keys, pd.DataFrame(columns)], axis=1)
+    return data.groupby(['ville_id', 'annee', 'mois'], as_index=False).agg(statistics_aggregations())
+
+def merge_statistics(partials: pd.DataFrame, keys: list) -> pd.DataFrame:
+    """
+    Fusionne des statistiques suffisantes selon les clés données
+    (lots d'une même période, mois d'une saison ou d'une année)
+    """
+    merged = partials.groupby(keys, as_index=False).agg(statistics_aggregations())
+    for measure in ROLLUP_MEASURES:
+        # Une somme de NaN vaut 0 : une période sans mesure garde des statistiques vides
+        empty = merged[f"{measure}_count"] == 0
+        merged.loc[empty, [f"{measure}_sum", f"{measure}_sumsq"]] = np.nan
+    return merged
+
+def add_moments(rollup: pd.DataFrame) -> pd.DataFrame:
+    """Ajoute moyenne et écart-type (ddof=1) calculés à partir des statistiques suffisantes"""
+    rollup = rollup.copy()
+    for measure in ROLLUP_MEASURES:
+        count = rollup[f"{measure}_count"].astype('float64')
+        total = rollup[f"{measure}_sum"]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = total / count
+            variance = ((rollup[f"{measure}_sumsq"] - total * mean) / (count - 1)).clip(lower=0)
+        rollup[f"{measure}_moyenne"] = mean.where(count > 0)
+        rollup[f"{measure}_std"] = np.sqrt(variance).where(count > 1)
+    return rollup
+
+def month_periods(months: pd.DataFrame) -> np.ndarray:
+    """Périodes YYYYMM des mois (annee, mois)"""
+    return months['annee'].to_numpy(dtype='int64') * 100 + months['mois'].to_numpy(dtype='int64')
+
+def database_is_current() -> bool:
+    """Indique si la base SQLite (STAR_SCHEMA_DB_ENABLED) existe et n'est pas plus ancienne que fact_weather"""
+    fact_path = find_table(f"{STAR_SCHEMA_DIR}/fact_weather")
+    return (STAR_SCHEMA_DB_ENABLED and fact_path is not None and os.path.exists(STAR_SCHEMA_DB)
+            and os.path.getmtime(STAR_SCHEMA_DB) >= os.path.getmtime(fact_path))
+
+def iter_touched_facts(months: pd.DataFrame, columns: list):
+    """
+    Lit les seuls faits des villes et de l'intervalle de dates des mois touchés
+
+    La base SQLite, si elle est à jour, est interrogée ville par ville avec l'index
+    (ville_id, date_id) ; sinon fact_weather est filtré à la lecture (groupes de lignes
+    Parquet ignorés d'après leurs statistiques, lots CSV/Feather filtrés dès leur lecture).
+    """
+    if database_is_current():
+        sql = f"SELECT {', '.join(columns)} FROM fact_weather WHERE ville_id = ? AND date_id BETWEEN ? AND ?"
+        with closing(connect()) as conn:
+            for ville_id, city_months in months.groupby('ville_id'):
+                periods = month_periods(city_months)
+                yield pd.read_sql_query(sql, conn, params=(int(ville_id), int(periods.min()) * 100 + 1,
+                                                           int(periods.max()) * 100 + 31))
+        return
+
+    periods = month_periods(months)
+    filters = [('ville_id', 'in', sorted(int(v) for v in months['ville_id'].unique())),
+               ('date_id', '>=', int(periods.min()) * 100 + 1),
+               ('date_id', '<=', int(periods.max()) * 100 + 31)]
+    yield from iter_table(f"{STAR_SCHEMA_DIR}/fact_weather", columns=columns, schema=FACT_WEATHER_SCHEMA,
+                          filters=filters)
+
+def scan_monthly_statistics(months: pd.DataFrame = None) -> pd.DataFrame:
+    """
+    Calcule les statistiques mensuelles à partir de fact_weather, lu par lots
+
+    Args:
+        months (pd.DataFrame): Périodes (ville_id, annee, mois) à recalculer (toutes par défaut) ;
+            seuls les faits de ces villes et de leur intervalle de dates sont lus
+    """
+    columns = ['ville_id', 'date_id'] + ROLLUP_MEASURES
+    wanted = None
+    if months is None:
+        batches = iter_table(f"{STAR_SCHEMA_DIR}/fact_weather", columns=columns, schema=FACT_WEATHER_SCHEMA)
+    elif months.empty:
+        batches = iter([])
+    else:
+        batches = iter_touched_facts(months, columns)
+        # Clé numérique ville_id * 10^6 + YYYYMM pour un filtrage vectorisé
+        wanted = months['ville_id'].to_numpy(dtype='int64') * 1_000_000 + month_periods(months)
+
+    partials = []
+    for batch in batches:
+        if wanted is not None:
+            keys = batch['ville_id'].to_numpy(dtype='int64') * 1_000_000 + batch['date_id'].to_numpy(dtype='int64') // 100
+            batch = batch[np.isin(keys, wanted)]
+        if not batch.empty:
+            partials.append(monthly_statistics(batch))
+
+    if not partials:
+        return pd.DataFrame(columns=['ville_id', 'annee', 'mois'] + statistics_columns())
+    return merge_statistics(pd.concat(partials, ignore_index=True), ['ville_id', 'annee', 'mois'])
+
+def load_pending() -> pd.DataFrame:
+    if not os.path.exists(PENDING_FILE):
+        return pd.DataFrame(columns=['ville', 'date'])
+    return pd.read_csv(PENDING_FILE).drop_duplicates()
+
+def touched_months(pending: pd.DataFrame) -> pd.DataFrame:
+    """Convertit les clés (ville, date) en périodes (ville_id, annee, mois) via dim_ville"""
+    dim_ville = read_table(f"{STAR_SCHEMA_DIR}/dim_ville", columns=['ville_id', 'ville'])
+    dates = pd.to_datetime(pending['date'])
+    months = pd.DataFrame({'ville': pending['ville'].to_numpy(), 'annee': dates.dt.year.to_numpy(),
+                           'mois': dates.dt.month.to_numpy()})
+    months = months.merge(dim_ville, on='ville', how='inner')
+    return months[['ville_id', 'annee', 'mois']].drop_duplicates()
+
+def update_rollups(full_rebuild: bool = False) -> dict:
+    """
+    Met à jour les agrégats par (ville_id, annee, mois), (ville_id, annee, saison) et (ville_id, annee).
+
+    Seuls les mois touchés par de nouveaux faits (clés enregistrées par record_touched lors
+    de la fusion) sont recalculés, en ne lisant que les faits de leurs villes et de leur
+    intervalle de dates (base SQLite indexée si elle est à jour) ; les saisons et années
+    concernées sont ensuite obtenues en fusionnant les statistiques suffisantes des mois,
+    sans relire les faits. Sans agrégats existants, tout est reconstruit.
+
+    Args:
+        full_rebuild (bool): Recalcule tous les agrégats à partir de fact_weather
+
+    Returns:
+        dict: Chemins des tables d'agrégats (mois, saison, annee)
+    """
+    try:
+        monthly_base = ROLLUP_TABLES['mois']
+        full_rebuild = full_rebuild or not all(table_exists(base) for base in ROLLUP_TABLES.values())
+
+        if full_rebuild:
+            monthly = scan_monthly_statistics()
+            years = None
+        else:
+            pending = load_pending()
+            if pending.empty:
+                logging.info("Agrégats à jour : aucun nouveau fait depuis la dernière mise à jour.")
+                return {name: table_path(base) for name, base in ROLLUP_TABLES.items()}
+            months = touched_months(pending)
+            recomputed = scan_monthly_statistics(months)
+            existing = read_table(monthly_base, columns=['ville_id', 'annee', 'mois'] + statistics_columns())
+            touched = existing.set_index(['ville_id', 'annee', 'mois']).index.isin(
+                months.set_index(['ville_id', 'annee', 'mois']).index)
+            monthly = pd.concat([existing[~touched], recomputed], ignore_index=True)
+            years = months[['ville_id', 'annee']].drop_duplicates()
+
+        monthly = monthly.sort_values(['ville_id', 'annee', 'mois']).reset_index(drop=True)
+        write_table(add_moments(monthly), monthly_base)
+
+        # Saisons et années : fusion des statistiques mensuelles des années touchées
+        source = monthly if years is None else monthly.merge(years, on=['ville_id', 'annee'])
+        source = source.assign(saison=((source['mois'] - 1) // 3 + 1).map(SAISONS))
+        for name, keys in (('saison', ['ville_id', 'annee', 'saison']), ('annee', ['ville_id', 'annee'])):
+            rollup = merge_statistics(source, keys)
+            if years is not None:
+                existing = read_table(ROLLUP_TABLES[name], columns=keys + statistics_columns())
+                touched = existing.set_index(['ville_id', 'annee']).index.isin(
+                    years.set_index(['ville_id', 'annee']).index)
+                rollup = pd.concat([existing[~touched], rollup], ignore_index=True)
+            rollup = rollup.sort_values(keys).reset_index(drop=True)
+            write_table(add_moments(rollup), ROLLUP_TABLES[name])
+
+        if os.path.exists(PENDING_FILE):
+            os.remove(PENDING_FILE)
+        scope = "reconstruits" if years is None else f"mis à jour ({len(years)} années ville touchées)"
+        logging.info(f"Agrégats mensuels, saisonniers et annuels {scope} : {len(monthly)} mois ville")
+        return {name: table_path(base) for name, base in ROLLUP_TABLES.items()}
+
+    except Exception as e:
+        logging.error(f"Erreur lors de la mise à jour des agrégats : {str(e)}")
+        raise
+
+if __name__ == "__main__":
+    # Configuration du logging
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(description="Agrégats mensuels, saisonniers et annuels par ville")
+    parser.add_argument("--full-rebuild", action="store_true", help="Recalcule tous les agrégats")
+    args = parser.parse_args()
+    update_rollups(full_rebuild=args.full_rebuild)
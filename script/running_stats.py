@@ -0,0 +1,153 @@
+import os
+import json
+import math
+import logging
+
+import numpy as np
+import pandas as pd
+
+from script.paths import HISTORICAL_PARTITIONS, PROCESSED_DIR
+from script.schema import HISTORICAL_GLOBAL_SCHEMA
+from script.storage import list_partitions, partition_signature, read_table
+
+# Statistiques historiques courantes par ville, mises à jour avec les seules lignes fusionnées
+RUNNING_STATS_FILE = f"{PROCESSED_DIR}/historical_stats.json"
+RUNNING_MEASURES = ['temp_max', 'temp_min', 'precipitation', 'pluie', 'neige']
+
+def batch_moments(values) -> dict:
+    """Effectif, moyenne, somme des carrés des écarts (M2) et somme d'un lot de valeurs (NaN ignorés)"""
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    if values.size == 0:
+        return {'count': 0, 'mean': 0.0, 'm2': 0.0, 'sum': 0.0}
+    # Somme exacte (math.fsum) : le total ne dépend pas de l'ordre ni du découpage des lots
+    total = math.fsum(values)
+    mean = total / values.size
+    return {'count': int(values.size), 'mean': mean,
+            'm2': math.fsum((values - mean) ** 2), 'sum': total}
+
+def combine(a: dict, b: dict) -> dict:
+    """
+    Fusionne deux états (count, mean, m2, sum) : mise à jour de Welford généralisée
+    à un lot (Chan et al.), numériquement stable
+    """
+    count = a['count'] + b['count']
+    if count == 0:
+        return {'count': 0, 'mean': 0.0, 'm2': 0.0, 'sum': 0.0}
+    delta = b['mean'] - a['mean']
+    return {
+        'count': count,
+        'mean': a['mean'] + delta * b['count'] / count,
+        'm2': a['m2'] + b['m2'] + delta ** 2 * a['count'] * b['count'] / count,
+        'sum': a['sum'] + b['sum'],
+    }
+
+def remove(total: dict, part: dict) -> dict:
+    """Retire d'un état les valeurs d'un lot (inverse de combine, pour les lignes modifiées)"""
+    count = total['count'] - part['count']
+    if count <= 0:
+        return {'count': 0, 'mean': 0.0, 'm2': 0.0, 'sum': 0.0}
+    mean = (total['count'] * total['mean'] - part['count'] * part['mean']) / count
+    delta = part['mean'] - mean
+    m2 = total['m2'] - part['m2'] - delta ** 2 * count * part['count'] / total['count']
+    return {'count': count, 'mean': mean, 'm2': max(m2, 0.0), 'sum': total['sum'] - part['sum']}
+
+def load_running_stats() -> dict:
+    """
+    Charge les statistiques courantes
+
+    Returns:
+        dict: {ville: {'partition': signature, 'measures': {mesure: état}}}, vide si absentes
+    """
+    if not os.path.exists(RUNNING_STATS_FILE):
+        return {}
+    try:
+        with open(RUNNING_STATS_FILE, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Statistiques historiques illisibles, elles seront recalculées : {e}")
+        return {}
+
+def save_running_stats(state: dict):
+    os.makedirs(os.path.dirname(RUNNING_STATS_FILE), exist_ok=True)
+    tmp_path = f"{RUNNING_STATS_FILE}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, RUNNING_STATS_FILE)
+
+def update_city(state: dict, ville: str, added: pd.DataFrame, removed: pd.DataFrame, base: str):
+    """
+    Applique à une ville déjà suivie les lignes ajoutées ou modifiées par une fusion
+
+    Args:
+        state (dict): Statistiques courantes (modifiées sur place)
+        ville (str): Ville de la partition
+        added (pd.DataFrame): Nouvelles versions des lignes (ajoutées ou modifiées)
+        removed (pd.DataFrame): Anciennes versions des lignes modifiées
+        base (str): Partition de la ville, dont la signature est enregistrée
+    """
+    entry = state.get(ville)
+    if entry is None:
+        # Ville non suivie : elle sera initialisée depuis sa partition (sync_running_stats)
+        return
+    for measure in RUNNING_MEASURES:
+        current = entry['measures'][measure]
+        if measure in removed.columns and not removed.empty:
+            current = remove(current, batch_moments(removed[measure]))
+        if measure in added.columns:
+            current = combine(current, batch_moments(added[measure]))
+        entry['measures'][measure] = current
+    entry['partition'] = partition_signature(base)
+
+def rebuild_city(state: dict, ville: str, df: pd.DataFrame, base: str):
+    """Initialise les statistiques d'une ville à partir de sa partition complète"""
+    state[ville] = {
+        'partition': partition_signature(base),
+        'measures': {measure: batch_moments(df[measure]) for measure in RUNNING_MEASURES},
+    }
+
+def sync_running_stats() -> pd.DataFrame:
+    """
+    Retourne les statistiques historiques par ville (colonnes <mesure>_mean, _std, _sum)
+
+    Seules les partitions dont la signature ne correspond pas à l'état enregistré
+    (première exécution, ville nouvelle, partition réécrite hors fusion) sont relues.
+
+    Returns:
+        pd.DataFrame | None: Statistiques par ville, None s'il n'y a aucune partition
+    """
+    partitions = list_partitions(HISTORICAL_PARTITIONS)
+    if not partitions:
+        return None
+
+    state = load_running_stats()
+    tracked = {tuple(entry['partition']): ville for ville, entry in state.items() if entry.get('partition')}
+    present, rebuilt = set(), 0
+    for base in partitions:
+        ville = tracked.get(tuple(partition_signature(base)))
+        if ville is None:
+            df = read_table(base, columns=['ville'] + RUNNING_MEASURES, schema=HISTORICAL_GLOBAL_SCHEMA)
+            if df.empty:
+                continue
+            ville = str(df['ville'].iloc[0])
+            rebuild_city(state, ville, df, base)
+            rebuilt += 1
+        present.add(ville)
+
+    # Villes dont la partition a disparu
+    for ville in set(state) - present:
+        del state[ville]
+    if rebuilt:
+        save_running_stats(state)
+        logging.info(f"Statistiques historiques recalculées pour {rebuilt} villes à partir de leur partition")
+
+    rows = []
+    for ville, entry in sorted(state.items()):
+        row = {'ville': ville}
+        for measure, moments in entry['measures'].items():
+            count = moments['count']
+            row[f"{measure}_mean"] = moments['mean'] if count > 0 else np.nan
+            row[f"{measure}_std"] = np.sqrt(moments['m2'] / (count - 1)) if count > 1 else np.nan
+            row[f"{measure}_sum"] = moments['sum']
+        rows.append(row)
+    return pd.DataFrame(rows)
@@ -0,0 +1,140 @@
+import logging
+import numpy as np
+import pandas as pd
+
+# Schémas typés compacts, appliqués à la lecture et à l'écriture des tables
+# - category pour les chaînes répétées (ville, description, source_type...)
+# - float32 pour les mesures, entiers nullables (Int8/Int16) pour les mesures entières
+# float32 est un type de stockage : les mesures sont lues et calculées en float64
+# (voir compute_schema), puis converties en float32 à l'écriture.
+CURRENT_GLOBAL_SCHEMA = {
+    'ville': 'category',
+    'pays': 'category',
+    'timestamp_donnees': 'int64',
+    'temperature': 'float32',
+    'temp_min': 'float32',
+    'temp_max': 'float32',
+    'humidite': 'Int8',
+    'pression': 'Int16',
+    'vent_vitesse': 'float32',
+    'vent_direction': 'Int16',
+    'precipitation': 'float32',
+    'couverture_nuageuse': 'Int8',
+    'conditions': 'category',
+    'timezone': 'Int32',
+}
+
+HISTORICAL_GLOBAL_SCHEMA = {
+    'ville': 'category',
+    'temp_max': 'float32',
+    'temp_min': 'float32',
+    'precipitation': 'float32',
+    'pluie': 'float32',
+    'neige': 'float32',
+}
+
+HOURLY_SCHEMA = {
+    'ville': 'category',
+    'timestamp': 'int64',    # UTC
+    'timezone': 'int32',     # décalage local en secondes
+    'temperature': 'float32',
+    'humidite': 'Int8',
+    'pression': 'float32',
+    'vent_vitesse': 'float32',
+    'precipitation': 'float32',
+}
+
+FACT_WEATHER_SCHEMA = {
+    'ville_id': 'int32',
+    'date_id': 'int32',      # YYYYMMDD
+    'climat_id': 'int8',
+    'temperature': 'float32',
+    'temp_min': 'float32',
+    'temp_max': 'float32',
+    'humidite': 'Int8',
+    'pression': 'Int16',
+    'vent_vitesse': 'float32',
+    'precipitation': 'float32',
+    'pluie': 'float32',
+    'neige': 'float32',
+    'couverture_nuageuse': 'Int8',
+    'description': 'category',
+    'source_type': 'category',
+}
+
+NUMERIC_PREFIXES = ('int', 'Int', 'float')
+
+# Chiffres significatifs conservés en float32 : au-delà, la valeur décimale n'est pas retrouvée
+FLOAT32_DIGITS = 7
+
+def compute_schema(schema: dict) -> dict:
+    """Schéma de lecture et de calcul : les colonnes stockées en float32 sont chargées en float64"""
+    if schema is None:
+        return None
+    return {col: 'float64' if dtype == 'float32' else dtype for col, dtype in schema.items()}
+
+def widen_float32(values: pd.Series) -> pd.Series:
+    """
+    Convertit des valeurs float32 en float64 en retrouvant leur valeur décimale
+
+    float32(13.45) converti tel quel donne 13.449999809265137 ; la valeur est arrondie à
+    FLOAT32_DIGITS chiffres significatifs (13.45), sauf si cet arrondi ne redonne pas la
+    même valeur float32 (valeur stockée avec plus de chiffres).
+    """
+    stored = values.to_numpy(dtype=np.float32, na_value=np.nan)
+    wide = stored.astype(np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        magnitude = np.floor(np.log10(np.abs(wide)))
+        scale = 10.0 ** (FLOAT32_DIGITS - 1 - magnitude)
+        rounded = np.round(wide * scale) / scale
+    exact = np.isfinite(rounded) & (rounded.astype(np.float32) == stored)
+    return pd.Series(np.where(exact, rounded, wide), index=values.index, name=values.name)
+
+def memory_usage_mb(df: pd.DataFrame) -> float:
+    """Mémoire occupée par un DataFrame (en Mo, chaînes comprises)"""
+    return df.memory_usage(deep=True).sum() / (1024 * 1024)
+
+def apply_schema(df: pd.DataFrame, schema: dict, name: str = None) -> pd.DataFrame:
+    """
+    Convertit les colonnes présentes dans le DataFrame vers les types du schéma
+
+    Args:
+        df (pd.DataFrame): Données à convertir (non modifiées)
+        schema (dict): {colonne: type pandas}
+        name (str): Nom de la table ; si fourni, la mémoire avant/après est journalisée
+
+    Returns:
+        pd.DataFrame: Copie typée (les colonnes absentes du schéma sont inchangées)
+    """
+    before = memory_usage_mb(df) if name else None
+    typed = df.copy(deep=False)
+    for col, dtype in schema.items():
+        if col not in typed.columns or typed[col].dtype == dtype:
+            continue
+        if dtype == 'float64' and typed[col].dtype == 'float32':
+            typed[col] = widen_float32(typed[col])
+        elif dtype.startswith(NUMERIC_PREFIXES):
+            values = pd.to_numeric(typed[col], errors='coerce')
+            if dtype.startswith('Int'):
+                values = values.round()
+            typed[col] = values.astype(dtype)
+        else:
+            typed[col] = typed[col].astype(dtype)
+
+    if name:
+        after = memory_usage_mb(typed)
+        logging.info(f"Mémoire {name} : {before:.2f} Mo -> {after:.2f} Mo "
+                     f"({len(typed)} lignes, schéma typé appliqué)")
+    return typed
+
+def csv_dtypes(schema: dict, columns: list = None) -> dict:
+    """
+    Types à passer directement à pd.read_csv (limités aux colonnes lues)
+
+    Les entiers sont exclus : un fichier écrit avant l'application du schéma peut contenir
+    "73.0" ; ils sont convertis ensuite par apply_schema.
+    """
+    if schema is None:
+        return None
+    return {col: dtype for col, dtype in schema.items()
+            if (columns is None or col in columns) and not dtype.lower().startswith('int')}
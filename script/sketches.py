@@ -0,0 +1,271 @@
+import os
+import json
+import argparse
+import logging
+
+import numpy as np
+import pandas as pd
+
+from script.paths import HISTORICAL_PARTITIONS, PROCESSED_DIR
+from script.schema import HISTORICAL_GLOBAL_SCHEMA
+from script.storage import list_partitions, partition_signature, read_table
+
+# Esquisses de quantiles (t-digest) par (ville, variable, mois), à côté des données fusionnées
+SKETCHES_FILE = f"{PROCESSED_DIR}/quantile_sketches.json"
+SKETCH_VARIABLES = ['temp_max', 'temp_min', 'precipitation', 'pluie', 'neige']
+
+# Compression du t-digest : au plus ~compression / 2 centroïdes par esquisse ;
+# erreur de rang de l'ordre de 1 % au centre de la distribution, bien plus faible aux extrémités
+SKETCH_COMPRESSION = float(os.getenv("SKETCH_COMPRESSION", "100"))
+
+# Centiles ajoutés au fichier d'analyse
+ANALYSIS_PERCENTILES = [5, 50, 95]
+ANALYSIS_PERCENTILE_VARIABLES = ['temp_max', 'temp_min', 'precipitation']
+
+class TDigest:
+    """
+    Esquisse de quantiles fusionnable (t-digest à fusion, fonction d'échelle k1).
+
+    La distribution est résumée par des centroïdes (moyenne, poids) triés, plus fins
+    près des extrémités. Deux esquisses se fusionnent en concaténant leurs centroïdes
+    puis en recompressant : mois, villes ou lots peuvent être combinés librement.
+
+    Exemple:
+        >>> digest = TDigest()
+        >>> digest.update(values)
+        >>> digest.quantile([0.05, 0.5, 0.95])
+    """
+
+    def __init__(self, compression: float = None, means=None, weights=None, minimum=np.nan, maximum=np.nan):
+        self.compression = compression or SKETCH_COMPRESSION
+        self.means = np.asarray(means if means is not None else [], dtype=np.float64)
+        self.weights = np.asarray(weights if weights is not None else [], dtype=np.float64)
+        self.min = float(minimum)
+        self.max = float(maximum)
+
+    @property
+    def count(self) -> float:
+        return float(self.weights.sum())
+
+    def _compress(self, means: np.ndarray, weights: np.ndarray):
+        order = np.argsort(means, kind='stable')
+        means, weights = means[order], weights[order]
+        total = weights.sum()
+        # Position (rang normalisé) du centre de chaque centroïde, puis échelle k1
+        q = (np.cumsum(weights) - weights / 2) / total
+        k = self.compression / (2 * np.pi) * np.arcsin(np.clip(2 * q - 1, -1, 1))
+        bins = np.floor(k)
+        starts = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])
+        self.weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / self.weights
+
+    def update(self, values):
+        """Ajoute des valeurs (NaN ignorés)"""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return
+        self.min = float(np.nanmin([self.min, values.min()]))
+        self.max = float(np.nanmax([self.max, values.max()]))
+        self._compress(np.concatenate([self.means, values]),
+                       np.concatenate([self.weights, np.ones(values.size)]))
+
+    def merge(self, other: 'TDigest') -> 'TDigest':
+        """Retourne la fusion de deux esquisses"""
+        merged = TDigest(self.compression, minimum=np.nanmin([self.min, other.min]),
+                         maximum=np.nanmax([self.max, other.max]))
+        if self.count + other.count > 0:
+            merged._compress(np.concatenate([self.means, other.means]),
+                             np.concatenate([self.weights, other.weights]))
+        return merged
+
+    def quantile(self, q):
+        """
+        Quantile(s) approché(s), q entre 0 et 1 (scalaire ou liste)
+
+        Returns:
+            float | np.ndarray: NaN si l'esquisse est vide
+        """
+        q = np.asarray(q, dtype=np.float64)
+        if self.count == 0:
+            return np.full(q.shape, np.nan) if q.ndim else np.nan
+        # Interpolation linéaire entre les centres des centroïdes, bornée par le min et le max
+        centers = np.cumsum(self.weights) - self.weights / 2
+        positions = np.r_[0.0, centers, self.count]
+        values = np.r_[self.min, self.means, self.max]
+        return np.interp(q * self.count, positions, values)
+
+    def to_dict(self) -> dict:
+        return {'min': self.min, 'max': self.max,
+                'means': np.round(self.means, 4).tolist(), 'weights': self.weights.astype(np.int64).tolist()}
+
+    @classmethod
+    def from_dict(cls, data: dict, compression: float = None) -> 'TDigest':
+        return cls(compression, data['means'], data['weights'], data['min'], data['max'])
+
+def load_sketches() -> dict:
+    """
+    Charge les esquisses enregistrées
+
+    Returns:
+        dict: {ville: {'partition': signature, 'sketches': {variable: {mois: esquisse}}}}
+    """
+    if not os.path.exists(SKETCHES_FILE):
+        return {}
+    try:
+        with open(SKETCHES_FILE, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Esquisses de quantiles illisibles, elles seront recalculées : {e}")
+        return {}
+
+def save_sketches(state: dict):
+    os.makedirs(os.path.dirname(SKETCHES_FILE), exist_ok=True)
+    tmp_path = f"{SKETCHES_FILE}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp_path, SKETCHES_FILE)
+
+def month_sketches(df: pd.DataFrame) -> dict:
+    """Esquisses {variable: {mois: esquisse}} des lignes d'une ville"""
+    months = pd.to_datetime(df['date']).dt.month.to_numpy()
+    sketches = {}
+    for variable in SKETCH_VARIABLES:
+        values = pd.to_numeric(df[variable], errors='coerce').to_numpy(dtype=np.float64)
+        sketches[variable] = {}
+        for month in np.unique(months):
+            digest = TDigest()
+            digest.update(values[months == month])
+            sketches[variable][str(month)] = digest.to_dict()
+    return sketches
+
+def update_city_sketches(state: dict, ville: str, added: pd.DataFrame, replaced: pd.DataFrame, base: str):
+    """
+    Ajoute aux esquisses d'une ville les lignes fusionnées
+
+    Une esquisse ne permet pas de retirer des valeurs : les mois contenant des lignes
+    modifiées sont recalculés à partir de la partition de la ville.
+
+    Args:
+        state (dict): Esquisses (modifiées sur place)
+        ville (str): Ville de la partition
+        added (pd.DataFrame): Lignes ajoutées ou modifiées (nouvelles versions)
+        replaced (pd.DataFrame): Anciennes versions des lignes modifiées
+        base (str): Partition de la ville, déjà réécrite
+    """
+    entry = state.get(ville)
+    if entry is None:
+        # Ville non suivie : elle sera initialisée depuis sa partition (sync_sketches)
+        return
+
+    rebuilt_months = set()
+    if not replaced.empty:
+        rebuilt_months = set(pd.to_datetime(replaced['date']).dt.month.astype(str))
+        partition = read_table(base, columns=['date'] + SKETCH_VARIABLES, schema=HISTORICAL_GLOBAL_SCHEMA)
+        partition_months = pd.to_datetime(partition['date']).dt.month.astype(str)
+        rebuilt = month_sketches(partition[partition_months.isin(rebuilt_months).to_numpy()])
+        for variable in SKETCH_VARIABLES:
+            entry['sketches'][variable].update(rebuilt[variable])
+
+    added = added[~pd.to_datetime(added['date']).dt.month.astype(str).isin(rebuilt_months).to_numpy()]
+    if not added.empty:
+        months = pd.to_datetime(added['date']).dt.month.to_numpy()
+        for variable in SKETCH_VARIABLES:
+            values = pd.to_numeric(added[variable], errors='coerce').to_numpy(dtype=np.float64)
+            for month in np.unique(months):
+                stored = entry['sketches'][variable].get(str(month))
+                digest = TDigest.from_dict(stored) if stored else TDigest()
+                digest.update(values[months == month])
+                entry['sketches'][variable][str(month)] = digest.to_dict()
+    entry['partition'] = partition_signature(base)
+
+def sync_sketches() -> dict:
+    """
+    Retourne les esquisses à jour ; seules les partitions dont la signature ne correspond pas
+    à l'état enregistré (première exécution, ville nouvelle, partition réécrite hors fusion)
+    sont relues
+    """
+    state = load_sketches()
+    tracked = {tuple(entry['partition']): ville for ville, entry in state.items() if entry.get('partition')}
+    present, rebuilt = set(), 0
+    for base in list_partitions(HISTORICAL_PARTITIONS):
+        ville = tracked.get(tuple(partition_signature(base)))
+        if ville is None:
+            df = read_table(base, columns=['ville', 'date'] + SKETCH_VARIABLES, schema=HISTORICAL_GLOBAL_SCHEMA)
+            if df.empty:
+                continue
+            ville = str(df['ville'].iloc[0])
+            state[ville] = {'partition': partition_signature(base), 'sketches': month_sketches(df)}
+            rebuilt += 1
+        present.add(ville)
+
+    for ville in set(state) - present:
+        del state[ville]
+    if rebuilt:
+        save_sketches(state)
+        logging.info(f"Esquisses de quantiles recalculées pour {rebuilt} villes à partir de leur partition")
+    return state
+
+def get_digest(state: dict, ville: str, variable: str, mois: int = None) -> TDigest:
+    """Esquisse d'une ville et d'une variable, pour un mois ou toute l'année (fusion des 12 mois)"""
+    monthly = state[ville]['sketches'][variable]
+    keys = [str(mois)] if mois is not None else list(monthly)
+    digest = TDigest()
+    for key in keys:
+        if key in monthly:
+            digest = digest.merge(TDigest.from_dict(monthly[key]))
+    return digest
+
+def quantile(ville: str, variable: str, q, mois: int = None, state: dict = None):
+    """
+    Quantile(s) approché(s) d'une variable pour une ville
+
+    Exemple:
+        >>> quantile("Paris", "temp_max", [0.05, 0.5, 0.95], mois=7)
+    """
+    state = state if state is not None else sync_sketches()
+    return get_digest(state, ville, variable, mois).quantile(q)
+
+def percentile_table(percentiles: list = None, variables: list = None, by_month: bool = False,
+                     state: dict = None) -> pd.DataFrame:
+    """
+    Centiles par ville (et par mois si by_month), colonnes <variable>_p<centile>
+
+    Args:
+        percentiles (list): Centiles entre 0 et 100 (ANALYSIS_PERCENTILES par défaut)
+        variables (list): Variables (ANALYSIS_PERCENTILE_VARIABLES par défaut)
+        by_month (bool): Une ligne par (ville, mois) au lieu d'une ligne par ville
+    """
+    percentiles = percentiles or ANALYSIS_PERCENTILES
+    variables = variables or ANALYSIS_PERCENTILE_VARIABLES
+    state = state if state is not None else sync_sketches()
+    q = np.asarray(percentiles, dtype=np.float64) / 100
+
+    columns = ['ville'] + (['mois'] if by_month else []) + \
+        [f"{variable}_p{p:g}" for variable in variables for p in percentiles]
+    rows = []
+    for ville in sorted(state):
+        for mois in (range(1, 13) if by_month else [None]):
+            row = {'ville': ville} if mois is None else {'ville': ville, 'mois': mois}
+            for variable in variables:
+                values = get_digest(state, ville, variable, mois).quantile(q)
+                row.update({f"{variable}_p{p:g}": v for p, v in zip(percentiles, values)})
+            rows.append(row)
+    return pd.DataFrame(rows, columns=columns)
+
+if __name__ == "__main__":
+    # Configuration du logging
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(description="Centiles historiques approchés par ville (esquisses t-digest)")
+    parser.add_argument("villes", nargs="*", help="Villes affichées (toutes par défaut)")
+    parser.add_argument("--percentiles", nargs="+", type=float, default=ANALYSIS_PERCENTILES)
+    parser.add_argument("--variables", nargs="+", choices=SKETCH_VARIABLES, default=ANALYSIS_PERCENTILE_VARIABLES)
+    parser.add_argument("--by-month", action="store_true", help="Une ligne par ville et par mois")
+    args = parser.parse_args()
+    table = percentile_table(args.percentiles, args.variables, by_month=args.by_month)
+    if args.villes:
+        table = table[table['ville'].isin(args.villes)]
+    print(table.round(2).to_string(index=False))
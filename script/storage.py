@@ -0,0 +1,342 @@
+import os
+import operator
+import pandas as pd
+from script.metrics import file_size, step
+from script.schema import apply_schema, compute_schema, csv_dtypes
+
+# Format de stockage des couches processed/analysis/star_schema : csv, parquet ou feather
+STORAGE_FORMAT = os.getenv("STORAGE_FORMAT", "csv").lower()
+
+# Compression utilisée pour Parquet (snappy, zstd, gzip...) et Feather (zstd, lz4)
+PARQUET_COMPRESSION = os.getenv("PARQUET_COMPRESSION", "snappy")
+FEATHER_COMPRESSION = os.getenv("FEATHER_COMPRESSION", "zstd")
+
+EXTENSIONS = {
+    'csv': '.csv',
+    'parquet': '.parquet',
+    'feather': '.feather',
+}
+
+def resolve_format(fmt: str = None) -> str:
+    """Valide et retourne le format de stockage (STORAGE_FORMAT par défaut)"""
+    fmt = (fmt or STORAGE_FORMAT).lower()
+    if fmt not in EXTENSIONS:
+        raise ValueError(f"Format de stockage inconnu : {fmt} (attendu : {', '.join(EXTENSIONS)})")
+    return fmt
+
+def table_path(base: str, fmt: str = None) -> str:
+    """
+    Retourne le chemin d'une table pour un format donné
+
+    Args:
+        base (str): Chemin sans extension (ex : "data/processed/current_global")
+        fmt (str): Format de stockage (STORAGE_FORMAT par défaut)
+
+    Returns:
+        str: Chemin complet avec l'extension du format
+    """
+    return base + EXTENSIONS[resolve_format(fmt)]
+
+def find_table(base: str, fmt: str = None):
+    """
+    Retourne le chemin d'une table existante, en privilégiant le format demandé.
+
+    Les autres formats sont essayés ensuite pour pouvoir relire des données écrites
+    avant un changement de STORAGE_FORMAT.
+
+    Returns:
+        str | None: Chemin du fichier trouvé, None si la table n'existe dans aucun format
+    """
+    preferred = resolve_format(fmt)
+    for candidate in [preferred] + [f for f in EXTENSIONS if f != preferred]:
+        path = base + EXTENSIONS[candidate]
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            return path
+    return None
+
+def table_exists(base: str, fmt: str = None) -> bool:
+    """Indique si une table non vide existe dans l'un des formats supportés"""
+    return find_table(base, fmt) is not None
+
+def write_table(df: pd.DataFrame, base: str, fmt: str = None, schema: dict = None) -> str:
+    """
+    Écrit une table dans le format de stockage choisi
+
+    Args:
+        df (pd.DataFrame): Données à écrire
+        base (str): Chemin sans extension
+        fmt (str): csv, parquet ou feather (STORAGE_FORMAT par défaut)
+        schema (dict): Types à appliquer avant l'écriture (voir schema.py)
+
+    Returns:
+        str: Chemin du fichier écrit
+    """
+    fmt = resolve_format(fmt)
+    if schema is not None:
+        df = apply_schema(df, schema)
+    path = table_path(base, fmt)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    with step(f"to_{fmt}", rows_in=len(df)) as measure:
+        if fmt == 'csv':
+            df.to_csv(path, index=False)
+        elif fmt == 'parquet':
+            df.to_parquet(path, index=False, compression=PARQUET_COMPRESSION)
+        else:
+            df.reset_index(drop=True).to_feather(path, compression=FEATHER_COMPRESSION)
+        measure.bytes_written = file_size(path)
+    return path
+
+def read_table(base: str, columns: list = None, fmt: str = None, schema: dict = None) -> pd.DataFrame:
+    """
+    Lit une table en ne chargeant que les colonnes demandées
+
+    Args:
+        base (str): Chemin sans extension
+        columns (list): Colonnes à charger (toutes par défaut)
+        fmt (str): Format privilégié (STORAGE_FORMAT par défaut)
+        schema (dict): Types à appliquer à la lecture (voir schema.py) ; les mesures float32
+            sont chargées en float64
+
+    Returns:
+        pd.DataFrame: Table lue
+
+    Raises:
+        FileNotFoundError: Si la table n'existe dans aucun format
+    """
+    path = find_table(base, fmt)
+    if path is None:
+        raise FileNotFoundError(f"Table introuvable : {table_path(base, fmt)}")
+
+    schema = compute_schema(schema)
+    fmt = os.path.splitext(path)[1][1:]
+    with step(f"read_{fmt}") as measure:
+        if fmt == 'csv':
+            df = pd.read_csv(path, usecols=columns, dtype=csv_dtypes(schema, columns))
+        elif fmt == 'parquet':
+            df = pd.read_parquet(path, columns=columns)
+        else:
+            df = pd.read_feather(path, columns=columns)
+        measure.bytes_read, measure.rows_out = file_size(path), len(df)
+    return apply_schema(df, schema) if schema is not None else df
+
+# Opérateurs des filtres de lecture (iter_table), valables pour pandas comme pour pyarrow
+FILTER_OPERATORS = {'==': operator.eq, '>=': operator.ge, '<=': operator.le}
+
+def filter_mask(df: pd.DataFrame, filters: list) -> pd.Series:
+    """Lignes d'un lot vérifiant tous les filtres [(colonne, opérateur, valeur)]"""
+    mask = pd.Series(True, index=df.index)
+    for col, op, value in filters:
+        mask &= df[col].isin(value) if op == 'in' else FILTER_OPERATORS[op](df[col], value)
+    return mask
+
+def filter_expression(filters: list):
+    """Expression pyarrow équivalente aux filtres, évaluée avec les statistiques des groupes de lignes"""
+    import pyarrow.dataset as ds
+    expression = None
+    for col, op, value in filters:
+        field = ds.field(col)
+        term = field.isin(list(value)) if op == 'in' else FILTER_OPERATORS[op](field, value)
+        expression = term if expression is None else expression & term
+    return expression
+
+def iter_table(base: str, batch_rows: int = 100_000, columns: list = None, fmt: str = None, schema: dict = None,
+               filters: list = None):
+    """
+    Parcourt une table par lots de lignes, sans la charger entièrement
+
+    Args:
+        base (str): Chemin sans extension
+        batch_rows (int): Nombre de lignes par lot (approximatif pour Parquet/Feather)
+        columns (list): Colonnes à charger (toutes par défaut)
+        fmt (str): Format privilégié (STORAGE_FORMAT par défaut)
+        schema (dict): Types à appliquer à chaque lot (voir schema.py)
+        filters (list): Filtres [(colonne, opérateur, valeur)] ('==', '>=', '<=' ou 'in'), colonnes
+            comprises dans columns ; en Parquet, les groupes de lignes hors des bornes ne sont pas lus
+
+    Yields:
+        pd.DataFrame: Lots successifs de la table
+
+    Raises:
+        FileNotFoundError: Si la table n'existe dans aucun format
+    """
+    path = find_table(base, fmt)
+    if path is None:
+        raise FileNotFoundError(f"Table introuvable : {table_path(base, fmt)}")
+
+    schema = compute_schema(schema)
+    if path.endswith('.csv'):
+        batches = pd.read_csv(path, usecols=columns, dtype=csv_dtypes(schema, columns), chunksize=batch_rows)
+    elif path.endswith('.parquet') and filters:
+        import pyarrow.dataset as ds
+        batches = (batch.to_pandas() for batch in
+                   ds.dataset(path, format='parquet').to_batches(columns=columns, filter=filter_expression(filters),
+                                                                 batch_size=batch_rows))
+        filters = None
+    elif path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        batches = (batch.to_pandas() for batch in
+                   pq.ParquetFile(path).iter_batches(batch_size=batch_rows, columns=columns))
+    else:
+        import pyarrow as pa
+        reader = pa.ipc.open_file(path)
+        batches = (reader.get_batch(i).to_pandas() for i in range(reader.num_record_batches))
+        if columns is not None:
+            batches = (batch[columns] for batch in batches)
+
+    for batch in batches:
+        if filters:
+            batch = batch[filter_mask(batch, filters)]
+        yield apply_schema(batch, schema) if schema is not None else batch
+
+def partition_key(value: str) -> str:
+    """Normalise une valeur de partition pour un nom de fichier (ex : "New York" -> "new_york")"""
+    return str(value).lower().replace(' ', '_').replace('/', '_')
+
+def partition_base(directory: str, column: str, value: str) -> str:
+    """Retourne le chemin (sans extension) d'une partition, ex : data/processed/historical/ville=paris"""
+    return os.path.join(directory, f"{column}={partition_key(value)}")
+
+def list_partitions(directory: str) -> list:
+    """
+    Liste les partitions d'un répertoire (chemins sans extension, triés)
+
+    Une partition présente dans plusieurs formats n'est listée qu'une fois.
+    """
+    if not os.path.isdir(directory):
+        return []
+    bases = set()
+    for name in os.listdir(directory):
+        base, ext = os.path.splitext(name)
+        if '=' in base and ext in EXTENSIONS.values():
+            bases.add(os.path.join(directory, base))
+    return sorted(bases)
+
+def partition_signature(base: str) -> list:
+    """
+    Signature (fichier, taille, date de modification) d'une partition, None si elle n'existe pas
+
+    Permet aux états incrémentaux (statistiques, esquisses, cube) de ne relire
+    que les partitions réécrites depuis leur dernière mise à jour.
+    """
+    path = find_table(base)
+    if path is None:
+        return None
+    stat = os.stat(path)
+    return [os.path.basename(path), stat.st_size, stat.st_mtime_ns]
+
+def partition_files(directory: str) -> list:
+    """Fichiers des partitions d'un répertoire (un par partition), sans les fichiers d'état"""
+    return [path for path in map(find_table, list_partitions(directory)) if path is not None]
+
+def read_partitions(directory: str, columns: list = None, fallback_base: str = None,
+                    sort_by: str = None, fmt: str = None, schema: dict = None) -> pd.DataFrame:
+    """
+    Lit et concatène toutes les partitions d'un répertoire
+
+    Args:
+        directory (str): Répertoire des partitions
+        columns (list): Colonnes à charger (toutes par défaut)
+        fallback_base (str): Table non partitionnée lue si le répertoire est vide
+        sort_by (str): Colonne de tri stable appliqué après concaténation
+        fmt (str): Format privilégié (STORAGE_FORMAT par défaut)
+        schema (dict): Types à appliquer à la lecture (voir schema.py)
+
+    Returns:
+        pd.DataFrame: Données de toutes les partitions (vide si aucune)
+    """
+    partitions = list_partitions(directory)
+    if not partitions:
+        if fallback_base is not None and table_exists(fallback_base, fmt):
+            return read_table(fallback_base, columns, fmt, schema)
+        return pd.DataFrame(columns=columns)
+
+    df = pd.concat([read_table(base, columns, fmt) for base in partitions], ignore_index=True)
+    if schema is not None:
+        # Les catégories diffèrent d'une partition à l'autre : typage après concaténation
+        df = apply_schema(df, compute_schema(schema))
+    if sort_by is not None and sort_by in df.columns:
+        df = df.sort_values(sort_by, kind='stable').reset_index(drop=True)
+    return df
+
+class TableAppender:
+    """
+    Écrit une table par morceaux successifs, sans la garder entière en mémoire.
+
+    Les morceaux sont écrits dans un fichier temporaire, publié à la fermeture :
+    en cas d'erreur, la table existante n'est pas remplacée par une table partielle.
+    CSV : ajout en fin de fichier ; Parquet : un row group par morceau ;
+    Feather : un lot Arrow par morceau (pyarrow requis pour ces deux formats).
+
+    Exemple:
+        >>> with TableAppender("data/star_schema/fact_weather") as writer:
+        ...     for chunk in chunks:
+        ...         writer.append(chunk)
+    """
+
+    def __init__(self, base: str, fmt: str = None, schema: dict = None):
+        self.base = base
+        self.fmt = resolve_format(fmt)
+        self.path = table_path(base, self.fmt)
+        self.tmp_path = f"{self.path}.tmp"
+        self.schema = schema
+        self.rows = 0
+        self._writer = None
+        self._arrow_schema = None
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        return self
+
+    def append(self, df: pd.DataFrame):
+        """Ajoute un morceau à la table (mêmes colonnes, dans le même ordre, à chaque appel)"""
+        if self.schema is not None:
+            df = apply_schema(df, self.schema)
+
+        with step(f"to_{self.fmt}", rows_in=len(df)) as measure:
+            size = file_size(self.tmp_path) if self.rows else 0
+            if self.fmt == 'csv':
+                df.to_csv(self.tmp_path, mode='a' if self.rows else 'w', header=not self.rows, index=False)
+            else:
+                self._append_arrow(df)
+            measure.bytes_written = file_size(self.tmp_path) - size
+        self.rows += len(df)
+
+    def _append_arrow(self, df: pd.DataFrame):
+        import pyarrow as pa
+
+        # Les dictionnaires des catégories diffèrent d'un morceau à l'autre : écriture en chaînes
+        categories = df.select_dtypes('category').columns
+        if len(categories):
+            df = df.astype({col: object for col in categories})
+
+        if self._writer is None:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            # Une colonne entièrement vide dans le premier morceau est typée en chaîne
+            self._arrow_schema = pa.schema([f.with_type(pa.string()) if pa.types.is_null(f.type) else f
+                                            for f in table.schema], metadata=table.schema.metadata)
+            table = table.cast(self._arrow_schema)
+            if self.fmt == 'parquet':
+                import pyarrow.parquet as pq
+                self._writer = pq.ParquetWriter(self.tmp_path, self._arrow_schema,
+                                                compression=PARQUET_COMPRESSION)
+            else:
+                options = pa.ipc.IpcWriteOptions(compression=FEATHER_COMPRESSION)
+                self._writer = pa.ipc.new_file(self.tmp_path, self._arrow_schema, options=options)
+        else:
+            table = pa.Table.from_pandas(df, schema=self._arrow_schema, preserve_index=False)
+        self._writer.write_table(table)
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._writer is not None:
+            self._writer.close()
+        if exc_type is not None:
+            if os.path.exists(self.tmp_path):
+                os.remove(self.tmp_path)
+            return False
+        if not os.path.exists(self.tmp_path):
+            # Aucun morceau : table vide avec les colonnes du schéma
+            write_table(pd.DataFrame(columns=list(self.schema or [])), self.base, self.fmt)
+            return False
+        os.replace(self.tmp_path, self.path)
+        return False
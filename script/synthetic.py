@@ -0,0 +1,169 @@
+import os
+import argparse
+import logging
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+# Dernier jour de l'historique généré (les données actuelles suivent ce jour)
+DEFAULT_END_DATE = "2025-07-18"
+
+PAYS = ['FR', 'US', 'JP', 'AU', 'BR', 'RU', 'MG', 'DE', 'IN', 'ZA', 'CA', 'AR']
+CONDITIONS = ['ciel dégagé', 'peu nuageux', 'partiellement nuageux', 'nuageux', 'couvert',
+              'légère pluie', 'pluie modérée', 'orage', 'brume', 'chutes de neige']
+
+def city_names(n_cities: int) -> list:
+    return [f"Ville {i:05d}" for i in range(1, n_cities + 1)]
+
+def daily_series(rng: np.random.Generator, latitudes: np.ndarray, dates: pd.DatetimeIndex) -> dict:
+    """
+    Séries journalières réalistes [ville, jour] : cycle saisonnier selon la latitude
+    (inversé dans l'hémisphère sud), bruit autocorrélé AR(1), jours de pluie et neige
+    lorsque la température maximale reste sous 1 °C
+    """
+    n_cities, n_days = len(latitudes), len(dates)
+    doy = dates.dayofyear.to_numpy()
+    mean = 28 - 0.45 * np.abs(latitudes)
+    amplitude = 0.25 * np.abs(latitudes)
+    peak = np.where(latitudes >= 0, 200, 20)
+    seasonal = mean[:, None] + amplitude[:, None] * np.cos(2 * np.pi * (doy[None, :] - peak[:, None]) / 365.25)
+
+    # Anomalie AR(1) (phi = 0.7) : une itération par jour, vectorisée sur les villes
+    shocks = rng.normal(0, 2.2, size=(n_cities, n_days))
+    anomaly = np.empty_like(shocks)
+    anomaly[:, 0] = shocks[:, 0]
+    for day in range(1, n_days):
+        anomaly[:, day] = 0.7 * anomaly[:, day - 1] + shocks[:, day]
+
+    temperature = seasonal + anomaly
+    spread = rng.uniform(4, 12, size=(n_cities, n_days))
+    temp_max = np.round(temperature + spread / 2, 1)
+    temp_min = np.round(temperature - spread / 2, 1)
+
+    wet = rng.random((n_cities, n_days)) < 0.35
+    precipitation = np.round(np.where(wet, rng.gamma(0.8, 6.0, size=(n_cities, n_days)), 0.0), 1)
+    snowy = temp_max < 1
+    return {
+        'temperature': temperature,
+        'temp_max': temp_max,
+        'temp_min': temp_min,
+        'precipitation': precipitation,
+        'pluie': np.where(snowy, 0.0, precipitation),
+        'neige': np.round(np.where(snowy, precipitation * 0.7, 0.0), 2),
+    }
+
+def write_historical(output_dir: str, villes: list, dates: pd.DatetimeIndex, series: dict):
+    """Un fichier data/historical/<ville>_historical.csv par ville (format de extract_historic.py)"""
+    directory = os.path.join(output_dir, "data", "historical")
+    os.makedirs(directory, exist_ok=True)
+    date_strings = dates.strftime('%Y-%m-%d')
+    for i, ville in enumerate(villes):
+        df = pd.DataFrame({
+            'ville': ville,
+            'date': date_strings,
+            'temp_max': series['temp_max'][i],
+            'temp_min': series['temp_min'][i],
+            'precipitation': series['precipitation'][i],
+            'pluie': series['pluie'][i],
+            'neige': series['neige'][i],
+        })
+        file_name = f"{ville.lower().replace(' ', '_')}_historical.csv"
+        df.to_csv(os.path.join(directory, file_name), index=False)
+
+def write_current(rng: np.random.Generator, output_dir: str, villes: list, longitudes: np.ndarray,
+                  current_dates: pd.DatetimeIndex, temperatures: np.ndarray):
+    """
+    Un fichier data/current/date=YYYY-MM-DD/<ville>.csv par ville et par jour (format de extract.py)
+
+    Args:
+        temperatures (np.ndarray): Température de référence [ville, jour actuel]
+    """
+    n_cities = len(villes)
+    timezone = (np.round(longitudes / 15) * 3600).astype(int)
+    pays = rng.choice(PAYS, size=n_cities)
+    for j, date in enumerate(current_dates):
+        directory = os.path.join(output_dir, "data", "current", f"date={date:%Y-%m-%d}")
+        os.makedirs(directory, exist_ok=True)
+        temperature = np.round(temperatures[:, j], 2)
+        noon_utc = int((date + timedelta(hours=12)).timestamp()) - timezone
+        columns = {
+            'ville': villes,
+            'pays': pays,
+            'date_extraction': f"{date:%Y-%m-%d} 12:00:00",
+            'timestamp_donnees': noon_utc,
+            'temperature': temperature,
+            'temp_min': np.round(temperature - rng.uniform(0, 2, n_cities), 2),
+            'temp_max': np.round(temperature + rng.uniform(0, 2, n_cities), 2),
+            'humidite': rng.integers(25, 100, n_cities),
+            'pression': rng.integers(990, 1035, n_cities),
+            'vent_vitesse': np.round(rng.gamma(2.0, 1.8, n_cities), 2),
+            'vent_direction': rng.integers(0, 360, n_cities),
+            'precipitation': np.round(np.where(rng.random(n_cities) < 0.2, rng.gamma(0.8, 1.5, n_cities), 0), 2),
+            'couverture_nuageuse': rng.integers(0, 101, n_cities),
+            'conditions': rng.choice(CONDITIONS, size=n_cities),
+            'timezone': timezone,
+        }
+        day_df = pd.DataFrame(columns)
+        for i, ville in enumerate(villes):
+            day_df.iloc[[i]].to_csv(os.path.join(directory, f"{ville}.csv"), index=False)
+
+def generate_dataset(output_dir: str, n_cities: int, n_days: int, current_days: int = 1,
+                     end_date: str = None, seed: int = 0) -> dict:
+    """
+    Génère une arborescence data/ synthétique et déterministe (même graine, mêmes fichiers)
+
+    Args:
+        output_dir (str): Répertoire racine (data/ y est créé)
+        n_cities (int): Nombre de villes
+        n_days (int): Nombre de jours d'historique par ville
+        current_days (int): Nombre de jours de données actuelles, après l'historique
+        end_date (str): Dernier jour de l'historique (YYYY-MM-DD, DEFAULT_END_DATE par défaut)
+        seed (int): Graine du générateur aléatoire
+
+    Returns:
+        dict: Nombre de villes, de lignes historiques et de fichiers actuels générés
+
+    Exemple:
+        >>> generate_dataset("/tmp/bench", n_cities=100, n_days=1096)
+    """
+    try:
+        rng = np.random.default_rng(seed)
+        end = pd.Timestamp(end_date or DEFAULT_END_DATE)
+        dates = pd.date_range(end=end, periods=n_days, freq='D')
+        current_dates = pd.date_range(start=end + timedelta(days=1), periods=current_days, freq='D')
+
+        villes = city_names(n_cities)
+        latitudes = rng.uniform(-55, 68, n_cities)
+        longitudes = rng.uniform(-180, 180, n_cities)
+
+        series = daily_series(rng, latitudes, dates.append(current_dates))
+        historical = {name: values[:, :n_days] for name, values in series.items()}
+        write_historical(output_dir, villes, dates, historical)
+        write_current(rng, output_dir, villes, longitudes, current_dates,
+                      series['temperature'][:, n_days:] + rng.normal(0, 1, (n_cities, current_days)))
+
+        logging.info(f"Données synthétiques générées dans {output_dir} : {n_cities} villes, "
+                     f"{n_days} jours d'historique, {current_days} jours actuels")
+        return {'cities': n_cities, 'historical_rows': n_cities * n_days,
+                'current_files': n_cities * current_days}
+
+    except Exception as e:
+        logging.error(f"Erreur lors de la génération des données synthétiques : {str(e)}")
+        raise
+
+if __name__ == "__main__":
+    # Configuration du logging
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(description="Génère des données météo synthétiques (data/current, data/historical)")
+    parser.add_argument("--output", required=True, help="Répertoire racine où créer data/")
+    parser.add_argument("--cities", type=int, default=100)
+    parser.add_argument("--days", type=int, default=1096)
+    parser.add_argument("--current-days", type=int, default=1)
+    parser.add_argument("--end-date", default=DEFAULT_END_DATE)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    generate_dataset(args.output, args.cities, args.days, args.current_days, args.end_date, args.seed)
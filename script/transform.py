@@ -1,14 +1,37 @@
 import pandas as pd
 import os
+import argparse
 import logging
 from datetime import datetime
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from script.anomalies import (ANOMALIES_ENABLED, ANOMALY_TABLE, CLIMATOLOGY_HALF_WINDOW, COLD_PERCENTILE,
+                              HOT_PERCENTILE, MIN_EVENT_DAYS, create_anomaly_table)
+from script.cities import get_city_coordinates, get_city_country
+from script.hourly import add_hourly_measures
+from script.manifest import record_stage, stage_unchanged
+from script.metrics import instrument, record, step
+from script.paths import CURRENT_GLOBAL, HISTORICAL_GLOBAL, HISTORICAL_PARTITIONS, HOURLY_DIR, STAR_SCHEMA_DIR
+from script.query import STAR_SCHEMA_DB, STAR_SCHEMA_DB_ENABLED, materialize_star_schema
+from script.rollup import PENDING_FILE, ROLLUP_TABLES, ROLLUPS_ENABLED, update_rollups
+from script.schema import (CURRENT_GLOBAL_SCHEMA, FACT_WEATHER_SCHEMA, HISTORICAL_GLOBAL_SCHEMA, apply_schema,
+                           compute_schema)
+from script.storage import (STORAGE_FORMAT, TableAppender, list_partitions, partition_files, read_partitions,
+                            read_table, table_exists, table_path, write_table)
 
-# Configuration du logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+# Tables d'entrée et de sortie : voir paths.py (sans extension, le format dépend de STORAGE_FORMAT)
+HISTORICAL_INPUT_COLUMNS = ['ville', 'date', 'temp_max', 'temp_min', 'precipitation', 'pluie', 'neige']
+STAR_SCHEMA_TABLES = ['dim_ville', 'dim_temps', 'dim_climat', 'fact_weather']
+
+# Nombre de processus pour la préparation des faits par ville (1 = traitement en série)
+TRANSFORM_WORKERS = int(os.getenv("TRANSFORM_WORKERS", "1"))
+
+# Mode streaming : l'historique est traité par groupes de partitions de ville sous un plafond mémoire
+TRANSFORM_STREAMING = os.getenv("TRANSFORM_STREAMING", "0") == "1"
+TRANSFORM_MAX_MEMORY_MB = float(os.getenv("TRANSFORM_MAX_MEMORY_MB", "512"))
+# Un morceau est copié plusieurs fois (préparation, concaténation, tri, jointures) :
+# l'historique chargé par morceau est limité au plafond divisé par ce facteur
+CHUNK_MEMORY_FACTOR = 4
 
 def prepare_current_data(df):
     """Prépare les données actuelles pour l'unification"""
@@ -55,8 +78,9 @@ def prepare_historical_data(df):
     df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d') # Formater en YYYY-MM-DD
     df['source_type'] = 'historical'
     
-    if 'temperature' not in df.columns:
-        df['temperature'] = (df['temp_max'] + df['temp_min']) / 2
+    # Température moyenne des heures du jour (table horaire) si disponible, sinon milieu de l'amplitude
+    midrange = (df['temp_max'] + df['temp_min']) / 2
+    df['temperature'] = df['temperature'].fillna(midrange) if 'temperature' in df.columns else midrange
     
     df['climat_id'] = assign_climate_category(df['temperature'])
     
@@ -112,35 +136,28 @@ def assign_climate_category(temperatures):
     choices = [1, 5, 2, 3] # ID de dim_climat: 1:Tropical, 5:Polaire, 2:Sec, 3:Tempéré
     return np.select(conditions, choices, default=4) # Default 4: Continental
 
-def create_dimensions(df):
-    """Crée toutes les dimensions avec gestion robuste des types"""
-    os.makedirs("data/star_schema", exist_ok=True)
-    
-    # Dimension Ville
-    dim_ville = pd.DataFrame({
-        'ville_id': range(1, len(df['ville'].unique()) + 1),
-        'ville': df['ville'].unique()
-    })
-    
-    # Ajout des métadonnées géographiques
-    geo_data = {
-        'Paris': ('France', 48.8566, 2.3522),
-        'New York': ('USA', 40.7128, -74.0060),
-        'Tokyo': ('Japan', 35.6762, 139.6503),
-        'Sydney': ('Australia', -33.8688, 151.2093),
-        'Moscow': ('Russia', 55.7558, 37.6173),
-        'Antananarivo': ('Madagascar', -18.8792, 47.5079),
-        'São Paulo': ('Brazil', -23.5505, -46.6333) # Ajout de São Paulo ici
-    }
-    
-    dim_ville['pays'] = dim_ville['ville'].map(lambda x: geo_data.get(x, ('Inconnu',))[0])
-    dim_ville['latitude'] = dim_ville['ville'].map(lambda x: geo_data.get(x, (None, None, None))[1])
-    dim_ville['longitude'] = dim_ville['ville'].map(lambda x: geo_data.get(x, (None, None, None))[2])
-    
-    # Dimension Temps
-    # Utiliser les dates de la table de faits unifiée
-    dates = pd.to_datetime(df['date'].unique())
-    dim_temps = pd.DataFrame({
+def load_dimension(name: str) -> pd.DataFrame:
+    """
+    Charge une dimension déjà publiée dans data/star_schema/
+
+    Les dimensions publiées servent de registre des clés de substitution : une ville ou
+    une date déjà connue conserve son identifiant d'un run à l'autre.
+
+    Returns:
+        pd.DataFrame | None: Dimension existante, None si elle n'existe pas ou est illisible
+    """
+    base = f"{STAR_SCHEMA_DIR}/{name}"
+    if not table_exists(base):
+        return None
+    try:
+        return read_table(base)
+    except Exception as e:
+        logging.warning(f"Dimension {name} illisible, les clés seront réattribuées : {e}")
+        return None
+
+def build_dim_temps(dates: pd.DatetimeIndex) -> pd.DataFrame:
+    """Construit les lignes de la dimension temps pour une liste de dates"""
+    return pd.DataFrame({
         'date_id': dates.strftime('%Y%m%d'),
         'date': dates,
         'jour': dates.day,
@@ -150,6 +167,58 @@ def create_dimensions(df):
         'saison': dates.quarter.map({1: 'Hiver', 2: 'Printemps', 3: 'Été', 4: 'Automne'}),
         'jour_semaine': dates.day_name()
     })
+
+@instrument
+def create_dimensions(df):
+    """
+    Crée toutes les dimensions avec gestion robuste des types
+
+    Les dimensions ville et temps sont mises à jour par upsert à partir des dimensions
+    déjà publiées : les villes et dates existantes gardent leur identifiant, les nouvelles
+    reçoivent des identifiants ajoutés à la suite (villes dans l'ordre d'apparition,
+    dates triées).
+    """
+    return create_dimensions_from_keys(df['ville'].unique(), df['date'].unique())
+
+def create_dimensions_from_keys(villes, dates):
+    """
+    Crée les dimensions à partir des seules clés (villes et dates YYYY-MM-DD) :
+    villes dans l'ordre d'apparition, dates triées (voir create_dimensions)
+    """
+    # Dimension Ville : identifiants existants conservés, nouveaux identifiants à la suite
+    existing_ville = load_dimension('dim_ville')
+    known = existing_ville[['ville_id', 'ville']] if existing_ville is not None else pd.DataFrame(
+        {'ville_id': pd.Series(dtype=int), 'ville': pd.Series(dtype=object)})
+    known_villes = set(known['ville'])
+    new_villes = [v for v in villes if v not in known_villes]
+    next_id = int(known['ville_id'].max()) + 1 if not known.empty else 1
+    dim_ville = pd.concat([
+        known,
+        pd.DataFrame({'ville_id': range(next_id, next_id + len(new_villes)), 'ville': new_villes})
+    ], ignore_index=True)
+    dim_ville['ville_id'] = dim_ville['ville_id'].astype(int)
+    if existing_ville is not None and new_villes:
+        logging.info(f"{len(new_villes)} nouvelles villes ajoutées à dim_ville : {', '.join(map(str, new_villes))}")
+    
+    # Ajout des métadonnées géographiques (référentiel des villes, script/cities.py)
+    dim_ville['pays'] = dim_ville['ville'].map(get_city_country)
+    dim_ville['latitude'] = dim_ville['ville'].map(lambda x: get_city_coordinates(x)[0])
+    dim_ville['longitude'] = dim_ville['ville'].map(lambda x: get_city_coordinates(x)[1])
+    
+    # Dimension Temps
+    # Les dates déjà publiées sont conservées, les dates de la table de faits absentes sont ajoutées
+    # Dates triées : même ordre quel que soit le chemin de transformation (en mémoire ou par morceaux)
+    dates = pd.DatetimeIndex(pd.to_datetime(dates)).unique().sort_values()
+    existing_temps = load_dimension('dim_temps')
+    if existing_temps is not None:
+        existing_temps['date'] = pd.to_datetime(existing_temps['date'])
+        existing_temps['date_id'] = existing_temps['date_id'].astype(str)
+        new_dates = dates[~dates.isin(existing_temps['date'])]
+        dim_temps = pd.concat([existing_temps, build_dim_temps(new_dates)], ignore_index=True)
+        if len(new_dates):
+            logging.info(f"{len(new_dates)} nouvelles dates ajoutées à dim_temps")
+    else:
+        dim_temps = build_dim_temps(dates)
     
     # Dimension Climat (déjà définie)
     dim_climat = pd.DataFrame({
@@ -159,58 +228,117 @@ def create_dimensions(df):
         'description': ['Chaud et humide', 'Chaud et sec', 'Doux', 'Variations saisonnières', 'Froid']
     })
     
-    # Sauvegarde
-    dim_ville.to_csv("data/star_schema/dim_ville.csv", index=False)
-    dim_temps.to_csv("data/star_schema/dim_temps.csv", index=False) 
-    dim_climat.to_csv("data/star_schema/dim_climat.csv", index=False)
-    
+    # La sauvegarde est faite une seule fois, par save_results
     return {'ville': dim_ville, 'temps': dim_temps, 'climat': dim_climat}
 
-def create_unified_star_schema():
-    """Crée un schéma en étoile avec une seule table de faits unifiée, incluant déduplication."""
-    try:
-        # 1. Chargement des données fusionnées
-        current = pd.read_csv("data/processed/current_global.csv")
-        historical = pd.read_csv("data/processed/historical_global.csv")
+def load_merged_data() -> tuple:
+    """Charge les données fusionnées (actuelles et historiques) produites par merge.py"""
+    current = read_table(CURRENT_GLOBAL, schema=CURRENT_GLOBAL_SCHEMA)
+    historical = read_partitions(HISTORICAL_PARTITIONS, columns=HISTORICAL_INPUT_COLUMNS,
+                                 fallback_base=HISTORICAL_GLOBAL, sort_by='ville',
+                                 schema=HISTORICAL_GLOBAL_SCHEMA)
+    # Humidité, pression et vent journaliers rééchantillonnés depuis la table horaire
+    return current, add_hourly_measures(historical)
 
-        # 2. Préparation des données avec conversion de type explicite et harmonisation des colonnes
-        current_prep = prepare_current_data(current)
-        historical_prep = prepare_historical_data(historical)
-        
-        # 3. Fusion unifiée des faits (concaténation)
+def build_unified_facts(current: pd.DataFrame, historical: pd.DataFrame) -> pd.DataFrame:
+    """
+    Prépare, concatène et déduplique les faits actuels et historiques.
+
+    Le résultat est trié par ville puis date : appliquée à des groupes de villes
+    contigus dans l'ordre alphabétique, la fonction produit des morceaux qu'il suffit
+    de concaténer pour retrouver le résultat global (voir build_unified_facts_parallel).
+    """
+    # 2. Préparation des données avec conversion de type explicite et harmonisation des colonnes
+    current_prep = prepare_current_data(current)
+    historical_prep = prepare_historical_data(historical)
+    
+    # 3. Fusion unifiée des faits (concaténation)
+    with step('concat'):
         unified_fact = pd.concat([current_prep, historical_prep], ignore_index=True)
-        
-        # NOUVEAU : Déduplication de la table de faits unifiée
-        # Prioriser les données 'current' si une même ville et date existe dans les deux sources.
-        # Cela signifie que si vous avez des données OpenWeather pour le 2025-07-05 et des données
-        # historiques pour la même date, les données OpenWeather seront conservées.
-        unified_fact['date'] = pd.to_datetime(unified_fact['date']).dt.strftime('%Y-%m-%d') # Assurer format date string
-        
-        # Créer une colonne de priorité pour la déduplication
-        unified_fact['priority'] = unified_fact['source_type'].map({'current': 1, 'historical': 2})
+    
+    # NOUVEAU : Déduplication de la table de faits unifiée
+    # Prioriser les données 'current' si une même ville et date existe dans les deux sources.
+    # Cela signifie que si vous avez des données OpenWeather pour le 2025-07-05 et des données
+    # historiques pour la même date, les données OpenWeather seront conservées.
+    unified_fact['date'] = pd.to_datetime(unified_fact['date']).dt.strftime('%Y-%m-%d') # Assurer format date string
+    
+    # Créer une colonne de priorité pour la déduplication
+    unified_fact['priority'] = unified_fact['source_type'].map({'current': 1, 'historical': 2})
+    with step('sort', rows_in=len(unified_fact)):
         unified_fact = unified_fact.sort_values(by=['ville', 'date', 'priority'], ascending=[True, True, True])
-        
-        # Dédupliquer en gardant la ligne avec la priorité la plus basse (donc 'current' si présente)
+    
+    # Dédupliquer en gardant la ligne avec la priorité la plus basse (donc 'current' si présente)
+    with step('dedup', rows_in=len(unified_fact)) as measure:
         unified_fact = unified_fact.drop_duplicates(subset=['ville', 'date'], keep='first')
-        unified_fact = unified_fact.drop(columns=['priority']) # Supprimer la colonne de priorité
-
-        # Harmonisation de la colonne 'precipitation'
-        # Utiliser 'precipitation_current' si elle existe, sinon 'precipitation_historical'
-        # et nommer le tout 'precipitation'.
-        unified_fact['precipitation'] = unified_fact['precipitation_current'].fillna(unified_fact['precipitation_historical'])
-        # Supprimer les colonnes sources spécifiques après harmonisation
-        unified_fact.drop(columns=['precipitation_current', 'precipitation_historical'], inplace=True, errors='ignore')
-        
-        # 4. Création des dimensions à partir du DataFrame de faits dédupliqué
-        dims = create_dimensions(unified_fact)
-        
-        # 5. Préparation des IDs pour la jointure finale
-        # Assurez-vous que les colonnes 'ville' et 'date' sont propres pour la jointure
-        unified_fact['date'] = pd.to_datetime(unified_fact['date']) # Convertir en datetime pour joindre à dim_temps
-        dims['temps']['date'] = pd.to_datetime(dims['temps']['date']) # Convertir en datetime pour joindre à unified_fact
-        
-        # 6. Jointure finale pour obtenir les IDs des dimensions
-        final_fact = unified_fact.merge(
+        measure.rows_out = len(unified_fact)
+    unified_fact = unified_fact.drop(columns=['priority']) # Supprimer la colonne de priorité
+
+    # Harmonisation de la colonne 'precipitation'
+    # Utiliser 'precipitation_current' si elle existe, sinon 'precipitation_historical'
+    # et nommer le tout 'precipitation'.
+    unified_fact['precipitation'] = unified_fact['precipitation_current'].fillna(unified_fact['precipitation_historical'])
+    # Supprimer les colonnes sources spécifiques après harmonisation
+    unified_fact.drop(columns=['precipitation_current', 'precipitation_historical'], inplace=True, errors='ignore')
+    return unified_fact
+
+def build_unified_facts_parallel(current: pd.DataFrame, historical: pd.DataFrame, workers: int) -> pd.DataFrame:
+    """
+    Version parallèle de build_unified_facts : les villes sont réparties en groupes
+    contigus (ordre alphabétique) traités par un pool de processus, puis les morceaux
+    sont concaténés dans l'ordre. Le résultat est identique au traitement en série.
+
+    Args:
+        current (pd.DataFrame): Données actuelles fusionnées
+        historical (pd.DataFrame): Données historiques fusionnées
+        workers (int): Nombre de processus
+    """
+    villes = sorted(set(current['ville'].dropna()) | set(historical['ville'].dropna()))
+    if workers <= 1 or len(villes) <= 1:
+        return build_unified_facts(current, historical)
+
+    # Plusieurs groupes par processus pour équilibrer la charge entre villes de tailles différentes
+    n_chunks = min(len(villes), workers * 4)
+    chunks = [list(chunk) for chunk in np.array_split(np.array(villes, dtype=object), n_chunks)]
+    current_shards = [current[current['ville'].isin(chunk)] for chunk in chunks]
+    historical_shards = [historical[historical['ville'].isin(chunk)] for chunk in chunks]
+
+    with ProcessPoolExecutor(max_workers=min(workers, n_chunks)) as executor:
+        shards = list(executor.map(build_unified_facts, current_shards, historical_shards))
+    logging.info(f"Faits unifiés calculés en parallèle : {len(villes)} villes, {n_chunks} groupes, {workers} processus")
+    return pd.concat(shards)
+
+def build_star_schema(current: pd.DataFrame, historical: pd.DataFrame, workers: int = None) -> tuple:
+    """
+    Construit en mémoire les dimensions et la table de faits unifiée, incluant déduplication.
+
+    Args:
+        current (pd.DataFrame): Données actuelles fusionnées (current_global)
+        historical (pd.DataFrame): Données historiques fusionnées
+        workers (int): Nombre de processus pour la préparation par ville
+            (TRANSFORM_WORKERS par défaut, 1 pour un traitement en série)
+
+    Returns:
+        tuple: (dictionnaire des dimensions, table de faits avec ville_id/date_id)
+    """
+    # 2 et 3. Préparation, fusion et déduplication des faits (en parallèle par ville si demandé)
+    unified_fact = build_unified_facts_parallel(current, historical, workers or TRANSFORM_WORKERS)
+    
+    # 4. Création des dimensions à partir du DataFrame de faits dédupliqué
+    dims = create_dimensions(unified_fact)
+    
+    # 5 et 6. Jointure finale pour obtenir les IDs des dimensions
+    return dims, attach_dimension_ids(unified_fact, dims)
+
+def attach_dimension_ids(unified_fact: pd.DataFrame, dims: dict) -> pd.DataFrame:
+    """Ajoute ville_id et date_id aux faits unifiés par jointure sur les dimensions"""
+    # 5. Préparation des IDs pour la jointure finale
+    # Assurez-vous que les colonnes 'ville' et 'date' sont propres pour la jointure
+    unified_fact['date'] = pd.to_datetime(unified_fact['date']) # Convertir en datetime pour joindre à dim_temps
+    dims['temps']['date'] = pd.to_datetime(dims['temps']['date']) # Convertir en datetime pour joindre à unified_fact
+    
+    # 6. Jointure finale pour obtenir les IDs des dimensions
+    with step('merge', rows_in=len(unified_fact)):
+        return unified_fact.merge(
             dims['ville'][['ville_id', 'ville']], 
             on='ville', 
             how='left'
@@ -219,31 +347,205 @@ def create_unified_star_schema():
             on='date',
             how='left'
         )
+
+def star_schema_stage() -> tuple:
+    """Entrées, sorties et paramètres de l'étape 'star_schema' du manifeste (voir manifest.py)"""
+    inputs = ([table_path(CURRENT_GLOBAL), table_path(HISTORICAL_GLOBAL), HOURLY_DIR]
+              + partition_files(HISTORICAL_PARTITIONS))
+    star_tables = [table_path(f"{STAR_SCHEMA_DIR}/{name}") for name in STAR_SCHEMA_TABLES]
+    return inputs, star_tables, {'storage_format': STORAGE_FORMAT}
+
+@instrument
+def create_unified_star_schema(workers: int = None, streaming: bool = None, max_memory_mb: float = None,
+                               force: bool = False):
+    """
+    Crée un schéma en étoile avec une seule table de faits unifiée, incluant déduplication.
+
+    Le schéma n'est pas reconstruit si current_global, les partitions historiques et horaires
+    ont le même contenu que lors de sa dernière construction (voir manifest.py) ; les tables
+    dérivées activées sont ensuite mises à jour si leurs propres dépendances ont changé.
+
+    Args:
+        workers (int): Nombre de processus pour la préparation par ville (TRANSFORM_WORKERS par défaut)
+        streaming (bool): Traite l'historique par morceaux (TRANSFORM_STREAMING par défaut),
+            voir create_unified_star_schema_streaming
+        max_memory_mb (float): Plafond mémoire du mode streaming (TRANSFORM_MAX_MEMORY_MB par défaut)
+        force (bool): Reconstruit le schéma et les tables dérivées même si leurs entrées sont inchangées
+    """
+    inputs, star_tables, params = star_schema_stage()
+    if not stage_unchanged('star_schema', inputs, star_tables, params, force=force):
+        if TRANSFORM_STREAMING if streaming is None else streaming:
+            create_unified_star_schema_streaming(max_memory_mb)
+        else:
+            create_unified_star_schema_in_memory(workers)
+        record_stage('star_schema', inputs, star_tables, params)
+
+    update_derived_tables(force)
+    return {name: table_path(f"{STAR_SCHEMA_DIR}/{name}") for name in STAR_SCHEMA_TABLES}
+
+def create_unified_star_schema_in_memory(workers: int = None):
+    """Construit et sauvegarde le schéma en étoile à partir de l'historique chargé en entier"""
+    try:
+        # 1. Chargement des données fusionnées
+        current, historical = load_merged_data()
+
+        # 2 à 6. Construction des dimensions et de la table de faits
+        dims, final_fact = build_star_schema(current, historical, workers)
+        record(rows_in=len(current) + len(historical), rows_out=len(final_fact))
         
         # 7. Sauvegarde des résultats
         save_results(dims, final_fact)
         
         logging.info("Schéma en étoile unifié et dédupliqué créé avec succès")
-        return {
-            'dim_ville': "data/star_schema/dim_ville.csv",
-            'dim_temps': "data/star_schema/dim_temps.csv", 
-            'dim_climat': "data/star_schema/dim_climat.csv",
-            'fact_weather': "data/star_schema/fact_weather.csv"
-        }
+        return {name: table_path(f"{STAR_SCHEMA_DIR}/{name}") for name in STAR_SCHEMA_TABLES}
 
     except Exception as e:
         logging.error(f"Erreur lors de la transformation : {str(e)}")
         raise
 
+def update_derived_tables(force: bool = False) -> dict:
+    """
+    Met à jour les tables dérivées activées (base SQLite, agrégats, anomalies), chacune
+    seulement si les tables du schéma en étoile dont elle dépend ont changé
+
+    Returns:
+        dict: Chemins des tables dérivées activées
+    """
+    star_tables = [table_path(f"{STAR_SCHEMA_DIR}/{name}") for name in STAR_SCHEMA_TABLES]
+    fact_inputs = [table_path(f"{STAR_SCHEMA_DIR}/{name}") for name in ('fact_weather', 'dim_ville')]
+    outputs = {}
+    if STAR_SCHEMA_DB_ENABLED:
+        if not stage_unchanged('star_schema_db', star_tables, [STAR_SCHEMA_DB], force=force):
+            materialize_star_schema()
+            record_stage('star_schema_db', star_tables, [STAR_SCHEMA_DB])
+        outputs['database'] = STAR_SCHEMA_DB
+    if ROLLUPS_ENABLED:
+        rollup_tables = [table_path(base) for base in ROLLUP_TABLES.values()]
+        # Les clés en attente laissées par la fusion font partie des entrées
+        inputs = fact_inputs + [PENDING_FILE]
+        if not stage_unchanged('rollups', inputs, rollup_tables, force=force):
+            update_rollups()
+            record_stage('rollups', inputs, rollup_tables)
+        outputs.update({f"rollup_{name}": table_path(base) for name, base in ROLLUP_TABLES.items()})
+    if ANOMALIES_ENABLED:
+        params = {'half_window': CLIMATOLOGY_HALF_WINDOW, 'hot_percentile': HOT_PERCENTILE,
+                  'cold_percentile': COLD_PERCENTILE, 'min_event_days': MIN_EVENT_DAYS}
+        if not stage_unchanged('anomalies', fact_inputs, [table_path(ANOMALY_TABLE)], params, force=force):
+            create_anomaly_table()
+            record_stage('anomalies', fact_inputs, [table_path(ANOMALY_TABLE)], params)
+        outputs['anomalies'] = table_path(ANOMALY_TABLE)
+    return outputs
+
+def scan_historical_partitions() -> list:
+    """
+    Pré-passe légère sur les partitions historiques : seules les colonnes ville et date sont lues
+
+    Returns:
+        list: [(ville, chemin de la partition sans extension, dates de la partition)]
+    """
+    entries = []
+    for base in list_partitions(HISTORICAL_PARTITIONS):
+        keys = read_table(base, columns=['ville', 'date'])
+        if not keys.empty:
+            entries.append((keys['ville'].iloc[0], base, keys['date'].unique()))
+    return entries
+
+def create_unified_star_schema_streaming(max_memory_mb: float = None):
+    """
+    Crée le schéma en étoile en traitant l'historique par groupes de partitions de ville.
+
+    Les dimensions sont construites à partir des seules clés (ville, date), puis les villes
+    sont parcourues dans l'ordre alphabétique : les partitions sont chargées jusqu'au budget
+    du morceau, la priorité current/historical est résolue par build_unified_facts sur le
+    morceau (une ville n'est jamais coupée), et les faits sont ajoutés progressivement
+    à fact_weather. Le résultat est identique au traitement en mémoire.
+
+    Les données actuelles (une ligne par ville et par jour) restent chargées en entier.
+
+    Args:
+        max_memory_mb (float): Plafond mémoire visé (TRANSFORM_MAX_MEMORY_MB par défaut) ;
+            une ville dont la partition dépasse à elle seule le budget forme un morceau seule
+    """
+    max_memory_mb = max_memory_mb or TRANSFORM_MAX_MEMORY_MB
+    budget = max_memory_mb * 1024 * 1024 / CHUNK_MEMORY_FACTOR
+
+    try:
+        partitions = scan_historical_partitions()
+        if not partitions:
+            logging.warning("Aucune partition historique dans data/processed/historical/ : transformation en mémoire")
+            return create_unified_star_schema_in_memory()
+
+        current = read_table(CURRENT_GLOBAL, schema=CURRENT_GLOBAL_SCHEMA)
+
+        # 1. Dimensions à partir des clés, avant tout chargement des mesures
+        bases = {ville: base for ville, base, _ in partitions}
+        villes = sorted(set(bases) | set(current['ville'].dropna()))
+        dates = set(pd.to_datetime(current['timestamp_donnees'], unit='s').dt.strftime('%Y-%m-%d'))
+        for _, _, partition_dates in partitions:
+            dates.update(partition_dates)
+        dims = create_dimensions_from_keys(villes, sorted(dates))
+
+        # 2. Faits par morceaux de villes contiguës, écrits au fil de l'eau
+        n_chunks, peak_bytes = 0, 0
+        with TableAppender(f"{STAR_SCHEMA_DIR}/fact_weather", schema=FACT_WEATHER_SCHEMA) as writer:
+            chunk_villes, chunk_frames, chunk_bytes = [], [], 0
+            for ville in villes:
+                frame = None
+                if ville in bases:
+                    frame = add_hourly_measures(read_table(bases[ville], columns=HISTORICAL_INPUT_COLUMNS,
+                                                           schema=HISTORICAL_GLOBAL_SCHEMA))
+                    frame_bytes = frame.memory_usage(deep=True).sum()
+                    if chunk_villes and chunk_bytes + frame_bytes > budget:
+                        write_fact_chunk(writer, dims, current, chunk_villes, chunk_frames)
+                        n_chunks, peak_bytes = n_chunks + 1, max(peak_bytes, chunk_bytes)
+                        chunk_villes, chunk_frames, chunk_bytes = [], [], 0
+                    chunk_frames.append(frame)
+                    chunk_bytes += frame_bytes
+                chunk_villes.append(ville)
+            if chunk_villes:
+                write_fact_chunk(writer, dims, current, chunk_villes, chunk_frames)
+                n_chunks, peak_bytes = n_chunks + 1, max(peak_bytes, chunk_bytes)
+        record(rows_out=writer.rows)
+
+        save_dimensions(dims)
+        logging.info(f"Schéma en étoile créé en streaming : {writer.rows} faits, {len(villes)} villes, "
+                     f"{n_chunks} morceaux (historique max par morceau : {peak_bytes / (1024 * 1024):.2f} Mo, "
+                     f"plafond {max_memory_mb:g} Mo)")
+        return {name: table_path(f"{STAR_SCHEMA_DIR}/{name}") for name in STAR_SCHEMA_TABLES}
+
+    except Exception as e:
+        logging.error(f"Erreur lors de la transformation en streaming : {str(e)}")
+        raise
+
+def write_fact_chunk(writer: TableAppender, dims: dict, current: pd.DataFrame, villes: list, frames: list):
+    """Construit les faits d'un groupe de villes et les ajoute à fact_weather"""
+    if frames:
+        historical = pd.concat(frames, ignore_index=True)
+    else:
+        historical = apply_schema(pd.DataFrame(columns=HISTORICAL_INPUT_COLUMNS), compute_schema(HISTORICAL_GLOBAL_SCHEMA))
+    unified_fact = build_unified_facts(current[current['ville'].isin(villes)], historical)
+    writer.append(finalize_fact(attach_dimension_ids(unified_fact, dims), name=None))
+
+def save_dimensions(dims):
+    """Sauvegarde les dimensions."""
+    write_table(dims['ville'], f"{STAR_SCHEMA_DIR}/dim_ville")
+    write_table(dims['temps'], f"{STAR_SCHEMA_DIR}/dim_temps")
+    write_table(dims['climat'], f"{STAR_SCHEMA_DIR}/dim_climat")
+
+@instrument
 def save_results(dims, fact):
     """Sauvegarde la table de faits unifiée et les dimensions."""
-    os.makedirs("data/star_schema", exist_ok=True) 
+    save_dimensions(dims)
+    write_table(finalize_fact(fact), f"{STAR_SCHEMA_DIR}/fact_weather")
 
-    # Les dimensions sont déjà sauvegardées dans create_dimensions. On s'assure juste ici.
-    dims['ville'].to_csv("data/star_schema/dim_ville.csv", index=False)
-    dims['temps'].to_csv("data/star_schema/dim_temps.csv", index=False) 
-    dims['climat'].to_csv("data/star_schema/dim_climat.csv", index=False)
+def finalize_fact(fact, name: str = 'fact_weather'):
+    """
+    Sélectionne les colonnes de la table de faits et applique son schéma typé
 
+    Args:
+        fact (pd.DataFrame): Faits avec ville_id/date_id
+        name (str): Nom journalisé avec la mémoire avant/après typage (None pour ne rien journaliser)
+    """
     final_cols = [
         'ville_id', 'date_id', 'climat_id',
         'temperature', 'temp_min', 'temp_max',
@@ -263,25 +565,28 @@ def save_results(dims, fact):
     # Sélection et ordonnancement des colonnes
     fact = fact[final_cols]
     
-    # Conversion des types pour cohérence
-    fact['date_id'] = fact['date_id'].astype(str)
-    # Gérer les NaNs potentiels dans ville_id et climat_id avant de convertir en int
-    # Cela peut arriver si une ville ou un type de climat n'a pas été mappé correctement
-    fact['ville_id'] = fact['ville_id'].fillna(-1).astype(int) 
-    fact['climat_id'] = fact['climat_id'].fillna(-1).astype(int)
-    
-    # Convertir les colonnes numériques qui peuvent avoir des NaNs à des types supportant NaN
-    # Les types 'float' peuvent contenir des NaN.
-    # Pour les entiers, Pandas a des types comme `Int64` (avec un grand 'I') qui gèrent les NaNs.
-    numerical_cols = [
-        'temperature', 'temp_min', 'temp_max', 'humidite', 'pression', 
-        'vent_vitesse', 'precipitation', 'pluie', 'neige', 'couverture_nuageuse'
-    ]
-    for col in numerical_cols:
-        if col in fact.columns:
-            fact[col] = pd.to_numeric(fact[col], errors='coerce') # 'coerce' met NaN si la conversion échoue
+    # Gérer les NaNs potentiels dans les identifiants avant de convertir en entier
+    # Cela peut arriver si une ville, une date ou un type de climat n'a pas été mappé correctement
+    fact = fact.copy()
+    for col in ['ville_id', 'date_id', 'climat_id']:
+        fact[col] = pd.to_numeric(fact[col], errors='coerce').fillna(-1)
     
-    fact.to_csv("data/star_schema/fact_weather.csv", index=False)
+    # Conversion vers le schéma compact (identifiants entiers, mesures float32,
+    # entiers nullables pour humidité/pression/couverture, catégories pour les libellés)
+    return apply_schema(fact, FACT_WEATHER_SCHEMA, name=name)
 
 if __name__ == "__main__":
-    create_unified_star_schema()
\ No newline at end of file
+    # Configuration du logging
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(description="Construction du schéma en étoile")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Traite l'historique par morceaux de villes sous un plafond mémoire")
+    parser.add_argument("--max-memory-mb", type=float, default=None,
+                        help="Plafond mémoire du mode streaming (TRANSFORM_MAX_MEMORY_MB par défaut)")
+    parser.add_argument("--force", action="store_true",
+                        help="Reconstruit le schéma même si ses entrées sont inchangées (manifeste)")
+    args = parser.parse_args()
+    create_unified_star_schema(streaming=args.streaming or None, max_memory_mb=args.max_memory_mb, force=args.force)
\ No newline at end of file
@@ -0,0 +1,34 @@
+import os
+import subprocess
+import sys
+import tempfile
+
+import pytest
+
+# Les chemins des données sont lus à l'import des scripts (script/paths.py) : les tests ne doivent
+# jamais écrire dans data/ du projet. Cache HTTP et mesures désactivés pour des tests isolés.
+os.environ["WEATHER_DATA_DIR"] = tempfile.mkdtemp(prefix="weather-tests-")
+os.environ["HTTP_CACHE_ENABLED"] = "0"
+os.environ["METRICS_ENABLED"] = "0"
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture(scope='session')
+def run_script():
+    """Exécute `python -m script.<module>` sur une racine de données absolue (WEATHER_DATA_DIR), comme le DAG"""
+    def run(module: str, data_dir, *args, **env):
+        process_env = {**os.environ, "WEATHER_DATA_DIR": str(data_dir), "PYTHONPATH": PROJECT_DIR,
+                       **{key: str(value) for key, value in env.items()}}
+        subprocess.run([sys.executable, "-m", f"script.{module}", *args], cwd=PROJECT_DIR, env=process_env,
+                       check=True, capture_output=True)
+    return run
+
+@pytest.fixture(scope='session')
+def merged_data(tmp_path_factory, run_script):
+    """Données synthétiques (12 villes, 60 jours) fusionnées par merge.py, sans schéma en étoile (à copier avant écriture)"""
+    from script.synthetic import generate_dataset
+
+    root = tmp_path_factory.mktemp("merged")
+    generate_dataset(str(root), n_cities=12, n_days=60, current_days=2, seed=3)
+    run_script("merge", root / "data")
+    return root / "data"
@@ -0,0 +1,49 @@
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from script.cube import CUBE_VARIABLES, load_cube
+
+@pytest.fixture(scope='module')
+def cube_data(tmp_path_factory, merged_data, run_script):
+    """Données fusionnées et leur cube (python -m script.cube)"""
+    data_dir = tmp_path_factory.mktemp("cube") / "data"
+    shutil.copytree(merged_data, data_dir)
+    run_script("cube", data_dir)
+    return data_dir
+
+def historical(data_dir) -> pd.DataFrame:
+    return pd.concat([pd.read_csv(path) for path in sorted((data_dir / "processed" / "historical").glob("ville=*.csv"))],
+                     ignore_index=True)
+
+def test_city_stats_match_groupby(cube_data):
+    expected = historical(cube_data).groupby('ville')[CUBE_VARIABLES].agg(['mean', 'std', 'sum'])
+    expected.columns = [f"{name}_{stat}" for name, stat in expected.columns]
+
+    stats = load_cube(str(cube_data / "cube")).city_stats().set_index('ville')
+
+    assert sorted(stats.index) == sorted(expected.index)
+    pd.testing.assert_frame_equal(stats.loc[expected.index, expected.columns], expected, rtol=1e-7)
+
+def test_monthly_climatology_matches_groupby(cube_data):
+    df = historical(cube_data)
+    df['mois'] = pd.to_datetime(df['date']).dt.month
+    expected = df.pivot_table(index='ville', columns='mois', values='temp_max', aggfunc='mean')
+
+    climatology = load_cube(str(cube_data / "cube")).monthly_climatology('temp_max')
+
+    observed = climatology.loc[expected.index, expected.columns]
+    np.testing.assert_allclose(observed.to_numpy(), expected.to_numpy(), rtol=1e-7)
+    # Mois sans aucune donnée : NaN
+    assert climatology.drop(columns=expected.columns).isna().all().all()
+
+def test_analysis_from_cube_matches_running_stats(merged_data, tmp_path, run_script):
+    analyses = {}
+    for cube_enabled in ('0', '1'):
+        data_dir = tmp_path / f"cube_{cube_enabled}"
+        shutil.copytree(merged_data, data_dir)
+        run_script("merge", data_dir, "--force", CUBE_ENABLED=cube_enabled)
+        analyses[cube_enabled] = pd.read_csv(data_dir / "analysis" / "climate_analysis.csv").set_index('ville')
+    pd.testing.assert_frame_equal(analyses['1'], analyses['0'], rtol=1e-7)
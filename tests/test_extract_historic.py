@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from script import extract_historic, paths
+from script.extract_historic import (HISTORY_DAYS, extract_historical_weather_batch,
+                                     get_high_water_mark, plan_extraction, save_historical_frame)
+
+END_DATE = datetime(2025, 7, 18)
+
+@pytest.fixture(autouse=True)
+def historical_dir(tmp_path, monkeypatch):
+    """Fichiers historiques bruts dans un répertoire temporaire"""
+    monkeypatch.setattr(paths, 'HISTORICAL_INPUT_DIR', str(tmp_path))
+    monkeypatch.setattr(extract_historic, 'HISTORICAL_INPUT_DIR', str(tmp_path))
+    return tmp_path
+
+def history(dates: list, incomplete: list = ()) -> pd.DataFrame:
+    df = pd.DataFrame({'ville': 'Paris', 'date': dates, 'temp_max': 25.0, 'temp_min': 15.0,
+                       'precipitation': 0.0, 'pluie': 0.0, 'neige': 0.0})
+    df.loc[df['date'].isin(incomplete), 'temp_max'] = np.nan
+    return df
+
+def test_high_water_mark_ignores_trailing_incomplete_days():
+    stored = history(['2025-07-10', '2025-07-11', '2025-07-12'], incomplete=['2025-07-12'])
+    assert get_high_water_mark(stored) == datetime(2025, 7, 11)
+
+def test_high_water_mark_without_usable_history():
+    assert get_high_water_mark(pd.DataFrame()) is None
+    assert get_high_water_mark(history(['2025-07-10'], incomplete=['2025-07-10'])) is None
+
+def test_new_city_gets_a_full_backfill():
+    stored, start_date = plan_extraction('Paris', END_DATE)
+    assert stored.empty
+    assert start_date == END_DATE - timedelta(days=HISTORY_DAYS)
+
+def test_extraction_resumes_after_the_last_complete_day():
+    history(['2025-07-10', '2025-07-11', '2025-07-12'], incomplete=['2025-07-12']).to_csv(
+        paths.historical_file_path('Paris'), index=False)
+    stored, start_date = plan_extraction('Paris', END_DATE)
+    assert len(stored) == 3
+    assert start_date == datetime(2025, 7, 12)
+
+def test_up_to_date_city_is_skipped():
+    history(['2025-07-17', '2025-07-18']).to_csv(paths.historical_file_path('Paris'), index=False)
+    assert plan_extraction('Paris', END_DATE)[1] is None
+
+def test_full_backfill_ignores_stored_history():
+    history(['2025-07-17', '2025-07-18']).to_csv(paths.historical_file_path('Paris'), index=False)
+    stored, start_date = plan_extraction('Paris', END_DATE, full_backfill=True)
+    assert stored.empty
+    assert start_date == END_DATE - timedelta(days=HISTORY_DAYS)
+
+def test_saving_replaces_incomplete_days_and_keeps_the_rest():
+    history(['2025-07-10', '2025-07-11', '2025-07-12'], incomplete=['2025-07-12']).to_csv(
+        paths.historical_file_path('Paris'), index=False)
+    stored, start_date = plan_extraction('Paris', END_DATE)
+
+    save_historical_frame('Paris', history(['2025-07-12', '2025-07-13']), stored, start_date)
+
+    saved = pd.read_csv(paths.historical_file_path('Paris'))
+    assert saved['date'].tolist() == ['2025-07-10', '2025-07-11', '2025-07-12', '2025-07-13']
+    assert saved['temp_max'].notna().all()
+    assert get_high_water_mark(saved) == datetime(2025, 7, 13)
+
+class FakeArchiveResponse:
+    """Réponse Open-Meteo minimale : un bloc 'daily' par coordonnée demandée"""
+
+    def __init__(self, params):
+        days = pd.date_range(params['start_date'], params['end_date']).strftime('%Y-%m-%d').tolist()
+        daily = {'time': days, 'temperature_2m_max': [25.0] * len(days),
+                 'temperature_2m_min': [15.0] * len(days), 'precipitation_sum': [0.0] * len(days),
+                 'rain_sum': [0.0] * len(days), 'snowfall_sum': [0.0] * len(days)}
+        self.payloads = [{'daily': daily} for _ in params['latitude'].split(',')]
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payloads
+
+def test_batch_requests_each_city_from_its_own_start_date(monkeypatch):
+    today = datetime.now()
+    yesterday = (today - timedelta(days=1)).strftime('%Y-%m-%d')
+    history([yesterday]).to_csv(paths.historical_file_path('Paris'), index=False)
+    requests_sent = []
+
+    def fake_get_with_retry(session, url, params, **kwargs):
+        requests_sent.append(params)
+        return FakeArchiveResponse(params)
+
+    monkeypatch.setattr(extract_historic, 'get_with_retry', fake_get_with_retry)
+
+    results = extract_historical_weather_batch([("Paris", 48.8566, 2.3522), ("Tokyo", 35.6762, 139.6503)],
+                                               hourly=False)
+
+    assert results == {'Paris': True, 'Tokyo': True}
+    start_dates = {params['latitude']: params['start_date'] for params in requests_sent}
+    assert start_dates == {'48.8566': today.strftime('%Y-%m-%d'),
+                           '35.6762': (today - timedelta(days=HISTORY_DAYS)).strftime('%Y-%m-%d')}
+    assert len(pd.read_csv(paths.historical_file_path('Paris'))) == 2
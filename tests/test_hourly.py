@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+from script.hourly import DAILY_MEASURES, build_hourly_frame, resample_daily
+
+def hourly_data(start: str, hours: int, seed: int) -> dict:
+    """Bloc 'hourly' d'une réponse Open-Meteo (heures locales ISO)"""
+    rng = np.random.default_rng(seed)
+    times = pd.date_range(start, periods=hours, freq='h').strftime('%Y-%m-%dT%H:%M')
+    return {
+        'time': list(times),
+        'temperature_2m': np.round(rng.normal(18, 5, hours), 1).tolist(),
+        'relative_humidity_2m': rng.integers(20, 100, hours).tolist(),
+        'pressure_msl': np.round(rng.normal(1013, 6, hours), 1).tolist(),
+        'wind_speed_10m': np.round(rng.gamma(2, 2, hours), 1).tolist(),
+        'precipitation': np.round(rng.gamma(0.3, 1, hours), 1).tolist(),
+    }
+
+def test_local_times_are_stored_as_utc_timestamps():
+    df = build_hourly_frame('Tokyo', hourly_data('2025-07-01T00:00', 2, 0), utc_offset=9 * 3600)
+    assert df['timestamp'].tolist() == [int(pd.Timestamp('2025-06-30T15:00', tz='UTC').timestamp()),
+                                        int(pd.Timestamp('2025-06-30T16:00', tz='UTC').timestamp())]
+
+def test_resampling_matches_a_groupby_on_local_days():
+    hourly = pd.concat([
+        build_hourly_frame('Tokyo', hourly_data('2025-07-01T00:00', 24 * 5, 1), utc_offset=9 * 3600),
+        build_hourly_frame('New York', hourly_data('2025-06-29T00:00', 24 * 7, 2), utc_offset=-4 * 3600),
+        build_hourly_frame('Paris', hourly_data('2025-07-02T00:00', 24 * 3, 3), utc_offset=2 * 3600),
+    ], ignore_index=True)
+    hourly.loc[hourly.index[::7], 'temperature'] = np.nan
+
+    daily = resample_daily(hourly)
+
+    local = pd.to_datetime(hourly['timestamp'] + hourly['timezone'], unit='s')
+    expected = (hourly[DAILY_MEASURES].astype('float64')
+                .groupby([hourly['ville'].astype(str).to_numpy(), local.dt.strftime('%Y-%m-%d').to_numpy()])
+                .mean())
+    expected.index.names = ['ville', 'date']
+    result = daily.set_index(['ville', 'date']).sort_index()
+    assert len(result) == 5 + 7 + 3
+    pd.testing.assert_frame_equal(result, expected.sort_index(), rtol=1e-12)
+
+def test_day_boundaries_follow_the_local_timezone():
+    # 21:00 et 22:00 UTC sont déjà le lendemain à Moscou (UTC+3)
+    hourly = pd.DataFrame({'ville': 'Moscow', 'timezone': 3 * 3600,
+                           'timestamp': [int(pd.Timestamp(f'2025-07-01T{h}:00', tz='UTC').timestamp())
+                                         for h in ('19', '20', '21', '22')],
+                           'temperature': [10.0, 12.0, 20.0, 22.0], 'humidite': 50,
+                           'pression': 1000.0, 'vent_vitesse': 1.0})
+    daily = resample_daily(hourly).set_index('date')
+    assert daily.loc['2025-07-01', 'temperature'] == 11.0
+    assert daily.loc['2025-07-02', 'temperature'] == 21.0
+
+def test_day_without_any_value_is_nan():
+    hourly = build_hourly_frame('Paris', hourly_data('2025-07-01T00:00', 48, 4), utc_offset=0)
+    hourly.loc[hourly.index[:24], 'vent_vitesse'] = np.nan
+    daily = resample_daily(hourly).set_index('date')
+    assert np.isnan(daily.loc['2025-07-01', 'vent_vitesse'])
+    assert daily.loc['2025-07-02', 'vent_vitesse'] > 0
+
+def test_empty_input():
+    assert list(resample_daily(pd.DataFrame()).columns) == ['ville', 'date'] + DAILY_MEASURES
@@ -0,0 +1,129 @@
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+import requests
+
+from script import http_client
+from script.http_cache import ARCHIVE_TTL, CURRENT_TTL, RECENT_ARCHIVE_TTL, ResponseCache
+from script.http_client import get_with_retry
+
+CURRENT_URL = "https://api.openweathermap.org/data/2.5/weather"
+ARCHIVE_URL = "https://archive-api.open-meteo.com/v1/archive"
+
+def make_response(status_code: int, body: str = "", headers: dict = None) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = body.encode('utf-8')
+    response.encoding = 'utf-8'
+    response.headers.update(headers or {})
+    return response
+
+class RecordingSession:
+    """Session renvoyant une réponse fixe et enregistrant les en-têtes envoyés"""
+
+    def __init__(self, response: requests.Response):
+        self.response = response
+        self.sent_headers = []
+
+    def get(self, url, params=None, timeout=None, headers=None):
+        self.sent_headers.append(headers or {})
+        return self.response
+
+def entry_path(cache: ResponseCache, url: str, params: dict) -> str:
+    return os.path.join(cache.cache_dir, f"{cache.key(url, params)}.json")
+
+def expire(cache: ResponseCache, url: str, params: dict):
+    """Fait vieillir une entrée au-delà de sa durée de vie"""
+    path = entry_path(cache, url, params)
+    with open(path, encoding='utf-8') as f:
+        entry = json.load(f)
+    entry['fetched_at'] -= cache.ttl_for(url, params) + 1
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(entry, f)
+
+def test_ttl_depends_on_endpoint_and_archive_age():
+    cache = ResponseCache(cache_dir="unused")
+    old_end = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
+    recent_end = datetime.now().strftime("%Y-%m-%d")
+    assert cache.ttl_for(CURRENT_URL, {'q': 'Paris'}) == CURRENT_TTL
+    assert cache.ttl_for(ARCHIVE_URL, {'end_date': old_end}) == ARCHIVE_TTL
+    assert cache.ttl_for(ARCHIVE_URL, {'end_date': recent_end}) == RECENT_ARCHIVE_TTL
+    assert cache.ttl_for("https://example.test/other", {}) == 0
+
+def test_key_ignores_api_key_which_is_never_stored(tmp_path):
+    cache = ResponseCache(cache_dir=str(tmp_path))
+    assert cache.key(CURRENT_URL, {'q': 'Paris', 'appid': 'a'}) == cache.key(CURRENT_URL, {'q': 'Paris', 'appid': 'b'})
+
+    cache.store(CURRENT_URL, {'q': 'Paris', 'appid': 'secret'}, make_response(200, '{}'))
+    with open(entry_path(cache, CURRENT_URL, {'q': 'Paris'}), encoding='utf-8') as f:
+        assert 'secret' not in f.read()
+
+def test_fresh_entry_is_served_without_network(tmp_path):
+    cache = ResponseCache(cache_dir=str(tmp_path))
+    params = {'q': 'Paris'}
+    session = RecordingSession(make_response(200, '{"temp": 21}'))
+
+    get_with_retry(session, CURRENT_URL, params, timeout=1, cache=cache)
+    cached = get_with_retry(session, CURRENT_URL, params, timeout=1, cache=cache)
+
+    assert len(session.sent_headers) == 1
+    assert cached.json() == {'temp': 21}
+    assert cache.stats['hits'] == 1 and cache.stats['misses'] == 1
+
+def test_expired_entry_is_revalidated_with_etag(tmp_path):
+    cache = ResponseCache(cache_dir=str(tmp_path))
+    params = {'q': 'Paris'}
+    get_with_retry(RecordingSession(make_response(200, '{"temp": 21}', {'ETag': '"v1"'})), CURRENT_URL, params,
+                   timeout=1, cache=cache)
+    expire(cache, CURRENT_URL, params)
+
+    session = RecordingSession(make_response(304))
+    response = get_with_retry(session, CURRENT_URL, params, timeout=1, cache=cache)
+
+    assert session.sent_headers == [{'If-None-Match': '"v1"'}]
+    assert response.status_code == 200 and response.json() == {'temp': 21}
+    assert cache.stats['revalidated'] == 1
+    # La revalidation prolonge l'entrée : elle est de nouveau servie sans requête
+    assert cache.lookup(CURRENT_URL, params)['fresh']
+
+def test_expired_entry_is_replaced_by_a_new_response(tmp_path):
+    cache = ResponseCache(cache_dir=str(tmp_path))
+    params = {'q': 'Paris'}
+    get_with_retry(RecordingSession(make_response(200, '{"temp": 21}', {'ETag': '"v1"'})), CURRENT_URL, params,
+                   timeout=1, cache=cache)
+    expire(cache, CURRENT_URL, params)
+
+    get_with_retry(RecordingSession(make_response(200, '{"temp": 23}', {'ETag': '"v2"'})), CURRENT_URL, params,
+                   timeout=1, cache=cache)
+
+    entry = cache.lookup(CURRENT_URL, params)
+    assert entry['fresh'] and json.loads(entry['body']) == {'temp': 23}
+    assert entry['headers']['ETag'] == '"v2"'
+
+def test_error_responses_are_not_cached(tmp_path, monkeypatch):
+    monkeypatch.setattr(http_client.time, 'sleep', lambda delay: None)
+    cache = ResponseCache(cache_dir=str(tmp_path))
+    get_with_retry(RecordingSession(make_response(500)), CURRENT_URL, {'q': 'Paris'}, timeout=1, max_retries=0,
+                   cache=cache)
+    assert cache.lookup(CURRENT_URL, {'q': 'Paris'}) is None
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ResponseCache(cache_dir=str(tmp_path), max_bytes=10 ** 6)
+    body = 'x' * 1000
+    for city in ('Paris', 'Tokyo', 'Sydney'):
+        cache.store(CURRENT_URL, {'q': city}, make_response(200, body))
+    entry_size = os.path.getsize(entry_path(cache, CURRENT_URL, {'q': 'Paris'}))
+
+    # Accès explicites : Tokyo est le moins récemment utilisé, puis Paris, puis Sydney
+    now = time.time()
+    for city, age in (('Tokyo', 300), ('Paris', 200), ('Sydney', 100)):
+        os.utime(entry_path(cache, CURRENT_URL, {'q': city}), (now - age, now - age))
+    cache.max_bytes = int(2.5 * entry_size)
+    cache.store(CURRENT_URL, {'q': 'Moscow'}, make_response(200, body))
+
+    kept = {city for city in ('Paris', 'Tokyo', 'Sydney', 'Moscow')
+            if cache.lookup(CURRENT_URL, {'q': city}) is not None}
+    assert kept == {'Sydney', 'Moscow'}
+    assert cache.stats['evicted'] == 2
@@ -0,0 +1,119 @@
+import email.utils
+import time
+
+import pytest
+import requests
+
+from script import http_client
+from script.http_client import backoff_delay, get_with_retry, parse_retry_after, shared_limiter
+
+class FakeResponse:
+    def __init__(self, status_code: int, headers: dict = None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+class FakeSession:
+    """Session rejouant une suite de réponses (ou d'exceptions) et enregistrant les appels"""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def get(self, url, params=None, timeout=None, headers=None):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+class FakeLimiter:
+    def __init__(self):
+        self.acquired = 0
+        self.pauses = []
+
+    def acquire(self):
+        self.acquired += 1
+
+    def pause(self, seconds: float):
+        self.pauses.append(seconds)
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Délais demandés à time.sleep, sans attendre"""
+    delays = []
+    monkeypatch.setattr(http_client.time, 'sleep', delays.append)
+    return delays
+
+def test_parse_retry_after_seconds():
+    assert parse_retry_after("120") == 120.0
+    assert parse_retry_after("-5") == 0.0
+
+def test_parse_retry_after_http_date():
+    retry_at = email.utils.formatdate(time.time() + 30, usegmt=True)
+    assert 25 <= parse_retry_after(retry_at) <= 30
+
+def test_parse_retry_after_past_date_is_zero():
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+@pytest.mark.parametrize("value", [None, "", "bientôt"])
+def test_parse_retry_after_missing_or_invalid(value):
+    assert parse_retry_after(value) is None
+
+def test_backoff_delay_is_bounded(monkeypatch):
+    monkeypatch.setattr(http_client.random, 'uniform', lambda low, high: high)
+    assert [backoff_delay(attempt, 1.0, 10.0) for attempt in range(6)] == [1.0, 2.0, 4.0, 8.0, 10.0, 10.0]
+
+def test_retries_transient_errors_then_succeeds(sleeps):
+    session = FakeSession(FakeResponse(503), requests.exceptions.ConnectionError("coupure"), FakeResponse(200))
+    limiter = FakeLimiter()
+
+    response = get_with_retry(session, "https://api.test/v1", {}, timeout=1, limiter=limiter,
+                              backoff_base=0.5, max_delay=4.0)
+
+    assert response.status_code == 200
+    assert session.calls == limiter.acquired == 3
+    assert len(sleeps) == 2 and all(0 <= delay <= 1.0 for delay in sleeps)
+
+def test_retry_after_pauses_the_shared_limiter(sleeps):
+    throttled = FakeResponse(429, {'Retry-After': '7'})
+    session = FakeSession(throttled, FakeResponse(200))
+    limiter = FakeLimiter()
+
+    get_with_retry(session, "https://api.test/v1", {}, timeout=1, limiter=limiter, max_delay=60.0)
+
+    assert sleeps == [7.0]
+    assert limiter.pauses == [7.0]
+    assert throttled.closed
+
+def test_retry_after_is_capped_by_max_delay(sleeps):
+    session = FakeSession(FakeResponse(429, {'Retry-After': '3600'}), FakeResponse(200))
+    get_with_retry(session, "https://api.test/v1", {}, timeout=1, max_delay=30.0)
+    assert sleeps == [30.0]
+
+def test_non_transient_status_is_returned_without_retry(sleeps):
+    session = FakeSession(FakeResponse(404))
+    assert get_with_retry(session, "https://api.test/v1", {}, timeout=1).status_code == 404
+    assert session.calls == 1 and sleeps == []
+
+def test_last_transient_status_is_returned_after_max_retries(sleeps):
+    session = FakeSession(*[FakeResponse(500) for _ in range(3)])
+    response = get_with_retry(session, "https://api.test/v1", {}, timeout=1, max_retries=2)
+    assert response.status_code == 500
+    assert session.calls == 3 and len(sleeps) == 2
+
+def test_network_error_is_raised_after_max_retries(sleeps):
+    session = FakeSession(*[requests.exceptions.Timeout("délai dépassé") for _ in range(3)])
+    with pytest.raises(requests.exceptions.Timeout):
+        get_with_retry(session, "https://api.test/v1", {}, timeout=1, max_retries=2)
+    assert session.calls == 3
+
+def test_shared_limiter_divides_the_quota_between_processes(monkeypatch):
+    monkeypatch.setattr(http_client, 'RATE_LIMIT_SHARES', 4)
+    limiter = shared_limiter(rate=2, burst=10)
+    assert (limiter.rate, limiter.burst) == (0.5, 2)
+    # Jamais moins d'un jeton de rafale
+    assert shared_limiter(rate=1, burst=2).burst == 1
@@ -0,0 +1,99 @@
+import json
+import os
+import shutil
+
+import pytest
+
+from script import manifest
+from script.manifest import record_stage, stage_unchanged
+
+@pytest.fixture
+def stage_files(tmp_path, monkeypatch):
+    """Manifeste, code, entrée et sortie d'une étape dans un répertoire temporaire"""
+    code = tmp_path / "code.py"
+    code.write_text("VERSION = 1\n")
+    monkeypatch.setattr(manifest, 'MANIFEST_FILE', str(tmp_path / "manifest.json"))
+    monkeypatch.setattr(manifest, 'MANIFEST_ENABLED', True)
+    monkeypatch.setattr(manifest, 'code_files', lambda: [str(code)])
+    inputs = tmp_path / "inputs"
+    inputs.mkdir()
+    (inputs / "paris.csv").write_text("date,temp\n2025-07-18,21.5\n")
+    output = tmp_path / "analysis.csv"
+    output.write_text("ville,temp_mean\nParis,21.5\n")
+    return {'code': code, 'inputs': inputs, 'output': output}
+
+def unchanged(files, **kwargs) -> bool:
+    return stage_unchanged('analysis', [str(files['inputs'])], [str(files['output'])], **kwargs)
+
+def record(files, params: dict = None):
+    record_stage('analysis', [str(files['inputs'])], [str(files['output'])], params)
+
+def test_stage_never_recorded_runs(stage_files):
+    assert not unchanged(stage_files)
+
+def test_recorded_stage_is_skipped(stage_files):
+    record(stage_files)
+    assert unchanged(stage_files)
+
+def test_changed_input_content_reruns(stage_files):
+    record(stage_files)
+    (stage_files['inputs'] / "paris.csv").write_text("date,temp\n2025-07-18,22.0\n")
+    assert not unchanged(stage_files)
+
+def test_new_input_file_reruns(stage_files):
+    record(stage_files)
+    (stage_files['inputs'] / "tokyo.csv").write_text("date,temp\n2025-07-18,30.1\n")
+    assert not unchanged(stage_files)
+
+def test_identical_rewrite_is_skipped_and_refreshes_dates(stage_files):
+    record(stage_files)
+    source = stage_files['inputs'] / "paris.csv"
+    content = source.read_text()
+    source.unlink()
+    source.write_text(content)
+    os.utime(source, ns=(0, 10 ** 18))
+
+    assert unchanged(stage_files)
+    with open(manifest.MANIFEST_FILE, encoding='utf-8') as f:
+        entry = json.load(f)['analysis']
+    assert entry['inputs'][os.path.normpath(str(source))]['mtime_ns'] == 10 ** 18
+
+def test_missing_or_modified_output_reruns(stage_files):
+    record(stage_files)
+    stage_files['output'].write_text("ville,temp_mean\nParis,0\n")
+    assert not unchanged(stage_files)
+    stage_files['output'].unlink()
+    assert not unchanged(stage_files)
+
+def test_changed_params_rerun(stage_files):
+    record(stage_files, {'storage_format': 'csv'})
+    assert unchanged(stage_files, params={'storage_format': 'csv'})
+    assert not unchanged(stage_files, params={'storage_format': 'parquet'})
+
+def test_changed_code_reruns(stage_files):
+    record(stage_files)
+    stage_files['code'].write_text("VERSION = 2\n")
+    assert not unchanged(stage_files)
+
+def test_force_and_disabled_manifest_always_run(stage_files, monkeypatch):
+    record(stage_files)
+    assert not unchanged(stage_files, force=True)
+    monkeypatch.setattr(manifest, 'MANIFEST_ENABLED', False)
+    assert not unchanged(stage_files)
+
+def test_unreadable_manifest_reruns(stage_files):
+    record(stage_files)
+    with open(manifest.MANIFEST_FILE, 'w', encoding='utf-8') as f:
+        f.write("{tronqué")
+    assert not unchanged(stage_files)
+
+def test_second_transform_leaves_outputs_untouched(merged_data, tmp_path, run_script):
+    data_dir = tmp_path / "data"
+    shutil.copytree(merged_data, data_dir)
+    run_script("transform", data_dir)
+    outputs = sorted((data_dir / "star_schema").iterdir())
+    before = {path: path.stat().st_mtime_ns for path in outputs}
+
+    run_script("transform", data_dir)
+
+    assert {path: path.stat().st_mtime_ns for path in outputs} == before
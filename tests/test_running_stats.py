@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from script.running_stats import batch_moments, combine, remove
+
+def assert_moments(state: dict, values: np.ndarray):
+    values = values[~np.isnan(values)]
+    assert state['count'] == values.size
+    assert state['mean'] == pytest.approx(values.mean(), rel=1e-12)
+    assert state['m2'] / (state['count'] - 1) == pytest.approx(values.var(ddof=1), rel=1e-10)
+    assert state['sum'] == pytest.approx(values.sum(), rel=1e-12)
+
+@pytest.fixture
+def values():
+    rng = np.random.default_rng(0)
+    values = rng.normal(15, 8, 5000)
+    values[rng.random(values.size) < 0.05] = np.nan
+    return values
+
+def test_batch_moments_ignore_nan(values):
+    assert_moments(batch_moments(values), values)
+
+def test_batch_moments_of_an_empty_batch():
+    assert batch_moments([np.nan, np.nan]) == {'count': 0, 'mean': 0.0, 'm2': 0.0, 'sum': 0.0}
+
+def test_chan_merge_of_uneven_batches_matches_a_single_pass(values):
+    state = batch_moments([])
+    for batch in np.split(values, [1, 7, 900, 2500]):
+        state = combine(state, batch_moments(batch))
+    assert_moments(state, values)
+
+def test_merge_order_does_not_matter(values):
+    batches = [batch_moments(batch) for batch in np.array_split(values, 7)]
+    forward, backward = batch_moments([]), batch_moments([])
+    for batch in batches:
+        forward = combine(forward, batch)
+    for batch in reversed(batches):
+        backward = combine(backward, batch)
+    assert forward['count'] == backward['count']
+    assert forward['sum'] == backward['sum']
+    assert forward['mean'] == pytest.approx(backward['mean'], rel=1e-14)
+    assert forward['m2'] == pytest.approx(backward['m2'], rel=1e-12)
+
+def test_merge_is_stable_with_a_large_offset():
+    # Variance faible autour d'une grande moyenne : la formule naïve sum(x²) - n·mean² perd tous ses chiffres
+    values = 1e9 + np.random.default_rng(1).normal(0, 0.1, 10_000)
+    state = batch_moments([])
+    for batch in np.array_split(values, 10):
+        state = combine(state, batch_moments(batch))
+    assert state['m2'] / (state['count'] - 1) == pytest.approx(values.var(ddof=1), rel=1e-6)
+
+def test_replacing_rows_matches_a_full_recomputation(values):
+    values = values[~np.isnan(values)]
+    replaced, new = values[100:150], values[100:150] + 3.5
+    updated = np.concatenate([values[:100], new, values[150:]])
+
+    state = combine(remove(batch_moments(values), batch_moments(replaced)), batch_moments(new))
+
+    assert_moments(state, updated)
+
+def test_removing_everything_resets_the_state(values):
+    assert remove(batch_moments(values), batch_moments(values))['count'] == 0
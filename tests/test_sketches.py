@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from script.sketches import TDigest
+
+QUANTILES = np.array([0.001, 0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99, 0.999])
+
+def rank_errors(digest: TDigest, values: np.ndarray) -> np.ndarray:
+    """Écart entre le rang demandé et l'intervalle des rangs réels des quantiles estimés (valeurs égales)"""
+    estimates, ordered = digest.quantile(QUANTILES), np.sort(values)
+    low = np.searchsorted(ordered, estimates, side='left') / values.size
+    high = np.searchsorted(ordered, estimates, side='right') / values.size
+    return np.maximum(0, np.maximum(low - QUANTILES, QUANTILES - high))
+
+def assert_error_bounds(digest: TDigest, values: np.ndarray):
+    errors = rank_errors(digest, values)
+    assert errors.max() <= 0.005
+    # Fonction d'échelle k1 : centroïdes plus fins, donc erreur plus faible, aux extrémités
+    tails = (QUANTILES <= 0.01) | (QUANTILES >= 0.99)
+    assert errors[tails].max() <= 0.002
+
+@pytest.fixture(params=['normal', 'gamma'])
+def values(request):
+    rng = np.random.default_rng(0)
+    if request.param == 'normal':
+        return rng.normal(15, 8, 100_000)
+    # Précipitations : asymétrique, avec beaucoup de valeurs identiques
+    return np.where(rng.random(100_000) < 0.6, 0.0, rng.gamma(0.8, 6.0, 100_000))
+
+def test_streamed_updates_respect_error_bounds(values):
+    digest = TDigest(100)
+    for batch in np.array_split(values, 50):
+        digest.update(batch)
+    assert_error_bounds(digest, values)
+    assert len(digest.means) <= 100
+    assert digest.count == values.size
+
+def test_merged_digests_respect_error_bounds(values):
+    merged = TDigest(100)
+    for batch in np.array_split(values, 13):
+        shard = TDigest(100)
+        shard.update(batch)
+        merged = merged.merge(shard)
+    assert_error_bounds(merged, values)
+
+def test_extremes_are_exact(values):
+    digest = TDigest(100)
+    digest.update(values)
+    assert digest.quantile(0.0) == values.min()
+    assert digest.quantile(1.0) == values.max()
+
+def test_serialized_digest_keeps_its_quantiles(values):
+    digest = TDigest(100)
+    digest.update(values)
+    restored = TDigest.from_dict(digest.to_dict(), compression=100)
+    np.testing.assert_allclose(restored.quantile(QUANTILES), digest.quantile(QUANTILES), atol=1e-4)
+
+def test_nan_and_empty_digests():
+    digest = TDigest(100)
+    assert np.isnan(digest.quantile(0.5))
+    assert np.isnan(digest.quantile([0.1, 0.9])).all()
+    digest.update([np.nan, 2.0, np.nan])
+    assert digest.count == 1 and digest.quantile(0.5) == 2.0
@@ -0,0 +1,60 @@
+import shutil
+
+import pandas as pd
+
+from script.transform import STAR_SCHEMA_TABLES
+
+def star_schema_bytes(data_dir) -> dict:
+    return {name: (data_dir / "star_schema" / f"{name}.csv").read_bytes() for name in STAR_SCHEMA_TABLES}
+
+def transform(run_script, merged_data, tmp_path, name: str, *args, **env) -> dict:
+    """Construit le schéma en étoile sur une copie des données fusionnées"""
+    data_dir = tmp_path / name
+    shutil.copytree(merged_data, data_dir)
+    run_script("transform", data_dir, *args, **env)
+    return star_schema_bytes(data_dir)
+
+def test_parallel_transform_is_byte_identical_to_serial(run_script, merged_data, tmp_path):
+    serial = transform(run_script, merged_data, tmp_path, "serial", TRANSFORM_WORKERS=1)
+    parallel = transform(run_script, merged_data, tmp_path, "parallel", TRANSFORM_WORKERS=3)
+    assert serial['fact_weather'].count(b'\n') > 12 * 60
+    assert parallel == serial
+
+def test_streaming_transform_is_byte_identical_to_in_memory(run_script, merged_data, tmp_path):
+    # Ville triée après les autres dont l'historique commence plus tôt
+    source_dir = tmp_path / "source"
+    shutil.copytree(merged_data, source_dir)
+    source = pd.read_csv(source_dir / "historical" / "ville_00001_historical.csv")
+    source.assign(ville="Zzz", date=pd.to_datetime(source['date']) - pd.Timedelta(days=100)).to_csv(
+        source_dir / "historical" / "zzz_historical.csv", index=False)
+    run_script("merge", source_dir)
+
+    in_memory = transform(run_script, source_dir, tmp_path, "in_memory")
+    # Plafond minuscule : une ville par morceau
+    streaming = transform(run_script, source_dir, tmp_path, "streaming", "--streaming", "--max-memory-mb", "0.01")
+    assert streaming == in_memory
+
+def test_surrogate_keys_are_stable_when_a_city_and_dates_are_added(run_script, merged_data, tmp_path):
+    data_dir = tmp_path / "registry"
+    shutil.copytree(merged_data, data_dir)
+    run_script("transform", data_dir)
+    before = {name: pd.read_csv(data_dir / "star_schema" / f"{name}.csv") for name in ('dim_ville', 'dim_temps')}
+
+    # Nouvelle ville, triée avant les autres, avec des dates antérieures à tout l'historique
+    source = pd.read_csv(data_dir / "historical" / "ville_00001_historical.csv")
+    added = source.assign(ville="Aaa", date=pd.to_datetime(source['date']) - pd.Timedelta(days=365))
+    added.to_csv(data_dir / "historical" / "aaa_historical.csv", index=False)
+    run_script("merge", data_dir)
+    run_script("transform", data_dir)
+
+    dim_ville = pd.read_csv(data_dir / "star_schema" / "dim_ville.csv")
+    dim_temps = pd.read_csv(data_dir / "star_schema" / "dim_temps.csv")
+    pd.testing.assert_frame_equal(dim_ville.iloc[:len(before['dim_ville'])], before['dim_ville'])
+    assert dim_ville.set_index('ville').at['Aaa', 'ville_id'] == before['dim_ville']['ville_id'].max() + 1
+    pd.testing.assert_frame_equal(dim_temps.iloc[:len(before['dim_temps'])], before['dim_temps'])
+    assert len(dim_temps) == len(before['dim_temps']) + len(added)
+
+    # Les faits des villes existantes gardent leurs clés
+    fact = pd.read_csv(data_dir / "star_schema" / "fact_weather.csv")
+    ville_1 = before['dim_ville'].set_index('ville').at['Ville 00001', 'ville_id']
+    assert fact.loc[fact['ville_id'] == ville_1, 'date_id'].isin(before['dim_temps']['date_id']).all()